@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Run each example under dash and as translated by sheepy, and compare them:
+# wall time, CPU time, peak RSS and the processes started by each, and
+# whether the output and exit status are the same. The numbers are the
+# median of a few runs.
+#
+# Every run starts in a fresh copy of the example's directory, at the same
+# path each time. A script gets the words of <name>.args next to it as
+# arguments, and <name>.stdin as standard input (/dev/null otherwise). The
+# CPU time and peak RSS are those of the script and the commands it waited
+# for; the processes are counted with the kernel's last PID, so they
+# include threads and anything else started on the machine meanwhile.
+#
+# A process starts with the peak RSS of the one that forked it, so the peak
+# RSS is measured in a run of its own: dash starts the script in the
+# background and exits, and this process, made the subreaper of its
+# descendants, reaps the script.
+#
+#   python3 benchmarks/compare_dash.py [--runs N] [--native] [--buffered] [--json FILE] [script.sh ...]
+import argparse
+import ctypes
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sheepy
+
+LAST_PID_PATH = '/proc/sys/kernel/ns_last_pid'
+PID_MAX_PATH = '/proc/sys/kernel/pid_max'
+PR_SET_CHILD_SUBREAPER = 36
+
+
+def read_number(path):
+    try:
+        with open(path) as f:
+            return int(f.read())
+    except OSError:
+        return None
+
+
+def run(command, directory, stdin_path, timeout):
+    # -> {measure: value}, the output, the exit status
+    last_pid = read_number(LAST_PID_PATH)
+    with open(stdin_path, 'rb') as stdin:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=directory, stdin=stdin, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, env=dict(os.environ, PYTHONPATH=ROOT))
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        output = process.stdout.read()
+        timer.cancel()
+        # wait4 rather than wait, for the resources the process used
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    process.stdout.close()
+    processes = None
+    if last_pid is not None:
+        # less the process started for the command and the timer's thread
+        processes = (read_number(LAST_PID_PATH) - last_pid - 2) % read_number(PID_MAX_PATH)
+    measures = {'wall_ms': seconds * 1000, 'cpu_ms': (usage.ru_utime + usage.ru_stime) * 1000,
+                'processes': processes}
+    return measures, output, process.returncode
+
+
+def become_subreaper():
+    # -> whether orphaned descendants are now reparented to this process
+    try:
+        return ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def peak_rss(command, directory, stdin_path, timeout):
+    # -> the peak RSS of command in KiB, run by dash in the background so
+    # that it doesn't start with the peak RSS of this process; it waits for
+    # the end of dash's standard input, to be sure it is orphaned when
+    # it exits and this process can wait for it
+    launcher = 'exec 3<&0; { read _ <&3; exec "$@" <"$0" >/dev/null 3<&-; } & echo $!'
+    read_end, write_end = os.pipe()
+    process = subprocess.Popen(['dash', '-c', launcher, stdin_path] + command, cwd=directory, stdin=read_end,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               env=dict(os.environ, PYTHONPATH=ROOT))
+    os.close(read_end)
+    pid = int(process.stdout.readline())
+    process.stdout.close()
+    process.wait()
+    os.close(write_end)
+    timer = threading.Timer(timeout, os.kill, [pid, 9])
+    timer.start()
+    _, _, usage = os.wait4(pid, 0)
+    timer.cancel()
+    # reap whatever else the script left behind
+    while True:
+        try:
+            if not os.waitpid(-1, os.WNOHANG)[0]:
+                break
+        except ChildProcessError:
+            break
+    return usage.ru_maxrss
+
+
+def script_input(path):
+    # -> (the arguments, the path of standard input) of an example
+    base = os.path.splitext(path)[0]
+    arguments = []
+    if os.path.exists(base + '.args'):
+        with open(base + '.args') as f:
+            arguments = f.read().split()
+    stdin_path = base + '.stdin' if os.path.exists(base + '.stdin') else os.devnull
+    return arguments, stdin_path
+
+
+def compare(path, options, runs, timeout, subreaper):
+    # -> {'dash': measures, 'python': measures, 'match': bool}
+    with open(path) as f:
+        python_code = sheepy.transpile(f.read(), options)
+    python_command = [sys.executable] + python_code.split('\n', 1)[0].split()[2:]
+    arguments, stdin_path = script_input(path)
+    name = os.path.basename(path)
+    results = {}
+    outputs = {}
+    with tempfile.TemporaryDirectory() as root:
+        directory = os.path.join(root, 'example')
+        for shell in ('dash', 'python'):
+            if shell == 'dash':
+                command = ['dash', name] + arguments
+            else:
+                script = os.path.splitext(name)[0] + '.py'
+                command = python_command + [script] + arguments
+            measured = []
+            peaks = []
+            for number in range(runs + subreaper):
+                shutil.rmtree(directory, ignore_errors=True)
+                shutil.copytree(os.path.dirname(path), directory)
+                if shell == 'python':
+                    with open(os.path.join(directory, script), 'w') as f:
+                        f.write(python_code)
+                if number == runs:
+                    peaks.append(peak_rss(command, directory, stdin_path, timeout))
+                    continue
+                measures, output, status = run(command, directory, stdin_path, timeout)
+                measured.append(measures)
+                outputs[shell] = (output, status)
+            results[shell] = {measure: statistics.median(run[measure] for run in measured)
+                              if measured[0][measure] is not None else None
+                              for measure in measured[0]}
+            results[shell]['peak_kib'] = peaks[0] if peaks else None
+    results['match'] = outputs['dash'] == outputs['python']
+    return results
+
+
+def table(results):
+    header = ('script', 'same', 'dash ms', 'py ms', 'ratio', 'dash cpu', 'py cpu',
+              'dash KiB', 'py KiB', 'dash procs', 'py procs')
+    rows = [header]
+    for name, result in results.items():
+        dash, python = result['dash'], result['python']
+        rows.append((name, 'yes' if result['match'] else 'NO',
+                     f"{dash['wall_ms']:.1f}", f"{python['wall_ms']:.1f}",
+                     f"{python['wall_ms'] / dash['wall_ms']:.1f}x",
+                     f"{dash['cpu_ms']:.1f}", f"{python['cpu_ms']:.1f}",
+                     f"{dash['peak_kib'] or '-'}", f"{python['peak_kib'] or '-'}",
+                     f"{dash['processes']:g}" if dash['processes'] is not None else '-',
+                     f"{python['processes']:g}" if python['processes'] is not None else '-'))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return '\n'.join('  '.join(cell.ljust(width) if column == 0 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in rows)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare the examples run by dash and translated by sheepy.')
+    parser.add_argument('scripts', nargs='*', metavar='script.sh',
+                        help='the scripts to compare (default: examples/*/*.sh)')
+    parser.add_argument('--runs', type=int, default=3, metavar='N',
+                        help='runs of each script, of which the median counts (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=30, metavar='SECONDS',
+                        help='kill a run after this long (default: %(default)s)')
+    parser.add_argument('--native', action='store_true', help='translate with --native')
+    parser.add_argument('--buffered', action='store_true', help='translate with --buffered')
+    parser.add_argument('--json', metavar='FILE', help='also write the results to FILE as JSON')
+    arguments = parser.parse_args(argv[1:])
+    scripts = arguments.scripts or sorted(glob.glob(os.path.join(ROOT, 'examples', '*', '*.sh')))
+    options = {}
+    if arguments.native:
+        options['native'] = True
+    if arguments.buffered:
+        options['buffered'] = True
+
+    subreaper = become_subreaper()
+    results = {}
+    for path in scripts:
+        results[os.path.relpath(path, ROOT)] = compare(path, options, arguments.runs, arguments.timeout, subreaper)
+    print(table(results))
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump({'options': options, 'runs': arguments.runs, 'results': results}, f, indent=2)
+            f.write('\n')
+    return 0 if all(result['match'] for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
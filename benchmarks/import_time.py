@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Check that scripts translated with --runtime stay cheap to start: importing
+# sheepy_runtime has to fit in the budget, and a script only imports the
+# modules it runs. Each script is run with python -X importtime, and the
+# best of a few runs counts. The runtime is compiled beforehand, as it is
+# after the first run of any script that imports it.
+#
+#   python3 benchmarks/import_time.py [--budget MS] [--runs N]
+import argparse
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sheepy
+
+# modules the runtime imports on first use, which a script that doesn't use
+# them must never load
+HEAVY_MODULES = {'subprocess', 're', 'threading', 'shutil', 'mmap', 'glob', 'fnmatch'}
+
+# name -> (shell script, options, modules it may import)
+SCRIPTS = {
+    'echo': ('echo hello\nx=world\necho "$x"\n', {}, set()),
+    'native ls': ('ls -a .\npwd\n', {'native': True}, set()),
+    'native rm': ('touch a b\nrm a b\n', {'native': True}, {'errno'}),
+    'expr': ('i=1\nwhile test $i -lt 3\ndo\n  i=$(expr $i + 1)\ndone\necho $i\n', {}, set()),
+}
+
+
+def imported_modules(script, directory):
+    # -> ({module: cumulative microseconds}, output of the script)
+    process = subprocess.run([sys.executable, '-X', 'importtime', script], cwd=directory,
+                             capture_output=True, text=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules, process.stdout
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget', type=float, default=5, metavar='MS',
+                        help='the most importing sheepy_runtime may take (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5, metavar='N',
+                        help='runs of each script, of which the fastest counts (default: %(default)s)')
+    arguments = parser.parse_args(argv[1:])
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copy(sheepy.RUNTIME_PATH, directory)
+        py_compile.compile(os.path.join(directory, 'sheepy_runtime.py'), doraise=True)
+        for name, (shell_code, options, allowed) in SCRIPTS.items():
+            script = os.path.join(directory, 'script.py')
+            with open(script, 'w') as f:
+                f.write(sheepy.transpile(shell_code, dict(options, runtime=True)))
+            runs = [imported_modules(script, directory)[0] for _ in range(arguments.runs)]
+            heavy = sorted(set().union(*runs) & HEAVY_MODULES - allowed)
+            milliseconds = min(modules.get('sheepy_runtime', 0) for modules in runs) / 1000
+            ok = not heavy and milliseconds <= arguments.budget
+            failed += not ok
+            timing = f'{milliseconds:6.2f} ms' if 'sheepy_runtime' in runs[0] else 'not imported'
+            print(f"{'ok' if ok else 'FAIL':4} {name:12} sheepy_runtime {timing}"
+                  + (f", imported {', '.join(heavy)}" if heavy else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Check that --incremental translates a script exactly as a full run does:
+# each case is translated in full, then incrementally from the blocks kept
+# for the script before it was edited, and the two have to be the same. The
+# fixed cases edit at block boundaries, where an incremental run starts and
+# stops; the random ones make edits to scripts pieced together from the
+# examples. The standard input translation has to have the same statements,
+# though its imports and the runtime functions it defines come where they
+# are first needed.
+#
+#   python3 benchmarks/incremental.py [--seed N] [--edits N]
+import argparse
+import glob
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sheepy
+
+# name -> (script, script after an edit)
+CASES = {
+    'print appended': ("x=5\necho 'hello world'\n", "x=5\necho 'hello world'\necho $x\n"),
+    'print prepended': ("if true\nthen\n  x=1\nfi\necho b\n", "echo a\nif true\nthen\n  x=1\nfi\necho b\n"),
+    'print after a loop': ("for i in 1 2\ndo\n  echo $i\ndone\n", "for i in 1 2\ndo\n  echo $i\ndone\necho done\necho .\n"),
+    'constant changed': ("x=1\necho $x\necho a\n", "x=2\necho $x\necho a\n"),
+}
+
+# lines the random edits insert or replace lines with
+EDITS = ['x="a b"', 'echo changed', 'echo', 'number=5', '', '# c', 'n=1; echo $n', 'k=`echo  a  b`']
+
+
+def statements(python):
+    # -> the lines of python, without the imports and the runtime functions
+    lines = []
+    in_runtime = False
+    for line in python.splitlines():
+        if line.startswith(('def sheepy_', 'class sheepy_')):
+            in_runtime = True
+        elif line and not line[0].isspace():
+            in_runtime = False
+        if not in_runtime and line.strip() and not line.startswith('import '):
+            lines.append(line)
+    return lines
+
+
+def translations(before, after):
+    # -> (full, incremental, standard input) translations of after
+    _, previous, _ = sheepy.transpile_incremental(before)
+    incremental, _, _ = sheepy.transpile_incremental(after, previous)
+    stream = io.StringIO()
+    sheepy.transpile_stream(io.StringIO(after), stream)
+    return sheepy.transpile(after), incremental, stream.getvalue()
+
+
+def check(name, before, after):
+    # -> whether the translations of after agree, reporting if not
+    try:
+        full, incremental, stream = translations(before, after)
+    except sheepy.ShellSyntaxError:
+        return True
+    ok = incremental == full and statements(stream) == statements(full)
+    if not ok:
+        print(f'FAIL {name}')
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=1, help='seed of the random edits (default: %(default)s)')
+    parser.add_argument('--edits', type=int, default=200, metavar='N',
+                        help='random edits to make (default: %(default)s)')
+    arguments = parser.parse_args(argv[1:])
+    failed = 0
+    for name, (before, after) in CASES.items():
+        failed += not check(name, '#!/bin/dash\n' + before, '#!/bin/dash\n' + after)
+
+    generator = random.Random(arguments.seed)
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'examples', '*', '*.sh'))):
+        with open(path) as f:
+            chunks.append(f.read().partition('\n')[2].replace('exit', 'true'))
+    lines = ('#!/bin/dash\n' + ''.join(generator.choice(chunks) for _ in range(50))).split('\n')
+    for edit in range(arguments.edits):
+        edited = list(lines)
+        i = generator.randrange(1, len(edited))
+        operation = generator.choice(['insert', 'delete', 'replace'])
+        if operation == 'insert':
+            edited.insert(i, generator.choice(EDITS))
+        elif operation == 'delete':
+            del edited[i]
+        else:
+            edited[i] = generator.choice(EDITS)
+        failed += not check(f'edit {edit}: {operation} at line {i + 1}', '\n'.join(lines), '\n'.join(edited))
+        lines = edited
+    total = len(CASES) + arguments.edits
+    print(f'{total - failed} of {total} ok')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
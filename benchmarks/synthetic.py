@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Generate synthetic dash scripts for the benchmarks: a script of about the
+# given number of lines, with compound commands nested up to the given depth,
+# and each simple command an echo, a glob, a backtick substitution or a test
+# in the given proportions (an assignment or an external command otherwise).
+# The same arguments and seed always give the same script.
+#
+#   python3 benchmarks/synthetic.py [--lines N] [--depth N] [--echo F] [--glob F]
+#                                   [--backtick F] [--test F] [--seed N]
+import argparse
+import random
+import sys
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'one', 'two', 'three', 'done.txt', '-n', '--']
+VARIABLES = ['i', 'x', 'name', 'line', 'count', 'dir', 'file']
+GLOBS = ['*', '*.sh', '*.[ch]', '?.py', 'examples/*/*.sh', '[a-z]*', 'test0?.sh']
+COMMANDS = ['ls', 'cat file1', 'wc -l', 'date', 'pwd', 'touch out.txt', 'rm -f out.txt', 'grep -c x file1']
+TESTS = ['test $i -lt 10', '[ "$x" = alpha ]', 'test -f "$file"', '[ -d $dir ]', 'test "$name" != ""',
+         '[ $count -ge 3 ]', 'test -z "$line"']
+SUBSTITUTIONS = ['`expr $i + 1`', '`ls`', '`pwd`', '`echo $x`', '`expr $count \\* 2`', '`date +%s`']
+
+
+class ScriptGenerator:
+    # the densities are the shares of the simple commands that are echoes,
+    # globs, backtick substitutions and tests; nesting is the chance that a
+    # statement below the maximum depth opens a compound command
+    def __init__(self, depth=3, echo=0.4, glob=0.1, backtick=0.1, test=0.1, nesting=0.15, seed=0):
+        self.depth = depth
+        self.kinds = ['echo', 'glob', 'backtick', 'test', 'other']
+        self.weights = [echo, glob, backtick, test, max(0.0, 1 - echo - glob - backtick - test)]
+        self.nesting = nesting
+        self.random = random.Random(seed)
+
+    def word(self):
+        choice = self.random.random()
+        if choice < 0.3:
+            return '$' + self.random.choice(VARIABLES)
+        if choice < 0.4:
+            return f'"{self.random.choice(WORDS)} ${self.random.choice(VARIABLES)}"'
+        return self.random.choice(WORDS)
+
+    def words(self):
+        return ' '.join(self.word() for _ in range(self.random.randint(1, 5)))
+
+    def simple_command(self):
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        if kind == 'echo':
+            return f'echo {self.words()}'
+        if kind == 'glob':
+            globs = ' '.join(self.random.choice(GLOBS) for _ in range(self.random.randint(1, 3)))
+            return self.random.choice([f'echo {globs}', f'ls -d {globs}', f'files={self.random.choice(GLOBS)}'])
+        if kind == 'backtick':
+            return f'{self.random.choice(VARIABLES)}={self.random.choice(SUBSTITUTIONS)}'
+        if kind == 'test':
+            return self.random.choice(TESTS)
+        if self.random.random() < 0.5:
+            return f'{self.random.choice(VARIABLES)}={self.word()}'
+        return self.random.choice(COMMANDS)
+
+    def condition(self):
+        if self.random.random() < 0.8:
+            return self.random.choice(TESTS)
+        return self.simple_command()
+
+    def compound(self, indent, level, budget):
+        # -> the lines of a compound command holding about budget lines
+        inner = indent + '    '
+        body = lambda: self.statements(inner, level + 1, max(1, budget // 2))
+        kind = self.random.choice(['for', 'while', 'if', 'case'])
+        if kind == 'for':
+            items = self.random.choice([self.words(), self.random.choice(GLOBS), '$' + self.random.choice(VARIABLES)])
+            return [f'{indent}for {self.random.choice(VARIABLES)} in {items}', f'{indent}do'] + body() + [f'{indent}done']
+        if kind == 'while':
+            return [f'{indent}while {self.condition()}', f'{indent}do'] + body() + [f'{indent}done']
+        if kind == 'if':
+            lines = [f'{indent}if {self.condition()}', f'{indent}then'] + body()
+            if self.random.random() < 0.3:
+                lines += [f'{indent}elif {self.condition()}', f'{indent}then'] + body()
+            if self.random.random() < 0.5:
+                lines += [f'{indent}else'] + body()
+            return lines + [f'{indent}fi']
+        lines = [f'{indent}case ${self.random.choice(VARIABLES)} in']
+        for pattern in self.random.sample(['alpha', 'b*', '[0-9]', 'one|two', '*.txt'], 2) + ['*']:
+            lines += [f'{inner}{pattern})'] + self.statements(inner + '    ', level + 1, max(1, budget // 3))
+            lines += [f'{inner}    ;;']
+        return lines + [f'{indent}esac']
+
+    def statements(self, indent, level, budget):
+        # -> about budget lines of statements at the given nesting level
+        lines = []
+        while len(lines) < budget:
+            if level < self.depth and self.random.random() < self.nesting:
+                lines += self.compound(indent, level, min(budget - len(lines), 40))
+            else:
+                lines.append(indent + self.simple_command())
+        return lines
+
+    def script(self, lines):
+        return '\n'.join(['#!/bin/dash'] + self.statements('', 0, lines - 1)) + '\n'
+
+
+def generate_script(lines=1000, depth=3, echo=0.4, glob=0.1, backtick=0.1, test=0.1, seed=0):
+    return ScriptGenerator(depth, echo, glob, backtick, test, seed=seed).script(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Write a synthetic dash script to standard output.')
+    parser.add_argument('--lines', type=int, default=1000, help='about how many lines (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=3, help='deepest nesting (default: %(default)s)')
+    for kind, default in [('echo', 0.4), ('glob', 0.1), ('backtick', 0.1), ('test', 0.1)]:
+        parser.add_argument(f'--{kind}', type=float, default=default, metavar='F',
+                            help=f'share of the simple commands that are {kind}s (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    arguments = parser.parse_args(argv[1:])
+    sys.stdout.write(generate_script(arguments.lines, arguments.depth, arguments.echo, arguments.glob,
+                                     arguments.backtick, arguments.test, arguments.seed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
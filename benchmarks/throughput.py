@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Measure how fast sheepy translates: lines per second and peak memory of
+# translate_line over the statements of a parsed script, and of the whole
+# command line translating the script from a file. The scripts come from
+# synthetic.py, one for each case below, and the median of a few runs counts,
+# which is steadier than the fastest on a busy machine.
+#
+# The results are compared with benchmarks/baseline.json, and the benchmark
+# fails if the throughput of any case drops by more than the threshold; run
+# it with --save to make the results the new baseline. The baseline is only
+# meaningful on the machine it was saved on.
+#
+#   python3 benchmarks/throughput.py [--lines N] [--runs N] [--threshold F] [--save]
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sheepy
+from synthetic import generate_script
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# name -> arguments of generate_script besides the number of lines
+CASES = {
+    'flat': {'depth': 0},
+    'nested': {'depth': 6},
+    'echo': {'echo': 0.9, 'glob': 0, 'backtick': 0, 'test': 0},
+    'glob': {'echo': 0.2, 'glob': 0.6},
+    'backtick': {'echo': 0.2, 'backtick': 0.6},
+    'test': {'echo': 0.2, 'test': 0.6},
+}
+
+
+def translate(source):
+    # translate the statements of the script with translate_line, as
+    # transpile does -> the seconds it took, without the parsing
+    _, nodes = sheepy.parse_source(source)
+    blocks = list(sheepy.top_level_blocks(nodes))
+    variable_manager = sheepy.VariableManager()
+    import_manager = sheepy.ImportManager()
+    # like timeit, without the garbage collector running at random
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for block in blocks:
+            sheepy.translate_block(block, variable_manager, import_manager)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def translate_peak(source):
+    # -> the most memory translate used at once, in KiB
+    tracemalloc.start()
+    try:
+        translate(source)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_cli(path):
+    # translate the script with the command line -> (seconds, peak RSS in KiB)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'sheepy.py'), path],
+                               stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f'sheepy.py {path} exited with status {process.returncode}')
+    return seconds, usage.ru_maxrss
+
+
+def measure(name, lines, runs, directory):
+    source = generate_script(lines, **CASES[name])
+    count = source.count('\n')
+    path = os.path.join(directory, f'{name}.sh')
+    with open(path, 'w') as f:
+        f.write(source)
+    translate_seconds = statistics.median(translate(source) for _ in range(runs))
+    cli = [run_cli(path) for _ in range(runs)]
+    return {
+        'translate': {'lines_per_second': round(count / translate_seconds),
+                      'peak_kib': translate_peak(source)},
+        'cli': {'lines_per_second': round(count / statistics.median(seconds for seconds, _ in cli)),
+                'peak_kib': min(peak for _, peak in cli)},
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure the translation throughput of sheepy.')
+    parser.add_argument('--lines', type=int, default=2000, metavar='N',
+                        help='lines of each synthetic script (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5, metavar='N',
+                        help='runs of each case, of which the median counts (default: %(default)s)')
+    parser.add_argument('--threshold', type=float, default=0.3, metavar='F',
+                        help='the largest drop in throughput from the baseline that passes '
+                             '(default: %(default)s)')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH, metavar='FILE',
+                        help='the baseline to compare with or save (default: benchmarks/baseline.json)')
+    arguments = parser.parse_args(argv[1:])
+
+    baseline = None
+    if not arguments.save and os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        if baseline['lines'] != arguments.lines:
+            print(f"the baseline is for scripts of {baseline['lines']} lines, not comparing", file=sys.stderr)
+            baseline = None
+
+    results = {}
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for name in CASES:
+            results[name] = measure(name, arguments.lines, arguments.runs, directory)
+            for stage in ('translate', 'cli'):
+                result = results[name][stage]
+                line = (f"{name:9} {stage:9} {result['lines_per_second']:8} lines/s "
+                        f"{result['peak_kib']:7} KiB peak")
+                if baseline and name in baseline['cases']:
+                    before = baseline['cases'][name][stage]
+                    change = result['lines_per_second'] / before['lines_per_second'] - 1
+                    ok = change >= -arguments.threshold
+                    failed += not ok
+                    line = f"{'ok' if ok else 'FAIL':4} {line}  {change:+.0%} throughput, " \
+                           f"{result['peak_kib'] - before['peak_kib']:+} KiB"
+                print(line)
+
+    if arguments.save:
+        with open(arguments.baseline, 'w') as f:
+            json.dump({'lines': arguments.lines, 'python': sys.version.split()[0], 'cases': results}, f, indent=2)
+            f.write('\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
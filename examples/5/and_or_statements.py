@@ -0,0 +1,205 @@
+#!/usr/bin/env python3 -u
+import os
+import subprocess
+import sys
+
+
+def sheepy_error(command, message, status=1):
+    # a buffered stdout is written out first, to keep the order of the two
+    sys.stdout.flush()
+    print(f'{command}: {message}', file=sys.stderr)
+    return status
+
+
+def sheepy_cd(directory):
+    # cd where its status is used: an error message and status 2 for a
+    # directory it can't change to, as dash has
+    try:
+        os.chdir(directory)
+    except OSError:
+        return sheepy_error(sys.argv[0], f"cd: can't cd to {directory}", 2)
+    return 0
+
+
+def sheepy_stdin(state=['', b'', iter(())]):
+    # what has been read of stdin and not used yet by read: the text of
+    # whole lines, then the bytes after them, and before both the lines a
+    # while read loop has split off, which any read takes first
+    return state
+
+
+def sheepy_stdin_more(state):
+    # read another block of stdin into state -> False at the end of it
+    sys.stdout.flush()
+    data = sys.stdin.buffer.read1(65536)
+    if data:
+        data = state[1] + data
+        end = data.rfind(b'\n') + 1
+    elif state[1]:
+        # a line without a newline at the end of the input is whole too
+        data = state[1]
+        end = len(data)
+    else:
+        return False
+    state[0] += data[:end].decode(sys.stdin.encoding, sys.stdin.errors)
+    state[1] = data[end:]
+    return True
+
+
+def sheepy_read_line(raw):
+    # the next line of stdin for read without its newline, and whether it
+    # had one; unless raw a backslash at its end continues it on the next
+    state = sheepy_stdin()
+    state[0] = ''.join(text + '\n' for text in state[2]) + state[0]
+    line = ''
+    while True:
+        end = state[0].find('\n')
+        if end < 0:
+            if sheepy_stdin_more(state):
+                continue
+            line += state[0]
+            state[0] = ''
+            return line, False
+        part = state[0][:end]
+        state[0] = state[0][end + 1:]
+        if not raw and (len(part) - len(part.rstrip('\\'))) % 2:
+            line += part + '\n'
+            continue
+        return line + part, True
+
+
+def sheepy_read_split(line, count, raw, ifs):
+    # the values read gives count variables: the fields of the line between
+    # spaces and tabs, the last variable taking the rest of it, or all of
+    # the line with an empty IFS
+    if not raw and '\\' in line:
+        return sheepy_read_escaped(line, count, ifs)
+    if not ifs:
+        return [line] + [''] * (count - 1)
+    if line.isprintable():
+        # no tab or other white space than spaces, which str.split sees
+        # the same way then
+        values = line.split(None, count - 1)
+        if len(values) == count:
+            values[-1] = values[-1].rstrip(' ')
+            return values
+        return values + [''] * (count - len(values))
+    line = line.strip(' \t')
+    spaced = line.replace('\t', ' ')
+    values = []
+    start = 0
+    while len(values) < count - 1:
+        end = spaced.find(' ', start)
+        if end < 0:
+            break
+        values.append(line[start:end])
+        start = len(line) - len(spaced[end:].lstrip(' '))
+    values.append(line[start:])
+    return values + [''] * (count - len(values))
+
+
+def sheepy_read_escaped(line, count, ifs):
+    # sheepy_read_split for a line where a backslash quotes the character
+    # after it, or joins the next line; like dash, only the runs of the line
+    # between quoted characters are searched for separators, so a quoted
+    # character doesn't end the trailing separators of the last value
+    text = ''
+    runs = []
+    begin = index = 0
+    while True:
+        end = line.find('\\', index)
+        if end < 0:
+            text += line[index:]
+            break
+        text += line[index:end]
+        runs.append((begin, len(text)))
+        text += line[end + 1:end + 2].replace('\n', '')
+        begin = len(text)
+        index = end + 2
+    runs.append((begin, len(text)))
+    values = []
+    start = 0
+    cut = None
+    left = count
+    for begin, end in runs:
+        spaces = False
+        for index in range(begin, end):
+            separator = text[index] in ifs
+            if not left:
+                # in the last value, where its trailing separators start
+                if not separator:
+                    cut = None
+                elif cut is None:
+                    cut = index
+                continue
+            if spaces:
+                start = index + 1 if separator else index
+                if separator:
+                    continue
+            if not separator:
+                spaces = False
+            elif index == start:
+                start = index + 1
+            else:
+                spaces = True
+                left -= 1
+                if left:
+                    values.append(text[start:index])
+                    start = index + 1
+                else:
+                    cut = index
+    if cut is not None:
+        text = text[:cut]
+    if text[start:]:
+        values.append(text[start:])
+    return values + [''] * (count - len(values))
+
+
+def sheepy_read(count, raw, ifs=' \t\n'):
+    # read as a command: the values of its count variables (the value of
+    # the one) from the next line of stdin, or from what is left of it
+    line, _ = sheepy_read_line(raw)
+    values = sheepy_read_split(line, count, raw, ifs)
+    return values[0] if count == 1 else values
+
+
+def sheepy_read_status(count, raw, ifs=' \t\n'):
+    # read in an and-or list: whether it read a whole line, for its status,
+    # and the values of its variables like sheepy_read
+    line, newline = sheepy_read_line(raw)
+    values = sheepy_read_split(line, count, raw, ifs)
+    return newline, values[0] if count == 1 else values
+
+
+# assignments, cd, echo and read in && and || lists run in the script
+a = 1
+print('a=1')
+if not sheepy_cd('/'):
+    __dir = 'root'
+print(f"{__dir} {os.getcwd()}")
+print('one\ntwo')
+if sheepy_cd('/nonexistent'):
+    print('cd failed')
+sheepy_ok = os.path.isdir('/')
+if sheepy_ok:
+    b = 2
+if sheepy_ok:
+    print(f"b={b}")
+sheepy_ok = os.path.isdir('/nonexistent')
+if sheepy_ok:
+    c = 3
+if not sheepy_ok:
+    c = 4
+print(f"c={c}")
+found = (sheepy_process := subprocess.run('ls /nonexistent 2>/dev/null', shell=True, text=True, stdout=subprocess.PIPE)).stdout.rstrip('\n')
+if sheepy_process.returncode:
+    print(f"nothing found [{found}]")
+sheepy_ok, first = sheepy_read_status(1, False)
+if sheepy_ok:
+    print(f"read [{first}]")
+sheepy_ok, empty = sheepy_read_status(1, False)
+if sheepy_ok and len(empty) == 0:
+    print('read an empty line')
+sheepy_ok, rest = sheepy_read_status(1, False)
+if not sheepy_ok:
+    print(f"no newline after [{rest}]")
@@ -0,0 +1,14 @@
+#!/bin/dash
+# assignments, cd, echo and read in && and || lists run in the script
+a=1 && echo "a=$a"
+cd / && dir=root
+echo "$dir $(pwd)"
+echo one && echo two || echo never
+cd /nonexistent || echo "cd failed"
+[ -d / ] && b=2 && echo "b=$b"
+[ -d /nonexistent ] && c=3 || c=4
+echo "c=$c"
+found=$(ls /nonexistent 2>/dev/null) || echo "nothing found [$found]"
+read first && echo "read [$first]"
+read empty && [ -z "$empty" ] && echo "read an empty line"
+read rest || echo "no newline after [$rest]"
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3 -u
+x = 5
+y = (x := 6)
+print(f"{y} {x}")
+i = 0
+while (i := i + 1) < 3:
+    print(f"loop {i}")
+print(f"{(x := x + 3)} {x}")
+a = 1
+b = (a := (c := 4))
+print(f"{a} {b} {c}")
@@ -0,0 +1,13 @@
+#!/bin/dash
+x=5
+y=$((x += 1))
+echo $y $x
+i=0
+while [ $((i += 1)) -lt 3 ]
+do
+    echo loop $i
+done
+echo $((x += 3)) $x
+a=1
+b=$((a = c = 4))
+echo $a $b $c
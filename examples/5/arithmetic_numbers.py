@@ -0,0 +1,61 @@
+#!/usr/bin/env python3 -u
+import sys
+
+
+def sheepy_error(command, message, status=1):
+    # a buffered stdout is written out first, to keep the order of the two
+    sys.stdout.flush()
+    print(f'{command}: {message}', file=sys.stderr)
+    return status
+
+
+def sheepy_arithmetic_error(message):
+    # an error in $((...)) exits the script like it does dash
+    sheepy_error(sys.argv[0], message)
+    sys.exit(2)
+
+
+def sheepy_arithmetic_int(value):
+    # the value of a variable in $((...)), read like dash does with strtoimax:
+    # an optional sign and a hexadecimal number after 0x, an octal one after
+    # 0 or a decimal one, with blanks around them; nothing but blanks is 0
+    text = value.strip(' \t\n\v\f\r')
+    if not text:
+        return 0
+    digits = text[1:] if text[0] in '-+' else text
+    base = 16 if digits[:2] in ('0x', '0X') else 8 if digits[:1] == '0' else 10
+    if base == 16:
+        digits = digits[2:]
+    number = None
+    if digits.isascii() and digits.isalnum():
+        try:
+            number = int(digits, base)
+        except ValueError:
+            pass
+    if number is not None and text[0] == '-':
+        number = -number
+    if number is None or not -2 ** 63 <= number < 2 ** 63:
+        sheepy_arithmetic_error(f'Illegal number: {value}')
+    return number
+
+
+def sheepy_div(left, right, expression=None):
+    # integer division truncating toward zero, as in C; dividing by zero in
+    # $((expression)) ends the script, for expr it raises ZeroDivisionError
+    if right == 0 and expression is not None:
+        sheepy_arithmetic_error(f'arithmetic expression: division by zero: "{expression}"')
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+# variables in arithmetic are read as octal after 0 and hexadecimal after 0x
+octal = '010'
+__hex = '0x10'
+blank = ' 12 '
+print('9 32 10')
+n = (sys.argv[1] if len(sys.argv) > 1 else '')
+print(f"{sheepy_arithmetic_int(n) + 1} {sheepy_div(sheepy_arithmetic_int(n), 2, 'n / 2')}")
+zero = 0
+print('before')
+print(str(sheepy_div(sheepy_arithmetic_int(n), 0, 'n / zero')))
+print('not reached')
@@ -0,0 +1,12 @@
+#!/bin/dash
+# variables in arithmetic are read as octal after 0 and hexadecimal after 0x
+octal=010
+hex=0x10
+blank=' 12 '
+echo $((octal + 1)) $((hex * 2)) $((blank - 2))
+n=$1
+echo $((n + 1)) $((n / 2))
+zero=0
+echo before
+echo $((n / zero))
+echo not reached
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3 -u
+import os
+import subprocess
+
+
+class sheepy_files(dict):
+    # the files a loop prints to, path -> open file, which stay open until
+    # the loop ends
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for f in self.values():
+            f.close()
+
+
+def sheepy_file(files, path, mode):
+    # the open file for a > or >> redirect, which > truncates again
+    f = files.get(path)
+    if f is None:
+        # the same file under another name
+        try:
+            status = os.stat(path)
+        except OSError:
+            status = None
+        f = next((other for other in files.values()
+                  if status and os.path.samestat(status, os.fstat(other.fileno()))), None)
+        if f is None:
+            files[path] = open(path, mode)
+            return files[path]
+        files[path] = f
+    if mode == 'w':
+        f.seek(0)
+        f.truncate()
+    return f
+
+
+# echoes in a loop keep regular files open, but not devices
+log = 'loop.log'
+with sheepy_files() as sheepy_outputs:
+    for i in ['1', '2', '3']:
+        with open('/dev/stdout', 'a') as f:
+            print(f"stdout {i}", file=f)
+        with open('/dev/stderr', 'a') as f:
+            print(f"stderr {i}", file=f)
+        with open('loop.log', 'a') as f:
+            print(f"variable {i}", file=f)
+        print(f"literal {i}", file=sheepy_file(sheepy_outputs, 'literal.log', 'a'))
+subprocess.run(['cat', 'loop.log', 'literal.log'])
+subprocess.run(['rm', 'loop.log', 'literal.log'])
@@ -0,0 +1,12 @@
+#!/bin/dash
+# echoes in a loop keep regular files open, but not devices
+log=loop.log
+for i in 1 2 3
+do
+    echo stdout $i >> /dev/stdout
+    echo stderr $i >> /dev/stderr
+    echo variable $i >> "$log"
+    echo literal $i >> literal.log
+done
+cat loop.log literal.log
+rm loop.log literal.log
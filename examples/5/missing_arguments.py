@@ -0,0 +1,10 @@
+#!/usr/bin/env python3 -u
+import os
+import sys
+# positional parameters past the last argument are empty, and ${x-default}
+# only uses the default for a variable that isn't set
+print(f"first: [{(sys.argv[1] if len(sys.argv) > 1 else '')}]")
+print(f"second: [{(sys.argv[2] if len(sys.argv) > 2 else 'none')}] [{((sys.argv[2] if len(sys.argv) > 2 else '') or 'none')}] [{len(sys.argv[3] if len(sys.argv) > 3 else '')}]")
+empty = ''
+print('empty: [] [default]')
+print(f"environment: [{os.environ.get('SHEEPY_UNSET_VARIABLE', 'unset')}] [{(os.environ.get('SHEEPY_UNSET_VARIABLE', '') or 'default')}]")
@@ -0,0 +1,8 @@
+#!/bin/dash
+# positional parameters past the last argument are empty, and ${x-default}
+# only uses the default for a variable that isn't set
+echo "first: [$1]"
+echo "second: [${2-none}] [${2:-none}] [${#3}]"
+empty=
+echo "empty: [${empty-unset}] [${empty:-default}]"
+echo "environment: [${SHEEPY_UNSET_VARIABLE-unset}] [${SHEEPY_UNSET_VARIABLE:-default}]"
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3 -u
+import sys
+
+
+def sheepy_fields(pieces):
+    # the fields of a word from its pieces of text, each with whether it is
+    # an unquoted expansion, which is split on blanks, unlike the others
+    fields = []
+    field = None
+    for text, split in pieces:
+        if not split:
+            field = (field or '') + text
+            continue
+        words = text.split()
+        if text[:1].isspace() and field is not None:
+            fields.append(field)
+            field = None
+        if words:
+            words[0] = (field or '') + words[0]
+            fields += words[:-1]
+            field = words[-1]
+            if text[-1].isspace():
+                fields.append(field)
+                field = None
+    if field is not None:
+        fields.append(field)
+    return fields
+
+
+# unquoted expansions are split into fields wherever they are in a word
+y = 'a  b'
+print('a bz\na ba b')
+print(' '.join(sheepy_fields([('[', False), ('a  b', False), (']', False), ('a  b', True)])))
+for word in [*['xa', 'bx'], *sheepy_fields([('q r', False), ('a  b', True)])]:
+    print(f"<{word}>")
+empty = ''
+for word in [*[], *sheepy_fields([('', False), ('', True)])]:
+    print(f"<{word}>")
+z = '1 2'
+print('-1 2- 1 2.1 2')
+for word in [*f"{(sys.argv[1] if len(sys.argv) > 1 else '')}{(sys.argv[2] if len(sys.argv) > 2 else '')}".split(), *f"{(sys.argv[1] if len(sys.argv) > 1 else '')}.{(sys.argv[2] if len(sys.argv) > 2 else '')}".split()]:
+    print(f"<{word}>")
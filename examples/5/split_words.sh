@@ -0,0 +1,21 @@
+#!/bin/dash
+# unquoted expansions are split into fields wherever they are in a word
+y='a  b'
+echo ${y}z
+echo $y$y
+echo "[$y]"$y
+for word in x${y}x "q r"$y
+do
+    echo "<$word>"
+done
+empty=
+for word in $empty$empty "$empty"$empty
+do
+    echo "<$word>"
+done
+z=`echo 1   2`
+echo -$z- $z.$z
+for word in $1$2 $1.$2
+do
+    echo "<$word>"
+done
@@ -1,703 +1,4461 @@
 #! /usr/bin/env python3
 
 import sys
+import argparse
+import ast
+import builtins
+import collections
+import contextlib
+import copy
+import errno
+import glob
+import hashlib
+import io
+import itertools
+import json
 import keyword
+import marshal
+import math
 import re
 import os
+import pickle
+import tempfile
+import threading
+import time
 
+__version__ = '0.3.0'
 
-class LineParser:
 
-    def __init__(self, line, import_manager=None):
-        line = line.rstrip('\n')
-        line = line.strip()
+class ShellSyntaxError(Exception):
+    def __init__(self, message, lineno):
+        super().__init__(f'line {lineno}: {message}')
+        self.lineno = lineno
+
+
+# longest operators first, so that '>>' is not read as two '>'
+OPERATORS = ['<<-', '&&', '||', ';;', '<<', '>>', '<&', '>&', '<>', '>|',
+             ';', '&', '|', '(', ')', '<', '>']
+
+REDIRECT_OPERATORS = {'<', '>', '>>', '<&', '>&', '<>', '>|', '<<', '<<-'}
+
+# characters that end an unquoted word
+WORD_BREAKS = ' \t\n;&|()<>'
+# a run of characters with no special meaning inside a word
+PLAIN_RUN = re.compile(r'[^ \t\n;&|()<>\\\'"$`]+')
+
+SPECIAL_PARAMETERS = '#@*?$!-'
+
+NAME_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+ASSIGNMENT_PATTERN = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)=')
+GLOB_PATTERN = re.compile(r'[*?]|\[[^\]]+\]')
 
-        self.line = ''
-        self.comment = ''
-        self.import_manager = import_manager
-        self.glob_parts = []
 
-        # to separate the line from the comment
-        pattern = r'(\".*?\"|\'.*?\')|(\#.*)'
-        matches = re.findall(pattern, line)
+# ---------------------------------------------------------------------------
+# words
+# ---------------------------------------------------------------------------
 
-        comment = None
-        for match in matches:
-            if match[1]:  # the comment group in the regex
-                comment = match[1]
+class Literal:
+    def __init__(self, text, quoted=False):
+        self.text = text
+        self.quoted = quoted
 
-        if comment is not None:
-            comment_index = line.find(comment)
-            self.line = line[: comment_index]
-            self.comment = line[comment_index:]
+    def shell_text(self):
+        if self.quoted:
+            return "'" + self.text.replace("'", "'\\''") + "'"
+        # keep the globbing characters active, escape everything else
+        return re.sub(r'([^\w@%+=:,./*?\[\]~-])', r'\\\1', self.text)
+
+
+class Parameter:
+    def __init__(self, name, quoted=False, operator=None, argument=''):
+        self.name = name
+        self.quoted = quoted
+        # ${name:-argument}, ${name-argument} and ${#name}
+        self.operator = operator
+        self.argument = argument
+
+    def shell_text(self):
+        if self.operator == '#':
+            text = f'${{#{self.name}}}'
+        elif self.operator:
+            text = f'${{{self.name}{self.operator}{self.argument}}}'
         else:
-            self.line = line
+            text = f'${{{self.name}}}'
+        return f'"{text}"' if self.quoted else text
+
+
+class CommandSubstitution:
+    def __init__(self, command, text, quoted=False):
+        self.command = command  # the parsed Script
+        self.text = text
+        self.quoted = quoted
+        # what lone_command finds, once it has looked
+        self.lone = False
+
+    def shell_text(self):
+        text = f'$({self.text})'
+        return f'"{text}"' if self.quoted else text
+
 
-        self.translate()
+class Arithmetic:
+    def __init__(self, expression, quoted=False):
+        self.expression = expression
+        self.quoted = quoted
+
+    def shell_text(self):
+        return f'$(({self.expression}))'
+
+
+class Word:
+    def __init__(self, parts, lineno=0):
+        self.parts = parts
+        self.lineno = lineno
+        # the text of a word without expansions, or False for one with
+        # them; worked out once, as the translators keep asking
+        self.literal = None
+
+    def is_literal(self):
+        if self.literal is None:
+            self.literal = all(isinstance(part, Literal) for part in self.parts) \
+                and ''.join(part.text for part in self.parts)
+        return self.literal is not False
+
+    def literal_text(self):
+        if self.is_literal():
+            return self.literal
+        return ''.join(part.text for part in self.parts)
+
+    def keyword(self):
+        # the reserved word this word spells, if it is a plain unquoted word
+        if len(self.parts) == 1 and isinstance(self.parts[0], Literal) and not self.parts[0].quoted:
+            return self.parts[0].text
+        return None
 
     def has_glob(self):
-        # check if the line has a globbing pattern
-        if re.search(r'\*[^*]*|\[[^\]]*\]|\?.[^\?]*', self.line):
-            if re.search(r'\'.*\'$', self.line) or re.search(r'".*"$', self.line):
+        for part in self.parts:
+            if isinstance(part, Literal) and not part.quoted and GLOB_PATTERN.search(part.text):
+                return True
+        return False
+
+    def assignment(self):
+        # NAME=value -> (NAME, Word(value)), otherwise None
+        first = self.parts[0]
+        if not isinstance(first, Literal) or first.quoted:
+            return None
+        match = ASSIGNMENT_PATTERN.match(first.text)
+        if not match:
+            return None
+        rest = first.text[match.end():]
+        parts = ([Literal(rest)] if rest else []) + self.parts[1:]
+        return match.group(1), Word(parts, self.lineno)
+
+    def shell_text(self):
+        return ''.join(part.shell_text() for part in self.parts) or "''"
+
+
+# ---------------------------------------------------------------------------
+# syntax tree
+# ---------------------------------------------------------------------------
+
+class Node:
+    lineno = 0
+    col = 0
+    end_lineno = 0
+    end_col = 0
+    comment = ''
+    background = False
+    # what variable_assignments and changed_variables work out for the node
+    changed = None
+    changed_names = None
+
+    def children(self):
+        # the statements directly nested in this node
+        return []
+
+    def shell_text(self):
+        raise NotImplementedError
+
+
+def render_body(body):
+    lines = []
+    for node in body:
+        if isinstance(node, (Comment, BlankLine)):
+            continue
+        lines.append(node.shell_text() + (' &' if node.background else ''))
+    return '\n'.join(lines) or ':'
+
+
+def render_redirects(redirects):
+    return ''.join(' ' + redirect.shell_text() for redirect in redirects)
+
+
+class Comment(Node):
+    def __init__(self, text, lineno=0):
+        self.text = text
+        self.lineno = self.end_lineno = lineno
+
+    def shell_text(self):
+        return self.text
+
+
+class BlankLine(Node):
+    def __init__(self, lineno=0):
+        self.lineno = self.end_lineno = lineno
+
+    def shell_text(self):
+        return ''
+
+
+class Redirect:
+    def __init__(self, operator, target, fd=None):
+        self.operator = operator
+        self.target = target
+        # the redirected file descriptor, 0 for input and 1 for output by default
+        if fd is None:
+            fd = 0 if operator in ('<', '<&', '<>') else 1
+        self.fd = fd
+
+    def shell_text(self):
+        return f'{self.fd}{self.operator}{self.target.shell_text()}'
+
+
+class SimpleCommand(Node):
+    # with the link option, the statements of the script a . command
+    # sources, or the LinkedScript an sh command runs
+    sourced = None
+    script = None
+
+    def __init__(self, lineno=0):
+        self.assignments = []  # (name, Word)
+        self.words = []
+        self.redirects = []
+        self.lineno = self.end_lineno = lineno
+        # the command name when it is known at translate time, set once the
+        # words are parsed
+        self.name = None
+
+    def children(self):
+        # a sourced script runs in the current shell
+        return self.sourced or []
+
+    def shell_text(self):
+        fields = [f'{name}={value.shell_text()}' for name, value in self.assignments]
+        fields += [word.shell_text() for word in self.words]
+        return ' '.join(fields) + render_redirects(self.redirects)
+
+
+class Pipeline(Node):
+    def __init__(self, commands, negated=False, lineno=0):
+        self.commands = commands
+        self.negated = negated
+        self.lineno = lineno
+
+    def children(self):
+        return self.commands
+
+    def shell_text(self):
+        text = ' | '.join(command.shell_text() for command in self.commands)
+        return '! ' + text if self.negated else text
+
+
+class AndOrList(Node):
+    def __init__(self, pipelines, operators, lineno=0):
+        self.pipelines = pipelines
+        self.operators = operators  # '&&' or '||' between each pipeline
+        self.lineno = lineno
+
+    def children(self):
+        return self.pipelines
+
+    def shell_text(self):
+        text = self.pipelines[0].shell_text()
+        for operator, pipeline in zip(self.operators, self.pipelines[1:]):
+            text += f' {operator} {pipeline.shell_text()}'
+        return text
+
+
+class IfClause(Node):
+    def __init__(self, lineno=0):
+        self.branches = []  # (condition statements, body statements)
+        self.else_body = None
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        nodes = []
+        for condition, body in self.branches:
+            nodes += condition + body
+        return nodes + (self.else_body or [])
+
+    def shell_text(self):
+        text = ''
+        for i, (condition, body) in enumerate(self.branches):
+            text += 'if ' if i == 0 else '\nelif '
+            text += f'{render_body(condition)}\nthen\n{render_body(body)}'
+        if self.else_body is not None:
+            text += f'\nelse\n{render_body(self.else_body)}'
+        return text + '\nfi' + render_redirects(self.redirects)
+
+
+class ForLoop(Node):
+    def __init__(self, variable, words, lineno=0):
+        self.variable = variable
+        self.words = words  # None when iterating over "$@"
+        self.body = []
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        return self.body
+
+    def shell_text(self):
+        text = f'for {self.variable}'
+        if self.words is not None:
+            text += ' in ' + ' '.join(word.shell_text() for word in self.words)
+        return f'{text}\ndo\n{render_body(self.body)}\ndone' + render_redirects(self.redirects)
+
+
+class WhileLoop(Node):
+    def __init__(self, until=False, lineno=0):
+        self.condition = []
+        self.body = []
+        self.until = until
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        return self.condition + self.body
+
+    def shell_text(self):
+        keyword_ = 'until' if self.until else 'while'
+        return (f'{keyword_} {render_body(self.condition)}\ndo\n{render_body(self.body)}\ndone'
+                + render_redirects(self.redirects))
+
+
+class CaseClause(Node):
+    def __init__(self, word, lineno=0):
+        self.word = word
+        self.items = []  # (patterns, body statements)
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        return [node for _, body in self.items for node in body]
+
+    def shell_text(self):
+        text = f'case {self.word.shell_text()} in'
+        for patterns, body in self.items:
+            text += '\n' + '|'.join(pattern.shell_text() for pattern in patterns)
+            text += f')\n{render_body(body)}\n;;'
+        return text + '\nesac' + render_redirects(self.redirects)
+
+
+class BraceGroup(Node):
+    def __init__(self, lineno=0):
+        self.body = []
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        return self.body
+
+    def shell_text(self):
+        return '{\n' + render_body(self.body) + '\n}' + render_redirects(self.redirects)
+
+
+class Subshell(Node):
+    def __init__(self, lineno=0):
+        self.body = []
+        self.redirects = []
+        self.lineno = lineno
+
+    def children(self):
+        # assignments inside a subshell never reach the script
+        return []
+
+    def shell_text(self):
+        return '(\n' + render_body(self.body) + '\n)' + render_redirects(self.redirects)
+
+
+class Script(Node):
+    def __init__(self, body):
+        self.body = body
+
+    def children(self):
+        return self.body
+
+    def shell_text(self):
+        return render_body(self.body)
+
+
+def exits(node):
+    # whether the statement always ends the script
+    return isinstance(node, SimpleCommand) and node.name == 'exit' and not node.background
+
+
+def reachable(nodes):
+    # the statements up to the first exit, as none after it ever run
+    for node in nodes:
+        yield node
+        if exits(node):
+            return
+
+
+def walk(node):
+    # yield the node and every statement nested in it
+    yield node
+    for child in node.children():
+        yield from walk(child)
+
+
+def assigned_variables(node):
+    # the shell variables a statement can assign in the current shell
+    names = []
+    for child in walk(node):
+        if isinstance(child, SimpleCommand):
+            names += command_assignments(child)
+        elif isinstance(child, ForLoop):
+            names.append(child.variable)
+    return names
+
+
+def command_assignments(command):
+    # the variables a simple command assigns in the current shell
+    if not command.words:
+        return [name for name, _ in command.assignments]
+    if command.name == 'read':
+        return [word.literal_text() for word in command.words[1:]
+                if word.is_literal() and NAME_PATTERN.fullmatch(word.literal_text())]
+    return []
+
+
+def changed_variables(node):
+    # the variables a statement can change
+    if node.changed_names is None:
+        node.changed_names = list(dict.fromkeys(name for name, _ in variable_assignments(node)))
+    return node.changed_names
+
+
+def variable_assignments(node):
+    # (name, value) for each assignment a statement can make in the current
+    # shell: the Word assigned, $((...)) for an arithmetic assignment, or
+    # None for read and for; worked out once for each statement, as every
+    # statement it is nested in asks again
+    if node.changed is None:
+        words = [redirect.target for redirect in getattr(node, 'redirects', [])]
+        assignments = []
+        if isinstance(node, SimpleCommand):
+            if not node.words:
+                assignments = list(node.assignments)
+            else:
+                assignments = [(name, None) for name in command_assignments(node)]
+            words += node.words + [value for _, value in node.assignments]
+        elif isinstance(node, ForLoop):
+            assignments = [(node.variable, None)]
+            words += node.words or []
+        elif isinstance(node, CaseClause):
+            words += [node.word] + [pattern for patterns, _ in node.items for pattern in patterns]
+        for word in words:
+            for part in word.parts:
+                if isinstance(part, Arithmetic):
+                    assignments += [(name, Word([part])) for name in arithmetic_assignments(part.expression)]
+                elif isinstance(part, CommandSubstitution) and '((' in part.text:
+                    assignments += variable_assignments(part.command)
+        for child in node.children():
+            assignments += variable_assignments(child)
+        node.changed = assignments
+    return node.changed
+
+
+def lone_command(substitution):
+    # the simple command that is all of `...` or $(...), or None
+    if substitution.lone is False:
+        substitution.lone = find_lone_command(substitution)
+    return substitution.lone
+
+
+def find_lone_command(substitution):
+    statements = [node for node in substitution.command.body
+                  if not isinstance(node, (Comment, BlankLine))]
+    command = statements[0] if len(statements) == 1 else None
+    if isinstance(command, SimpleCommand) and command.words and not command.assignments \
+            and not command.redirects and not command.background:
+        return command
+    return None
+
+
+# a decimal integer as the shell prints one
+INTEGER_PATTERN = re.compile(r'0|-?[1-9][0-9]*')
+# the code of an integer constant, negative ones in parentheses
+CONSTANT_PATTERN = re.compile(r'\d+|\(-\d+\)')
+
+
+def integer_word(word, holds_integer):
+    # whether the value of the word is always an integer as the shell prints
+    # one, given holds_integer(name) for the variables that do
+    if word is None:
+        return False
+    if word.is_literal():
+        return INTEGER_PATTERN.fullmatch(word.literal_text()) is not None
+    if len(word.parts) != 1:
+        return False
+    part = word.parts[0]
+    if isinstance(part, Arithmetic):
+        return True
+    if isinstance(part, Parameter):
+        return not part.operator and (part.name in ('#', '$') or holds_integer(part.name))
+    if isinstance(part, CommandSubstitution):
+        command = lone_command(part)
+        return command is not None and command.name == 'expr' and exact_expr(
+            command.words[1:], lambda operand: operand.is_literal() or integer_word(operand, holds_integer))
+    return False
+
+
+# the operators of expr that make integers out of integers
+EXPR_INTEGER_OPERATORS = {'+', '-', '*', '/', '%', '<', '<=', '=', '==', '!=', '>=', '>'}
+
+
+def exact_expr(words, integer_operand):
+    # whether expr always prints an integer for these arguments, without
+    # an error: integer operands, as integer_operand(word) tells, joined by
+    # the arithmetic and comparison operators, in parentheses or not, and
+    # only literal divisors other than 0
+    depth = 0
+    operand = True
+    divisor = False
+    operators = 0
+    for word in words:
+        if word.has_glob():
+            return False
+        text = word.literal_text() if word.is_literal() else None
+        if operand and text == '(' and not divisor:
+            depth += 1
+        elif operand:
+            if text is not None and not re.fullmatch(r'-?\d+', text):
+                return False
+            if divisor and (text is None or not int(text)) or not integer_operand(word):
                 return False
+            operand = divisor = False
+        elif text == ')' and depth:
+            depth -= 1
+        elif text in EXPR_INTEGER_OPERATORS:
+            operators += 1
+            operand = True
+            divisor = text in ('/', '%')
+        else:
+            return False
+    return not operand and not depth and operators > 0
+
+
+def arithmetic_assignments(expression):
+    # the variables assigned in $((expression))
+    tokens = [(match.lastgroup, match[match.lastgroup])
+              for match in ArithmeticTranslator.TOKEN_PATTERN.finditer(expression)]
+    return [text for (kind, text), (next_kind, next_text) in zip(tokens, tokens[1:])
+            if kind == 'name' and next_kind == 'operator' and next_text in ArithmeticTranslator.ASSIGNMENT_OPERATORS]
+
+
+# ---------------------------------------------------------------------------
+# lexer
+# ---------------------------------------------------------------------------
+
+class Token:
+    def __init__(self, kind, value, lineno, col, end_lineno, end_col):
+        self.kind = kind  # WORD, IO_NUMBER, OP, NEWLINE, COMMENT or EOF
+        self.value = value
+        # where the token starts and ends in the script
+        self.lineno = lineno
+        self.col = col
+        self.end_lineno = end_lineno
+        self.end_col = end_col
+
+    def describe(self):
+        if self.kind == 'WORD':
+            return self.value.shell_text()
+        if self.kind in ('NEWLINE', 'EOF'):
+            return 'end of file' if self.kind == 'EOF' else 'newline'
+        return str(self.value)
+
+
+class ShellLexer:
+    # Reads the script one line at a time and scans every character once,
+    # so quotes, expansions, comments and operators are recognised in a
+    # single pass however long the script is.
+
+    def __init__(self, lines, lineno=0, col=0):
+        # lineno is the number of lines before lines, col where to start
+        # in the first of them
+        self.lines = iter(lines)
+        self.lineno = lineno
+        self.line = ''
+        self.pos = 0
+        self._next_line()
+        if col:
+            self.pos = col
+            if self.pos >= len(self.line):
+                self._next_line()
+
+    def _next_line(self):
+        self.line = next(self.lines, '')
+        self.pos = 0
+        if self.line:
+            self.lineno += 1
+            if not self.line.endswith('\n'):
+                self.line += '\n'
+
+    def _peek(self, offset=0):
+        if self.pos + offset < len(self.line):
+            return self.line[self.pos + offset]
+        return ''
+
+    def _advance(self):
+        char = self.line[self.pos] if self.pos < len(self.line) else ''
+        self.pos += 1
+        if self.pos >= len(self.line) and self.line:
+            self._next_line()
+        return char
+
+    def tokens(self):
+        while True:
+            char = self._peek()
+            lineno = self.lineno
+            col = self.pos
+            if char == '':
+                yield Token('EOF', None, lineno, col, lineno, col)
+                return
+            if char in ' \t':
+                self._advance()
+            elif char == '\\' and self._peek(1) == '\n':
+                self._advance()
+                self._advance()
+            elif char == '\n':
+                self._advance()
+                yield Token('NEWLINE', '\n', lineno, col, lineno, col + 1)
+            elif char == '#':
+                comment = self.line[self.pos:].rstrip('\n')
+                self.pos = len(self.line) - 1
+                yield Token('COMMENT', comment, lineno, col, lineno, self.pos)
+            else:
+                operator = self._read_operator()
+                if operator:
+                    yield Token('OP', operator, lineno, col, lineno, self.pos)
+                else:
+                    yield self._read_word()
+
+    def _read_operator(self):
+        if self.line[self.pos] not in ';&|()<>':
+            return None
+        for operator in OPERATORS:
+            if self.line.startswith(operator, self.pos):
+                for _ in operator:
+                    self._advance()
+                return operator
+        return None
+
+    def _read_word(self):
+        lineno = self.lineno
+        col = self.pos
+        parts = []
+        buffer = []
+
+        def flush():
+            if buffer:
+                parts.append(Literal(''.join(buffer)))
+                buffer.clear()
+
+        while True:
+            char = self._peek()
+            if char == '' or char in WORD_BREAKS:
+                break
+            if char == '\\':
+                self._advance()
+                escaped = self._advance()
+                if escaped != '\n':  # a backslash-newline continues the line
+                    flush()
+                    parts.append(Literal(escaped, quoted=True))
+            elif char == "'":
+                flush()
+                parts.append(self._read_single_quotes())
+            elif char == '"':
+                flush()
+                parts.extend(self._read_double_quotes())
+            elif char == '$' and self._starts_expansion():
+                flush()
+                parts.append(self._read_dollar(quoted=False))
+            elif char == '`':
+                flush()
+                parts.append(self._read_backticks(quoted=False))
+            else:
+                run = PLAIN_RUN.match(self.line, self.pos)
+                if run:
+                    # the run never includes the newline, so it stays on this line
+                    buffer.append(run.group())
+                    self.pos = run.end()
+                else:
+                    buffer.append(self._advance())
+        flush()
+
+        # 2>file: the digits are the redirected file descriptor
+        if (len(parts) == 1 and isinstance(parts[0], Literal) and not parts[0].quoted
+                and parts[0].text.isdigit() and self._peek() in ('<', '>')):
+            return Token('IO_NUMBER', int(parts[0].text), lineno, col, lineno, self.pos)
+        return Token('WORD', Word(parts, lineno), lineno, col, self.lineno, self.pos)
+
+    def _read_single_quotes(self):
+        lineno = self.lineno
+        self._advance()
+        text = []
+        while self._peek() != "'":
+            if self._peek() == '':
+                raise ShellSyntaxError('unterminated single quote', lineno)
+            text.append(self._advance())
+        self._advance()
+        return Literal(''.join(text), quoted=True)
+
+    def _read_double_quotes(self):
+        lineno = self.lineno
+        self._advance()
+        parts = []
+        buffer = []
+
+        def flush():
+            if buffer:
+                parts.append(Literal(''.join(buffer), quoted=True))
+                buffer.clear()
+
+        while True:
+            char = self._peek()
+            if char == '':
+                raise ShellSyntaxError('unterminated double quote', lineno)
+            if char == '"':
+                self._advance()
+                break
+            if char == '\\':
+                self._advance()
+                escaped = self._advance()
+                if escaped in '$`"\\':
+                    buffer.append(escaped)
+                elif escaped != '\n':
+                    buffer.append('\\' + escaped)
+            elif char == '$' and self._starts_expansion():
+                flush()
+                parts.append(self._read_dollar(quoted=True))
+            elif char == '`':
+                flush()
+                parts.append(self._read_backticks(quoted=True))
+            else:
+                buffer.append(self._advance())
+        flush()
+        # "" is still an (empty) argument
+        return parts or [Literal('', quoted=True)]
+
+    def _starts_expansion(self):
+        following = self._peek(1)
+        return bool(following) and (following in '({' or following in SPECIAL_PARAMETERS
+                                    or following.isalnum() or following == '_')
+
+    def _read_dollar(self, quoted):
+        self._advance()
+        char = self._peek()
+        if char == '(' and self._peek(1) == '(':
+            self._advance()
+            self._advance()
+            return Arithmetic(self._read_arithmetic(), quoted)
+        if char == '(':
+            self._advance()
+            text = self._read_balanced()
+            return CommandSubstitution(parse_shell(text, self.lineno - 1), text, quoted)
+        if char == '{':
+            return self._read_braced_parameter(quoted)
+        if char.isdigit() or char in SPECIAL_PARAMETERS:
+            return Parameter(self._advance(), quoted)
+        name = []
+        while self._peek().isalnum() or self._peek() == '_':
+            name.append(self._advance())
+        return Parameter(''.join(name), quoted)
+
+    def _read_braced_parameter(self, quoted):
+        lineno = self.lineno
+        self._advance()
+        text = []
+        while self._peek() != '}':
+            if self._peek() in ('', '\n'):
+                raise ShellSyntaxError('unterminated ${', lineno)
+            text.append(self._advance())
+        self._advance()
+        text = ''.join(text)
+        if text.startswith('#') and len(text) > 1:
+            return Parameter(text[1:], quoted, operator='#')
+        match = re.fullmatch(r'([A-Za-z_][A-Za-z0-9_]*|\d+|[#@*?$!-])(:?[-=+?])?(.*)', text, re.S)
+        if not match or (match.group(3) and not match.group(2)):
+            raise ShellSyntaxError(f'bad substitution ${{{text}}}', lineno)
+        return Parameter(match.group(1), quoted, match.group(2), match.group(3))
+
+    def _read_arithmetic(self):
+        lineno = self.lineno
+        depth = 0
+        text = []
+        while True:
+            char = self._peek()
+            if char == '':
+                raise ShellSyntaxError('unterminated $((', lineno)
+            if char == ')' and depth == 0 and self._peek(1) == ')':
+                self._advance()
+                self._advance()
+                return ''.join(text).strip()
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            text.append(self._advance())
+
+    def _read_balanced(self):
+        # the text of $( ... ), skipping over quoted parentheses
+        lineno = self.lineno
+        depth = 0
+        text = []
+        quote = None
+        while True:
+            char = self._peek()
+            if char == '':
+                raise ShellSyntaxError('unterminated $(', lineno)
+            self._advance()
+            if quote:
+                if char == '\\' and quote == '"':
+                    text.append(char)
+                    char = self._advance()
+                elif char == quote:
+                    quote = None
+            elif char == '\\':
+                text.append(char)
+                char = self._advance()
+            elif char in '\'"':
+                quote = char
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                if depth == 0:
+                    return ''.join(text)
+                depth -= 1
+            text.append(char)
+
+    def _read_backticks(self, quoted):
+        lineno = self.lineno
+        self._advance()
+        text = []
+        while self._peek() != '`':
+            char = self._advance()
+            if char == '':
+                raise ShellSyntaxError('unterminated backtick', lineno)
+            if char == '\\' and self._peek() in '$`\\':
+                char = self._advance()
+            text.append(char)
+        self._advance()
+        text = ''.join(text)
+        return CommandSubstitution(parse_shell(text, lineno - 1), text, quoted)
+
+
+# ---------------------------------------------------------------------------
+# parser
+# ---------------------------------------------------------------------------
+
+class ShellParser:
+    # A recursive descent parser over the lexer's tokens. parse_script() is a
+    # generator, so each top level command is available as soon as its last
+    # token has been read.
+
+    def __init__(self, lexer):
+        self.tokens = lexer.tokens()
+        self.token = next(self.tokens)
+        self.last_lineno = self.token.lineno
+        self.last_col = self.token.col
+
+    def advance(self):
+        token = self.token
+        self.last_lineno = token.end_lineno
+        self.last_col = token.end_col
+        self.token = next(self.tokens)
+        return token
+
+    def at_keyword(self, *names):
+        return self.token.kind == 'WORD' and self.token.value.keyword() in names
+
+    def at_operator(self, *operators):
+        return self.token.kind == 'OP' and self.token.value in operators
+
+    def at_terminator(self, terminators):
+        return self.at_keyword(*terminators) or self.at_operator(*terminators)
+
+    def error(self, message=None):
+        if message is None:
+            message = f"syntax error near unexpected token '{self.token.describe()}'"
+        raise ShellSyntaxError(message, self.token.lineno)
+
+    def expect(self, name):
+        if not (self.at_keyword(name) or self.at_operator(name)):
+            self.error(f"expected '{name}' but found '{self.token.describe()}'")
+        return self.advance()
+
+    def skip_newlines(self):
+        while self.token.kind == 'NEWLINE':
+            self.advance()
+
+    def parse_script(self):
+        yield from self.statements((), newlines=1)
+        if self.token.kind != 'EOF':
+            self.error()
+
+    def statements(self, terminators, newlines=0, stop=None):
+        # yield the statements of a list up to one of the terminators,
+        # with standalone comments and (collapsed) blank lines between them;
+        # stop(token, newlines) can end the list early between statements
+        while True:
+            token = self.token
+            if token.kind == 'EOF' or self.at_terminator(terminators):
+                return
+            if stop is not None and stop(token, newlines):
+                return
+            if token.kind == 'NEWLINE':
+                self.advance()
+                newlines += 1
+                if newlines == 2:
+                    yield self.located(BlankLine(token.lineno), token)
+                continue
+            newlines = 0
+            if token.kind == 'COMMENT':
+                self.advance()
+                yield self.located(Comment(token.value, token.lineno), token)
+                continue
+
+            node = self.parse_and_or()
+            if self.at_operator('&'):
+                self.advance()
+                node.background = True
+            elif self.at_operator(';'):
+                self.advance()
+            trailing = None
+            if self.token.kind == 'COMMENT':
+                trailing = self.advance()
+                if node.comment:
+                    trailing = self.located(Comment(trailing.value, trailing.lineno), trailing)
+                else:
+                    node.comment = trailing.value
+                    trailing = None
+            yield self.located(node, token)
+            if trailing is not None:
+                yield trailing
+
+    def located(self, node, token):
+        # record that the statement runs from token up to the last token read
+        node.lineno = token.lineno
+        node.col = token.col
+        node.end_lineno = self.last_lineno
+        node.end_col = self.last_col
+        return node
+
+    def parse_and_or(self):
+        pipelines = [self.parse_pipeline()]
+        operators = []
+        while self.at_operator('&&', '||'):
+            operators.append(self.advance().value)
+            self.skip_newlines()
+            pipelines.append(self.parse_pipeline())
+        if not operators:
+            return pipelines[0]
+        return AndOrList(pipelines, operators, pipelines[0].lineno)
+
+    def parse_pipeline(self):
+        lineno = self.token.lineno
+        negated = False
+        if self.at_keyword('!'):
+            self.advance()
+            negated = True
+        commands = [self.parse_command()]
+        while self.at_operator('|'):
+            self.advance()
+            self.skip_newlines()
+            commands.append(self.parse_command())
+        if len(commands) == 1 and not negated:
+            return commands[0]
+        return Pipeline(commands, negated, lineno)
+
+    def parse_command(self):
+        if self.at_keyword('if'):
+            node = self.parse_if()
+        elif self.at_keyword('for'):
+            node = self.parse_for()
+        elif self.at_keyword('while', 'until'):
+            node = self.parse_while()
+        elif self.at_keyword('case'):
+            node = self.parse_case()
+        elif self.at_keyword('{'):
+            node = self.parse_group(BraceGroup(self.token.lineno), '{', '}')
+        elif self.at_operator('('):
+            node = self.parse_group(Subshell(self.token.lineno), '(', ')')
+        else:
+            return self.parse_simple_command()
+        while self.token.kind == 'IO_NUMBER' or self.at_operator(*REDIRECT_OPERATORS):
+            node.redirects.append(self.parse_redirect())
+        node.end_lineno = self.last_lineno
+        return node
+
+    def parse_redirect(self):
+        fd = None
+        if self.token.kind == 'IO_NUMBER':
+            fd = self.advance().value
+        if not self.at_operator(*REDIRECT_OPERATORS):
+            self.error()
+        operator = self.advance().value
+        if operator in ('<<', '<<-'):
+            self.error('here-documents are not supported')
+        if self.token.kind != 'WORD':
+            self.error()
+        return Redirect(operator, self.advance().value, fd)
+
+    def parse_simple_command(self):
+        command = SimpleCommand(self.token.lineno)
+        while True:
+            if self.token.kind == 'IO_NUMBER' or self.at_operator(*REDIRECT_OPERATORS):
+                command.redirects.append(self.parse_redirect())
+            elif self.token.kind == 'WORD':
+                word = self.token.value
+                assignment = None if command.words else word.assignment()
+                if assignment:
+                    command.assignments.append(assignment)
+                else:
+                    command.words.append(word)
+                self.advance()
+            else:
+                break
+        if not (command.words or command.assignments or command.redirects):
+            self.error()
+        if self.at_operator('(') and len(command.words) == 1:
+            self.error('function definitions are not supported')
+        if command.words and command.words[0].is_literal():
+            command.name = command.words[0].literal_text()
+        command.end_lineno = self.last_lineno
+        return command
+
+    def parse_if(self):
+        node = IfClause(self.token.lineno)
+        self.advance()
+        while True:
+            condition = list(self.statements(('then',)))
+            self.expect('then')
+            body = list(self.statements(('elif', 'else', 'fi')))
+            node.branches.append((condition, body))
+            if self.at_keyword('elif'):
+                self.advance()
+                continue
+            break
+        if self.at_keyword('else'):
+            self.advance()
+            node.else_body = list(self.statements(('fi',)))
+        self.expect('fi')
+        return node
+
+    def parse_for(self):
+        lineno = self.token.lineno
+        self.advance()
+        if self.token.kind != 'WORD' or not NAME_PATTERN.fullmatch(self.token.value.shell_text()):
+            self.error()
+        node = ForLoop(self.advance().value.literal_text(), None, lineno)
+        self.skip_newlines()
+        if self.at_keyword('in'):
+            self.advance()
+            node.words = []
+            while self.token.kind == 'WORD':
+                node.words.append(self.advance().value)
+        if self.at_operator(';'):
+            self.advance()
+        if self.token.kind == 'COMMENT':
+            node.comment = self.advance().value
+        self.skip_newlines()
+        self.expect('do')
+        node.body = list(self.statements(('done',)))
+        self.expect('done')
+        return node
+
+    def parse_while(self):
+        node = WhileLoop(self.token.value.keyword() == 'until', self.token.lineno)
+        self.advance()
+        node.condition = list(self.statements(('do',)))
+        self.expect('do')
+        node.body = list(self.statements(('done',)))
+        self.expect('done')
+        return node
+
+    def parse_case(self):
+        lineno = self.token.lineno
+        self.advance()
+        if self.token.kind != 'WORD':
+            self.error()
+        node = CaseClause(self.advance().value, lineno)
+        self.skip_newlines()
+        self.expect('in')
+        while True:
+            while self.token.kind in ('NEWLINE', 'COMMENT'):
+                self.advance()
+            if self.at_keyword('esac'):
+                break
+            if self.at_operator('('):
+                self.advance()
+            patterns = []
+            while True:
+                if self.token.kind != 'WORD':
+                    self.error()
+                patterns.append(self.advance().value)
+                if not self.at_operator('|'):
+                    break
+                self.advance()
+            self.expect(')')
+            body = list(self.statements(('esac', ';;')))
+            node.items.append((patterns, body))
+            if not self.at_operator(';;'):
+                break
+            self.advance()
+        self.skip_newlines()
+        self.expect('esac')
+        return node
+
+    def parse_group(self, node, opening, closing):
+        self.expect(opening)
+        node.body = list(self.statements((closing,)))
+        self.expect(closing)
+        return node
+
+
+def parse_shell(source, lineno=0):
+    parser = ShellParser(ShellLexer(source.splitlines(keepends=True), lineno))
+    return Script(list(parser.parse_script()))
+
+
+# ---------------------------------------------------------------------------
+# translators
+# ---------------------------------------------------------------------------
+
+BUILTIN_NAMES = set(dir(builtins))
+
+# names used by the generated code itself, shell variables are renamed around them
+RESERVED_NAMES = {'os', 'sys', 'glob', 'subprocess', 'stat', 'fnmatch', 'errno', 're', 'shutil',
+                  'contextlib', 'functools', 'io', 'mmap', 'threading', 'time'}
+HANDLE_PATTERN = re.compile(r'f\d*')
+
+
+# the exit status of builtins that do nothing else
+CONSTANT_COMMANDS = {'true': 0, ':': 0, 'false': 1}
+
+
+def negate(condition):
+    if condition in ('True', 'False'):
+        return 'False' if condition == 'True' else 'True'
+    if condition.startswith('not ') and ' ' not in condition[4:]:
+        return condition[4:]
+    return f'not ({condition})' if ' ' in condition else f'not {condition}'
+
+
+def fstring_literal(text):
+    # escape text for the inside of f"..."
+    text = text.replace('\\', '\\\\').replace('"', '\\"')
+    text = text.replace('{', '{{').replace('}', '}}')
+    return text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+
+
+def literal_segment(segment):
+    # an expression segment whose code is a string literal is that text
+    kind, code = segment
+    if kind != 'expr' or code[:1] not in ('"', "'"):
+        return segment
+    try:
+        text = ast.literal_eval(code)
+    except (ValueError, SyntaxError):
+        return segment
+    return ('literal', text) if isinstance(text, str) else segment
+
+
+def fstring_safe(code):
+    # f-string replacement fields can't contain these before python 3.12
+    return not any(char in code for char in '\\"#\n')
+
+
+# The functions the generated code can call are defined in sheepy_runtime.py,
+# next to this file, and written at the top of the scripts that use them.
+RUNTIME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sheepy_runtime.py')
+
+
+def runtime_helpers():
+    # -> {name: (modules it uses, helpers it calls, source)} in the order
+    # sheepy_runtime.py defines them, read the first time a script needs one
+    global _runtime_helpers
+    if _runtime_helpers is None:
+        with open(RUNTIME_PATH) as f:
+            source = f.read()
+        modules = set(re.findall(r'^import (\w+)$', source, re.M))
+        modules.update(re.findall(r'^(\w+) = LazyModule\(', source, re.M))
+        definitions = {}
+        for chunk in source.split('\n\n\n'):
+            match = re.search(r'^(?:def|class) (sheepy_\w+)', chunk, re.M)
+            if match:
+                definitions[match.group(1)] = chunk.strip('\n')
+        _runtime_helpers = {}
+        for name, definition in definitions.items():
+            used = set(re.findall(r'\b(\w+)\.', definition)) & modules
+            called = set(re.findall(r'\bsheepy_\w+', definition)) - {name}
+            _runtime_helpers[name] = (tuple(sorted(used)),
+                                      tuple(helper for helper in definitions if helper in called),
+                                      definition)
+    return _runtime_helpers
+
+
+_runtime_helpers = None
+
+
+# commands run by their helper with the native option, and the option
+# letters the helper handles (the mode letters for chmod)
+NATIVE_COMMANDS = {
+    'ls': '1aAd',
+    'pwd': 'P',
+    'rm': 'frR',
+    'touch': 'c',
+    'mkdir': 'p',
+    'chmod': 'rwxXst',
+    'mv': 'f',
+    'cp': 'rRp',
+    'ln': 'sf',
+    'grep': 'qxvcinFE',
+    'fgrep': 'qxvcinFE',
+    'egrep': 'qxvcinFE',
+    'basename': '',
+    'dirname': '',
+}
+
+# the native commands that run as python stages of pipelines
+PIPELINE_STAGES = {
+    'grep': 'sheepy_grep_stage',
+    'fgrep': 'sheepy_fgrep_stage',
+    'egrep': 'sheepy_egrep_stage',
+}
+
+# test operators that look at the file system
+FILE_TEST_OPERATORS = {'-b', '-c', '-d', '-e', '-f', '-g', '-h', '-L', '-p', '-r',
+                       '-s', '-S', '-u', '-w', '-x', '-nt', '-ot', '-ef'}
+
+
+def runs_commands(word):
+    # whether expanding word runs a command substitution
+    for part in word.parts:
+        if isinstance(part, CommandSubstitution):
+            return True
+        text = getattr(part, 'argument', None) or getattr(part, 'expression', '')
+        if '$(' in text or '`' in text:
             return True
+    return False
 
-    def handle_glob(self):
-        if self.has_glob():
-            self.import_manager.add_import('glob')
-            translated_line = self.line
 
-        glob_parts = []
-        # find the globbing patterns in the line
-        for match in re.finditer(r'\*[^*]*|\[[^\]]*\]|\?.[^\?]*', translated_line):
-            glob_parts.append(match.group(0))
-        self.glob_parts = glob_parts
+def file_output(command):
+    # the redirect of an echo that prints to a regular file it opens, or
+    # None; only a literal path can be known not to be a device such as
+    # /dev/stdout or /dev/fd/3, which has to be opened for every write
+    if command.name != 'echo':
+        return None
+    outputs = [redirect for redirect in command.redirects if redirect.fd == 1]
+    if len(outputs) != 1 or outputs[0].operator not in ('>', '>>', '>|'):
+        return None
+    target = outputs[0].target
+    if not target.is_literal() or target.literal_text().startswith('/dev/'):
+        return None
+    return outputs[0]
+
+
+def may_observe_files(node):
+    # whether running node could start a process or look at files, which
+    # sees what the script writes only once its files are flushed
+    if isinstance(node, (Comment, BlankLine)):
+        return False
+    if isinstance(node, Pipeline):
+        return len(node.commands) > 1 or may_observe_files(node.commands[0])
+    if isinstance(node, SimpleCommand):
+        words = node.words + [value for _, value in node.assignments]
+        words += [redirect.target for redirect in node.redirects]
+        if node.background or any(runs_commands(word) for word in words):
+            return True
+        if not node.words:
+            return bool(node.redirects)
+        if node.name == 'echo':
+            # echo >&2 writes to stderr, anything else to a file it opens
+            return any(redirect.fd != 1 or redirect.operator in ('<', '<&', '<>') or
+                       redirect.operator == '>&' and redirect.target.keyword() != '2'
+                       for redirect in node.redirects)
+        if node.name in ('test', '['):
+            return bool(node.redirects) or \
+                any(word.is_literal() and word.literal_text() in FILE_TEST_OPERATORS for word in node.words[1:])
+        return node.name not in ('true', 'false', ':', 'exit', 'read') or bool(node.redirects)
+    if getattr(node, 'redirects', None) or not isinstance(node, (IfClause, ForLoop, WhileLoop, CaseClause, AndOrList, BraceGroup)):
+        return True
+    words = (node.words or []) if isinstance(node, ForLoop) else []
+    if isinstance(node, CaseClause):
+        words = [node.word] + [pattern for patterns, _ in node.items for pattern in patterns]
+    return any(runs_commands(word) for word in words) or any(may_observe_files(child) for child in node.children())
 
-    def translate(self):
-        if self.line and self.line.strip():
-            if self.has_glob():
-                self.handle_glob()
+
+def writes_files(node):
+    # whether node has an echo that prints to a file
+    if isinstance(node, SimpleCommand):
+        return file_output(node) is not None
+    return any(writes_files(child) for child in node.children())
 
 
 class TestOperationTranslator():
-    def __init__(self, condition):
-        self.condition = condition
+    UNARY_OPERATORS = {'-b', '-c', '-d', '-e', '-f', '-g', '-h', '-L', '-n',
+                       '-p', '-r', '-s', '-S', '-u', '-w', '-x', '-z'}
+    INTEGER_OPERATORS = {'-eq': '==', '-ne': '!=', '-lt': '<',
+                         '-le': '<=', '-gt': '>', '-ge': '>='}
+    STRING_OPERATORS = {'=': '==', '==': '==', '!=': '!=', '<': '<', '>': '>'}
+
+    def __init__(self, words, translator):
+        self.words = words
+        self.translator = translator
+        self.pos = 0
 
     def translate(self):
-        # Split the condition into operands and operator
-        # operands = self.condition.split()
-        operands = re.findall(r'[^"\s]\S*|".+?"', self.condition)
-
-        if len(operands) == 3:
-            operand1, operator, operand2 = operands
-        elif len(operands) == 2:
-            operator, operand1 = operands
-            operand2 = None
-        else:
-            return None
+        if not self.words:
+            return 'False'
+        self.pos = 0
+        condition = self._or()
+        if self.pos != len(self.words):
+            raise ShellSyntaxError(
+                f"test: unexpected argument '{self.words[self.pos].shell_text()}'", self.words[0].lineno)
+        return condition
+
+    def _text(self, offset=0):
+        if self.pos + offset < len(self.words) and self.words[self.pos + offset].is_literal():
+            return self.words[self.pos + offset].literal_text()
+        return None
+
+    # -o and -a lists are parenthesized, as the condition can be joined
+    # with others by && and ||
+
+    def _or(self):
+        conditions = [self._and()]
+        while self._text() == '-o':
+            self.pos += 1
+            conditions.append(self._and())
+        return conditions[0] if len(conditions) == 1 else f"({' or '.join(conditions)})"
+
+    def _and(self):
+        conditions = [self._not()]
+        while self._text() == '-a':
+            self.pos += 1
+            conditions.append(self._not())
+        return conditions[0] if len(conditions) == 1 else f"({' and '.join(conditions)})"
+
+    def _not(self):
+        if self._text() == '!' and self.pos + 1 < len(self.words):
+            self.pos += 1
+            return f'not {self._not()}'
+        return self._primary()
+
+    def _primary(self):
+        if self.pos >= len(self.words):
+            raise ShellSyntaxError('test: argument expected', self.words[-1].lineno)
+        if self._text() == '(':
+            self.pos += 1
+            condition = self._or()
+            if self._text() != ')':
+                raise ShellSyntaxError("test: missing ')'", self.words[0].lineno)
+            self.pos += 1
+            return f'({strip_parentheses(condition)})'
+
+        operator = self._text(1)
+        if operator in self.INTEGER_OPERATORS or operator in self.STRING_OPERATORS:
+            if self.pos + 2 < len(self.words):
+                left, right = self.words[self.pos], self.words[self.pos + 2]
+                self.pos += 3
+                return self._binary(left, operator, right)
+
+        operator = self._text()
+        if operator in self.UNARY_OPERATORS and self.pos + 1 < len(self.words):
+            operand = self.translator.string_expression(self.words[self.pos + 1])
+            self.pos += 2
+            return self._unary(operator, operand)
 
-        # check if there are quotes around the first operand
-        if operand1.startswith('"') and operand1.endswith('"'):
-            operand1 = operand1[1:-1]
-
-        if operand2:
-            # check if there are quotes around the second operand
-            if not re.search(r'^".*"$', operand2):
-                if not re.search(r"^'.*'$", operand2):
-                    if not operand2.startswith('$'):
-                        operand2 = f'"{operand2}"'
-
-        if not re.search(r'^".*"$', operand1):
-            if not re.search(r"^'.*'$", operand1):
-                if not operand1.startswith('$'):
-                    operand1 = f"'{operand1}'"
-
-        if operand1 and not operand2:
-            if operand1.startswith('$'):
-                operand1 = operand1.replace('$', '')
-        # translate the operands to python format
-        if operator == '-eq':
-            operator = '=='
-        elif operator == '-ne':
-            operator = '!='
-        elif operator == '-lt':
-            operator = '<'
-        elif operator == '-le':
-            operator = '<='
-        elif operator == '-gt':
-            operator = '>'
-        elif operator == '-ge':
-            operator = '>='
-        elif operator == '=':
-            operator = '=='
-        elif operator == '!=':
-            operator = '!='
-        elif operator == '-b':  # check if the file is a block special file
-            return f"os.path.isblock({operand1})"
-        elif operator == '-c':  # check if the file is a character special file
-            return f"os.path.ischar({operand1})"
-        elif operator == '-d':  # check if the file is a directory
-            return f"os.path.isdir({operand1})"
+        operand = self.translator.string_expression(self.words[self.pos])
+        self.pos += 1
+        return f'{operand} != \'\''
+
+    def _binary(self, left, operator, right):
+        if operator in self.INTEGER_OPERATORS:
+            left = self.translator.integer_expression(left)
+            right = self.translator.integer_expression(right)
+            return f'{left} {self.INTEGER_OPERATORS[operator]} {right}'
+        left = self.translator.string_expression(left)
+        right = self.translator.string_expression(right)
+        return f'{left} {self.STRING_OPERATORS[operator]} {right}'
+
+    def _unary(self, operator, operand):
+        import_manager = self.translator.import_manager
+        if operator == '-n':  # check if the length of the string is not zero
+            return f'len({operand}) != 0'
+        if operator == '-z':  # check if the length of the string is zero
+            return f'len({operand}) == 0'
+
+        import_manager.add_import('os')
+        if operator == '-d':  # check if the file is a directory
+            return f'os.path.isdir({operand})'
         elif operator == '-e':  # check if the file exists
-            return f"os.path.exists({operand1})"
+            return f'os.path.exists({operand})'
         elif operator == '-f':  # check if the file is a regular file
-            return f"os.path.isfile({operand1})"
-        elif operator == '-g':  # check if the file is set-group-id
-            return f"os.path.issetgid({operand1})"
+            return f'os.path.isfile({operand})'
         elif operator == '-h' or operator == '-L':  # check if the file is a symbolic link
-            return f"os.path.islink({operand1})"
-        elif operator == '-n':  # check if the length of the string is not zero
-            return f'len({operand1}) != 0'
-        elif operator == '-p':  # check if the file is a named pipe
-            return f"os.path.isfifo({operand1})"
+            return f'os.path.islink({operand})'
         elif operator == '-r':  # check if the file is readable
-            return f"os.access({operand1}, os.R_OK)"
-        elif operator == '-s':  # check if the file is not empty
-            return f"os.path.getsize({operand1}) > 0"
-        elif operator == '-u':  # check if the file is set-user-id
-            return f"os.path.issetuid({operand1})"
+            return f'os.access({operand}, os.R_OK)'
         elif operator == '-w':  # check if the file is writable
-            return f"os.access({operand1}, os.W_OK)"
+            return f'os.access({operand}, os.W_OK)'
         elif operator == '-x':  # check if the file is executable
-            return f"os.access({operand1}, os.X_OK)"
-        elif operator == '-z':  # check if the length of the string is zero
-            return f'len({operand1}) == 0'
+            return f'os.access({operand}, os.X_OK)'
+        elif operator == '-s':  # check if the file is not empty
+            return f'(os.path.exists({operand}) and os.path.getsize({operand}) > 0)'
+
+        # the remaining tests look at the file mode
+        import_manager.add_import('stat')
+        mode = f'os.stat({operand}).st_mode'
+        checks = {
+            '-b': f'stat.S_ISBLK({mode})',  # block special file
+            '-c': f'stat.S_ISCHR({mode})',  # character special file
+            '-p': f'stat.S_ISFIFO({mode})',  # named pipe
+            '-S': f'stat.S_ISSOCK({mode})',  # socket
+            '-g': f'{mode} & stat.S_ISGID != 0',  # set-group-id
+            '-u': f'{mode} & stat.S_ISUID != 0',  # set-user-id
+        }
+        return f'(os.path.exists({operand}) and {checks[operator]})'
+
+
+def strip_parentheses(code):
+    # remove parentheses around the whole of an expression, except those an
+    # assignment expression needs wherever it is used
+    while code.startswith('(') and code.endswith(')'):
+        depth = 0
+        for i, char in enumerate(code):
+            depth += {'(': 1, ')': -1, '[': 1, ']': -1, '{': 1, '}': -1}.get(char, 0)
+            if depth == 0 and i < len(code) - 1:
+                return code
+            if depth == 1 and char == ':' and code.startswith(':=', i):
+                return code
+        code = code[1:-1]
+    return code
+
+
+def arithmetic_integer(text):
+    # the integer dash reads text as in $((...)), like sheepy_arithmetic_int,
+    # or None if it isn't one
+    text = text.strip(' \t\n\v\f\r')
+    if not text:
+        return 0
+    match = re.fullmatch(r'([-+]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)', text)
+    if match is None:
+        return None
+    sign, digits = match.groups()
+    value = int(digits, 16 if digits[:2] in ('0x', '0X') else 8 if digits[0] == '0' else 10)
+    value = -value if sign == '-' else value
+    return value if -2 ** 63 <= value < 2 ** 63 else None
+
+
+def c_division(left, right):
+    # integer division truncating toward zero, as in C
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+class ArithmeticTranslator():
+    # Compiles $((expression)) to a python integer expression with dash's
+    # semantics: C precedence, division and modulo truncating toward zero,
+    # 1 or 0 for comparisons and logical operators, and assignments.
+    # Constant subexpressions are evaluated while translating.
+    TOKEN_PATTERN = re.compile(r"""\s*(?:
+        (?P<number>0[xX][0-9a-fA-F]+|\d+)
+        |(?P<name>\$\{[A-Za-z_]\w*\}|\$[A-Za-z_]\w*|\$\{[\d#]\}|\$[\d#]|[A-Za-z_]\w*)
+        |(?P<operator><<=|>>=|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&^|]=|[-+*/%<>&^|!~?:=()])
+    )\s*""", re.VERBOSE)
+    BINARY_OPERATORS = [('||',), ('&&',), ('|',), ('^',), ('&',), ('==', '!='),
+                        ('<', '<=', '>', '>='), ('<<', '>>'), ('+', '-'), ('*', '/', '%')]
+    ASSIGNMENT_OPERATORS = {'=', '*=', '/=', '%=', '+=', '-=', '<<=', '>>=', '&=', '^=', '|='}
+
+    def __init__(self, arithmetic, translator):
+        self.expression = arithmetic.expression
+        self.translator = translator
+        self.tokens = []
+        self.pos = 0
+        self.assignment = None
+
+    def translate(self):
+        # -> python code for the value of the expression
+        if not self.expression.strip():
+            return '0'
+        self.tokens = []
+        pos = 0
+        while pos < len(self.expression):
+            match = self.TOKEN_PATTERN.match(self.expression, pos)
+            if match is None or match.end() == pos:
+                self._error()
+            self.tokens.append((match.lastgroup, match[match.lastgroup]))
+            pos = match.end()
+        self.pos = 0
+        code, _ = self._assignment(top=True)
+        if self.pos != len(self.tokens):
+            self._error()
+        return code
+
+    def statement(self):
+        # -> a python statement evaluating the expression for its effects
+        code = self.translate()
+        return self.assignment or code
+
+    def _error(self):
+        raise ShellSyntaxError(f'unsupported arithmetic expression $(({self.expression}))',
+                               self.translator.node.lineno)
+
+    def _peek(self, offset=0):
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset]
+        return (None, None)
+
+    def _operator(self, operators):
+        kind, text = self._peek()
+        if kind == 'operator' and text in operators:
+            self.pos += 1
+            return text
+        return None
+
+    def _expect(self, operator):
+        if self._operator((operator,)) is None:
+            self._error()
+
+    def _constant(self, value):
+        return (str(value) if value >= 0 else f'({value})', value)
+
+    def _assignment(self, top=False):
+        kind, text = self._peek()
+        operator = self._peek(1)
+        if kind == 'name' and not text.startswith('$') and operator[0] == 'operator' \
+                and operator[1] in self.ASSIGNMENT_OPERATORS:
+            self.pos += 2
+            value = self._assignment()
+            if operator[1] != '=':
+                value = self._binary(self._variable(text), operator[1][:-1], value)
+            python_name = self.translator.python_name(text)
+            variable_manager = self.translator.variable_manager
+            variable_manager.add_variable(text, Word([Literal('0')]))
+            if not variable_manager.is_pinned(text):
+                variable_manager.set_integer(text)
+            if variable_manager.is_integer(text):
+                if top:
+                    self.assignment = f'{python_name} = {strip_parentheses(value[0])}'
+                return (f'({python_name} := {strip_parentheses(value[0])})', None)
+            if top:
+                self.assignment = f'{python_name} = str({strip_parentheses(value[0])})'
+            return (f'int({python_name} := str({strip_parentheses(value[0])}))', None)
+        return self._conditional()
+
+    def _conditional(self):
+        condition = self._binary_level(0)
+        if self._operator(('?',)) is None:
+            return condition
+        then = self._assignment()
+        self._expect(':')
+        otherwise = self._conditional()
+        if condition[1] is not None:
+            return then if condition[1] else otherwise
+        return (f'({then[0]} if {condition[0]} else {otherwise[0]})', None)
+
+    def _binary_level(self, level):
+        if level == len(self.BINARY_OPERATORS):
+            return self._unary()
+        left = self._binary_level(level + 1)
+        while True:
+            operator = self._operator(self.BINARY_OPERATORS[level])
+            if operator is None:
+                return left
+            left = self._binary(left, operator, self._binary_level(level + 1))
+
+    def _binary(self, left, operator, right):
+        (left_code, left_value), (right_code, right_value) = left, right
+        if left_value is not None and right_value is not None:
+            value = self._fold(left_value, operator, right_value)
+            if value is not None:
+                return self._constant(value)
+        if operator in ('/', '%'):
+            # python's // and % round toward minus infinity
+            helper = 'sheepy_div' if operator == '/' else 'sheepy_mod'
+            self.translator.import_manager.add_helper(helper)
+            return (f'{helper}({left_code}, {right_code}, {self.expression!r})', None)
+        if operator in ('==', '!=', '<', '<=', '>', '>='):
+            return (f'int({left_code} {operator} {right_code})', None)
+        if operator in ('&&', '||'):
+            joiner = 'and' if operator == '&&' else 'or'
+            return (f'int({left_code} != 0 {joiner} {right_code} != 0)', None)
+        return (f'({left_code} {operator} {right_code})', None)
+
+    def _fold(self, left, operator, right):
+        # the value of a constant operation, or None if it must be left to
+        # the script (a division by zero, or a result dash would overflow)
+        if operator in ('/', '%'):
+            if right == 0:
+                return None
+            quotient = c_division(left, right)
+            value = quotient if operator == '/' else left - right * quotient
+        elif operator in ('<<', '>>'):
+            if not 0 <= right < 64:
+                return None
+            value = left << right if operator == '<<' else left >> right
+        else:
+            value = {
+                '||': lambda: int(left != 0 or right != 0),
+                '&&': lambda: int(left != 0 and right != 0),
+                '|': lambda: left | right, '^': lambda: left ^ right, '&': lambda: left & right,
+                '==': lambda: int(left == right), '!=': lambda: int(left != right),
+                '<': lambda: int(left < right), '<=': lambda: int(left <= right),
+                '>': lambda: int(left > right), '>=': lambda: int(left >= right),
+                '+': lambda: left + right, '-': lambda: left - right, '*': lambda: left * right,
+            }[operator]()
+        return value if -2 ** 63 <= value < 2 ** 63 else None
+
+    def _unary(self):
+        operator = self._operator(('+', '-', '!', '~'))
+        if operator is None:
+            return self._primary()
+        code, value = self._unary()
+        if value is not None:
+            return self._constant({'+': value, '-': -value, '!': int(not value), '~': ~value}[operator])
+        if operator == '+':
+            return (code, None)
+        if operator == '!':
+            return (f'int(not {code})', None)
+        return (f'({operator}{code})', None)
+
+    def _primary(self):
+        kind, text = self._peek()
+        self.pos += 1
+        if kind == 'number':
+            if text[:2] in ('0x', '0X'):
+                return self._constant(int(text, 16))
+            if text.startswith('0') and len(text) > 1:
+                if not re.fullmatch(r'[0-7]+', text):
+                    self._error()
+                return self._constant(int(text, 8))
+            return self._constant(int(text))
+        if kind == 'name':
+            return self._variable(text.strip('${}'))
+        if kind == 'operator' and text == '(':
+            value = self._assignment()
+            self._expect(')')
+            return value
+        self.pos -= 1
+        self._error()
+
+    def _variable(self, name):
+        # a variable's value as an integer, read as dash reads it; an empty
+        # or unset one is 0
+        kind, code = self.translator.substitute_variables(Parameter(name))
+        if kind == 'int':
+            return (code, None)
+        if kind == 'literal':
+            # a known value is folded, unless it isn't a number, which is an
+            # error when the script gets there
+            value = arithmetic_integer(code)
+            if value is not None:
+                return self._constant(value)
+            code = repr(code)
+        self.translator.import_manager.add_helper('sheepy_arithmetic_int')
+        return (f'sheepy_arithmetic_int({code})', None)
+
+
+class ExprTranslator():
+    # Compiles the arguments of expr to a python expression for its output
+    # when it only uses the integer, comparison, | and & operators; the
+    # string operators and anything else are left to the real expr.
+    OPERATORS = [('|',), ('&',), ('<', '<=', '=', '==', '!=', '>=', '>'), ('+', '-'), ('*', '/', '%')]
+    STRING_OPERATORS = {':', 'match', 'substr', 'index', 'length', '+'}
+
+    def __init__(self, words, translator):
+        self.words = words
+        self.translator = translator
+        self.pos = 0
+
+    def translate(self):
+        # -> python code for the output of expr, or None
+        for word in self.words:
+            if word.has_glob() or any(isinstance(part, Parameter) and part.name in ('@', '*') for part in word.parts):
+                return None
+        self.pos = 0
+        try:
+            kind, code = self._level(0)
+        except ValueError:
+            return None
+        if self.pos != len(self.words):
+            return None
+        if kind == 'literal':
+            return None
+        if CONSTANT_PATTERN.fullmatch(code):
+            return repr(code.strip('()'))
+        self.translator.import_manager.add_helper('sheepy_expr')
+        return f'sheepy_expr(lambda: {strip_parentheses(self._value((kind, code)))})'
+
+    def integer(self):
+        # -> python code for the integer expr prints, when its arguments
+        # always make one without an error, or None
+        if not exact_expr(self.words, self._exact_operand):
+            return None
+        self.pos = 0
+        kind, code = self._level(0)
+        return strip_parentheses(code) if kind == 'int' else None
+
+    def _exact_operand(self, word):
+        segments = self.translator.word_segments(word)
+        if len(segments) == 1 and segments[0][0] == 'int':
+            return True
+        return all(kind == 'literal' for kind, _ in segments) and \
+            re.fullmatch(r'-?\d+', ''.join(code for _, code in segments)) is not None
+
+    def _text(self):
+        if self.pos < len(self.words) and self.words[self.pos].is_literal():
+            return self.words[self.pos].literal_text()
+        return None
+
+    def _level(self, level):
+        if level == len(self.OPERATORS):
+            return self._operand()
+        left = self._level(level + 1)
+        while self._text() in self.OPERATORS[level]:
+            operator = self._text()
+            self.pos += 1
+            left = self._binary(left, operator, self._level(level + 1))
+        return left
+
+    def _binary(self, left, operator, right):
+        import_manager = self.translator.import_manager
+        value = self._fold(self._constant(left), operator, self._constant(right))
+        if value is not None:
+            return ('int', str(value) if value >= 0 else f'({value})')
+        if operator in ('|', '&'):
+            helper = 'sheepy_expr_or' if operator == '|' else 'sheepy_expr_and'
+            import_manager.add_helper(helper)
+            return ('value', f'{helper}({self._value(left)}, {self._value(right)})')
+        if operator in self.OPERATORS[2]:
+            # integers compare as numbers, anything else as strings
+            if self._is_integer(left) and self._is_integer(right):
+                operator = '==' if operator == '=' else operator
+                return ('int', f'int({self._integer(left)} {operator} {self._integer(right)})')
+            import_manager.add_helper('sheepy_expr_compare')
+            return ('int', f'sheepy_expr_compare({self._value(left)}, {operator!r}, {self._value(right)})')
+        left, right = self._integer(left), self._integer(right)
+        if operator in ('/', '%'):
+            helper = 'sheepy_div' if operator == '/' else 'sheepy_mod'
+            import_manager.add_helper(helper)
+            return ('int', f'{helper}({left}, {right})')
+        return ('int', f'({left} {operator} {right})')
+
+    def _constant(self, operand):
+        # the integer a known operand is, or None
+        kind, code = operand
+        if kind == 'literal' and self._is_integer(operand) or kind == 'int' and CONSTANT_PATTERN.fullmatch(code):
+            return int(code.strip('()'))
+        return None
+
+    def _fold(self, left, operator, right):
+        # the value of an operation on known integers, or None if it is
+        # left to the script, for an error or a result past 64 bits
+        if left is None or right is None:
+            return None
+        if operator in ('/', '%'):
+            if right == 0:
+                return None
+            quotient = c_division(left, right)
+            value = quotient if operator == '/' else left - right * quotient
+        else:
+            value = {
+                '|': lambda: left if left != 0 else right, '&': lambda: left if left != 0 and right != 0 else 0,
+                '<': lambda: int(left < right), '<=': lambda: int(left <= right),
+                '=': lambda: int(left == right), '==': lambda: int(left == right), '!=': lambda: int(left != right),
+                '>=': lambda: int(left >= right), '>': lambda: int(left > right),
+                '+': lambda: left + right, '-': lambda: left - right, '*': lambda: left * right,
+            }[operator]()
+        return value if -2 ** 63 <= value < 2 ** 63 else None
+
+    def _is_integer(self, operand):
+        kind, code = operand
+        return kind == 'int' or kind == 'literal' and re.fullmatch(r'-?\d+', code) is not None
+
+    def _integer(self, operand):
+        # python code for the operand as an integer
+        kind, code = operand
+        if kind == 'int':
+            return code
+        if kind == 'literal':
+            if not self._is_integer(operand):
+                # the real expr reports the non-integer argument
+                raise ValueError(code)
+            return str(int(code)) if int(code) >= 0 else f'({int(code)})'
+        self.translator.import_manager.add_helper('sheepy_expr_int')
+        return f'sheepy_expr_int({code})'
+
+    def _value(self, operand):
+        # python code for the operand as a string or integer
+        kind, code = operand
+        return repr(code) if kind == 'literal' else code
+
+    def _operand(self):
+        text = self._text()
+        if self.pos >= len(self.words) or text in self.STRING_OPERATORS:
+            raise ValueError(text)
+        if text == '(':
+            self.pos += 1
+            value = self._level(0)
+            if self._text() != ')':
+                raise ValueError(text)
+            self.pos += 1
+            return value
+        word = self.words[self.pos]
+        self.pos += 1
+        if text is not None:
+            return ('literal', text)
+        segments = self.translator.word_segments(word)
+        if all(kind == 'literal' for kind, _ in segments):
+            return ('literal', ''.join(code for _, code in segments))
+        if len(segments) == 1 and segments[0][0] == 'int':
+            return segments[0]
+        return ('value', self.translator.string_expression(word))
+
+
+class ShellTranslator:
+    # the command substitution whose exit status an and-or list uses, and
+    # the condition that is true when it succeeded, once it is translated
+    status_substitution = None
+    substitution_status = None
+
+    def __init__(self, node, variable_manager=None, import_manager=None, options=None):
+        self.node = node
+        self.variable_manager = variable_manager
+        self.import_manager = import_manager
+        self.options = options or {}
+
+    # identify if the word is a keyword or builtin in python
+    def is_keyword_or_builtin(self, word):
+        return keyword.iskeyword(word) or word in BUILTIN_NAMES
+
+    def python_name(self, name):
+        # shell variables that would shadow python names get a __ prefix
+        if self.is_keyword_or_builtin(name) or name in RESERVED_NAMES or HANDLE_PATTERN.fullmatch(name) \
+                or name.startswith('sheepy_'):
+            return f'__{name}'
+        return name
+
+    def translate(self):
+        raise NotImplementedError
+
+    def keep_files_open(self):
+        # a loop that prints to files and runs nothing that could look at
+        # them keeps them open until it ends, instead of opening them for
+        # every line; -> whether this loop is one
+        if self.options.get('files') or may_observe_files(self.node) or not writes_files(self.node):
+            return False
+        self.options = {**self.options, 'files': True}
+        self.import_manager.add_helper('sheepy_files')
+        return True
+
+    def with_files(self, lines):
+        return ['with sheepy_files() as sheepy_outputs:'] + ['    ' + line if line else line for line in lines]
+
+    def translate_body(self, nodes):
+        lines = []
+        for node in reachable(nodes):
+            lines += translate_line(node, '    ', self.variable_manager, self.import_manager, self.options)
+        # drop the blank lines before the end of the block
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if not any(line.strip() and not line.strip().startswith('#') for line in lines):
+            lines.append('    pass')
+        return lines
+
+    # -- words -------------------------------------------------------------
+
+    def substitute_variables(self, parameter):
+        # the python code for $name, as a (kind, code) segment
+        name = parameter.name
+        # a positional parameter or an environment variable can be unset;
+        # their code has {} for what they are then, filled in with unset
+        unset = None
+        if name == '0':
+            self.import_manager.add_import('sys')
+            segment = ('expr', 'sys.argv[0]')
+        elif name.isdigit():
+            self.import_manager.add_import('sys')
+            segment = ('expr', f"(sys.argv[{int(name)}] if len(sys.argv) > {int(name)} else {{}})")
+            unset = "''"
+        elif name == '#':
+            self.import_manager.add_import('sys')
+            segment = ('int', 'len(sys.argv[1:])')
+        elif name in ('@', '*'):
+            self.import_manager.add_import('sys')
+            segment = ('expr', "' '.join(sys.argv[1:])")
+        elif name == '$':
+            self.import_manager.add_import('os')
+            segment = ('int', 'os.getpid()')
+        elif self.variable_manager.is_declared(name):
+            constant = self.variable_manager.constant(name)
+            if constant is not None:
+                return self.substitute_constant(parameter, constant)
+            if self.variable_manager.is_integer(name):
+                segment = ('int', self.python_name(name))
+            else:
+                segment = ('expr', self.python_name(name))
+        else:
+            # never assigned by the script, so it comes from the environment
+            self.import_manager.add_import('os')
+            segment = ('expr', f"os.environ.get({name!r}, {{}})")
+            unset = "''"
+
+        if parameter.operator == '-' and unset is not None:
+            # the default only takes the place of a variable that isn't set
+            return ('expr', segment[1].format(self.string_expression(Word([Literal(parameter.argument)]))))
+        if unset is not None:
+            segment = (segment[0], segment[1].format(unset))
+        if parameter.operator == '#':
+            return ('int', f'len({strip_parentheses(self.segment_string(segment))})')
+        if parameter.operator == '-':
+            # the other variables are always set
+            return segment
+        if parameter.operator == ':-':
+            default = self.string_expression(Word([Literal(parameter.argument)]))
+            return ('expr', f'({self.segment_string(segment)} or {default})')
+        if parameter.operator:
+            raise ShellSyntaxError(
+                f'unsupported substitution {parameter.shell_text()}', self.node.lineno)
+        return segment
+
+    def substitute_constant(self, parameter, text):
+        # $name of a variable whose text is known is that text
+        if parameter.operator == '#':
+            return ('literal', str(len(text)))
+        if parameter.operator == ':-' and not text:
+            return ('expr', self.string_expression(Word([Literal(parameter.argument)])))
+        if parameter.operator not in (None, '-', ':-'):
+            raise ShellSyntaxError(
+                f'unsupported substitution {parameter.shell_text()}', self.node.lineno)
+        return ('literal', text)
+
+    def substitute_backticks(self, substitution):
+        # the python code for `command` or $(command), without trailing newlines
+        command = lone_command(substitution)
+        if command is not None:
+            code = self.substitute_builtin(command)
+            if code is not None:
+                if substitution is self.status_substitution:
+                    self.substitution_status = 'False' if CONSTANT_COMMANDS.get(command.name) else 'True'
+                return code
+        statements = [node for node in substitution.command.body
+                      if not isinstance(node, (Comment, BlankLine))]
+        command = statements[0] if len(statements) == 1 else None
+        self.import_manager.add_import('subprocess')
+        if (isinstance(command, SimpleCommand) and command.words
+                and not command.assignments and not command.redirects):
+            run = self.spawn('run', f'{self.argument_list(command.words)}, text=True, stdout=subprocess.PIPE', command)
+        else:
+            run = self.shell_fallback(substitution.command, 'text=True, stdout=subprocess.PIPE')
+        if substitution is self.status_substitution:
+            run = f'(sheepy_process := {run})'
+            self.substitution_status = 'not sheepy_process.returncode'
+        return f"{run}.stdout.rstrip('\\n')"
+
+    def substitute_builtin(self, command):
+        # the output of a builtin or native command computed in the script,
+        # or None if it has to run as a process
+        words = command.words[1:]
+        if command.name == 'expr':
+            return ExprTranslator(words, self).translate()
+        if command.name in CONSTANT_COMMANDS:
+            return "''"
+        if command.name == 'pwd' and not words:
+            self.import_manager.add_import('os')
+            return 'os.getcwd()'
+        if command.name == 'echo':
+            if words and words[0].keyword() == '-n':
+                words = words[1:]
+            segments = EchoTranslator(command, self.variable_manager, self.import_manager, self.options).output_segments(words)
+            if all(kind == 'literal' for kind, _ in segments):
+                return repr(''.join(code for _, code in segments).rstrip('\n'))
+            return f"{self.format_string(segments)}.rstrip('\\n')"
+        if command.name == 'printf' and words:
+            self.import_manager.add_helper('sheepy_printf')
+            return f"sheepy_printf({self.argument_list(words)}).rstrip('\\n')"
+        if self.is_native(command):
+            helper = f'sheepy_{command.name}'
+            self.import_manager.add_helper('sheepy_capture')
+            self.import_manager.add_helper(helper)
+            return f'sheepy_capture({helper}, {self.argument_list(words)})'
+        return None
+
+    def substitute_arithmetic(self, arithmetic):
+        code = strip_parentheses(ArithmeticTranslator(arithmetic, self).translate())
+        # a constant expression is just text
+        if re.fullmatch(r'-?\d+', code):
+            return ('literal', code)
+        return ('int', code)
+
+    def segment_string(self, segment):
+        kind, code = segment
+        return f'str({strip_parentheses(code)})' if kind == 'int' else code
+
+    def part_segment(self, part):
+        if isinstance(part, Literal):
+            return ('literal', part.text)
+        if isinstance(part, Parameter):
+            return self.substitute_variables(part)
+        if isinstance(part, CommandSubstitution):
+            command = lone_command(part)
+            if command is not None and command.name == 'expr':
+                # an expr that can't fail is its integer
+                code = ExprTranslator(command.words[1:], self).integer()
+                if code is not None:
+                    return ('literal', code) if INTEGER_PATTERN.fullmatch(code) else ('int', code)
+            return ('expr', self.substitute_backticks(part))
+        return self.substitute_arithmetic(part)
+
+    def word_segments(self, word):
+        return [literal_segment(self.part_segment(part)) for part in word.parts]
+
+    def format_string(self, segments):
+        # build f"..." from the segments, or concatenate them if an
+        # expression can't be placed inside an f-string; text without
+        # expressions is a plain string, and a lone expression is itself
+        segments = [literal_segment(segment) for segment in segments]
+        if all(kind == 'literal' for kind, _ in segments):
+            return repr(''.join(code for _, code in segments))
+        segments = [segment for segment in segments if segment != ('literal', '')]
+        if len(segments) == 1:
+            return self.segment_string(segments[0])
+        if all(kind == 'literal' or fstring_safe(code) for kind, code in segments):
+            body = ''.join(fstring_literal(code) if kind == 'literal' else
+                           f'{{{strip_parentheses(code) if kind == "int" else code}}}'
+                           for kind, code in segments)
+            return f'f"{body}"'
+        pieces = [repr(code) if kind == 'literal' else self.segment_string((kind, code))
+                  for kind, code in segments if not (kind == 'literal' and not code)]
+        return ' + '.join(pieces) or "''"
+
+    def string_expression(self, word):
+        # python expression for the string value of a word
+        segments = self.word_segments(word)
+        if len(segments) == 1 and segments[0][0] != 'literal':
+            return self.segment_string(segments[0])
+        if all(kind == 'literal' for kind, _ in segments):
+            return repr(''.join(code for _, code in segments))
+        return self.format_string(segments)
+
+    def integer_code(self, segments):
+        # python code for the int the segments always make, or None
+        if len(segments) == 1 and segments[0][0] == 'int':
+            return strip_parentheses(segments[0][1])
+        text = ''.join(code for kind, code in segments if kind == 'literal')
+        if all(kind == 'literal' for kind, _ in segments) and INTEGER_PATTERN.fullmatch(text):
+            return text
+        return None
+
+    def integer_expression(self, word):
+        segments = self.word_segments(word)
+        text = ''.join(code for kind, code in segments if kind == 'literal')
+        if all(kind == 'literal' for kind, _ in segments) and re.fullmatch(r'-?\d+', text):
+            return str(int(text))
+        if len(segments) == 1 and segments[0][0] == 'int':
+            return segments[0][1]
+        return f'int({self.string_expression(word)})'
+
+    def glob_pattern(self, word):
+        # quoted parts of a pattern match literally
+        segments = []
+        for part in word.parts:
+            if isinstance(part, Literal) and part.quoted:
+                segments.append(('literal', glob.escape(part.text)))
+            else:
+                segments.append(self.part_segment(part))
+        if all(kind == 'literal' for kind, _ in segments):
+            return repr(''.join(code for _, code in segments))
+        return self.format_string(segments)
+
+    def expand_glob(self, word):
+        # a pattern that matches nothing is left as it is
+        self.import_manager.add_helper('sheepy_glob')
+        pattern = self.glob_pattern(word)
+        if word.is_literal():
+            return f'sheepy_glob({pattern}) or [{self.string_expression(word)}]'
+        return f'sheepy_glob({pattern})'
+
+    def is_split_word(self, word):
+        # an unquoted $var, `cmd` or $@ on its own is split into several fields
+        return (len(word.parts) == 1 and not word.parts[0].quoted
+                and isinstance(word.parts[0], (Parameter, CommandSubstitution)))
+
+    def has_split_expansion(self, word):
+        # a word of several parts with an unquoted $var or `cmd` in it, which
+        # is split into fields too, unless it is a pattern
+        return len(word.parts) > 1 and not word.has_glob() and any(
+            not part.quoted and isinstance(part, (Parameter, CommandSubstitution)) for part in word.parts)
+
+    def may_split(self, part):
+        # whether an unquoted expansion can hold blanks that split it: the
+        # output of a command other than an expr always printing an integer,
+        # or a variable that may_contain_spaces
+        if isinstance(part, CommandSubstitution):
+            command = lone_command(part)
+            return command is None or command.name != 'expr' or \
+                ExprTranslator(command.words[1:], self).integer() is None
+        return self.variable_manager.may_contain_spaces(part.name)
+
+    def split_fields(self, word):
+        # the fields of a word has_split_expansion is true for: what its
+        # unquoted expansions give is split on blanks, the rest is kept
+        # -> the list of fields if they are known, otherwise python code for it,
+        # or None when the word is one field all the same
+        segments = self.word_segments(word)
+        # an integer is never blank or empty, so it is one field as it is
+        integers = [kind == 'int' or isinstance(part, CommandSubstitution) and not self.may_split(part)
+                    for part, (kind, _) in zip(word.parts, segments)]
+        splits = [not part.quoted and isinstance(part, (Parameter, CommandSubstitution)) and not integer
+                  for part, integer in zip(word.parts, integers)]
+        if not any(splits):
+            return None
+        if all(split or integer or isinstance(part, Arithmetic) or isinstance(part, Literal) and part.text
+               and not any(char.isspace() for char in part.text)
+               for part, split, integer in zip(word.parts, splits, integers)):
+            # nothing else in the word is blank or empty, so its whole value
+            # can be split
+            if all(kind == 'literal' for kind, _ in segments):
+                return ''.join(code for _, code in segments).split()
+            return f'{self.format_string(segments)}.split()'
+        self.import_manager.add_helper('sheepy_fields')
+        pieces = ', '.join(f'({self.format_string([segment])}, {split})' for segment, split in zip(segments, splits))
+        return f'sheepy_fields([{pieces}])'
+
+    def expand_fields(self, word):
+        # python expression for the list of fields a word expands to,
+        # or None when the word is always exactly one field
+        if word.has_glob():
+            return self.expand_glob(word)
+        if len(word.parts) == 1 and isinstance(word.parts[0], Parameter) and word.parts[0].name in ('@', '*'):
+            self.import_manager.add_import('sys')
+            return 'sys.argv[1:]'
+        if self.is_split_word(word):
+            part = word.parts[0]
+            if isinstance(part, Parameter) and self.variable_manager.is_glob(part.name):
+                self.import_manager.add_helper('sheepy_glob')
+                return f'sheepy_glob({self.string_expression(word)})'
+            if isinstance(part, Parameter) and not part.operator:
+                constant = self.variable_manager.constant(part.name)
+                if constant is not None:
+                    return repr(constant.split())
+                if self.variable_manager.is_integer(part.name):
+                    return None
+            if isinstance(part, CommandSubstitution) and not self.may_split(part):
+                return None
+            return f'{self.string_expression(word)}.split()'
+        if self.has_split_expansion(word):
+            fields = self.split_fields(word)
+            return repr(fields) if isinstance(fields, list) else fields
+        return None
+
+    def argument_list(self, words, split=False):
+        # python list display for the arguments of a command; unquoted
+        # variables are only split into fields when split is set
+        items = []
+        for word in words:
+            unsplit = self.is_split_word(word) or self.has_split_expansion(word)
+            fields = self.expand_fields(word) if split or not unsplit else None
+            if fields is not None:
+                items.append(f'*({fields})' if ' or ' in fields else f'*{fields}')
+            else:
+                items.append(self.string_expression(word))
+        return f"[{', '.join(items)}]"
+
+    # -- commands ----------------------------------------------------------
+
+    def redirect_arguments(self, redirects):
+        # -> (with items, keyword arguments) for subprocess.run, or None
+        # if a redirect can't be expressed that way
+        items = []
+        arguments = {}
+        for redirect in redirects:
+            name = {0: 'stdin', 1: 'stdout', 2: 'stderr'}.get(redirect.fd)
+            target = redirect.target.literal_text() if redirect.target.is_literal() else None
+            if name is None:
+                return None
+            if redirect.operator in ('>&', '<&'):
+                if target == '1' and name == 'stderr':
+                    self.import_manager.add_import('subprocess')
+                    arguments[name] = 'subprocess.STDOUT'
+                elif target == '2' and name == 'stdout':
+                    self.import_manager.add_import('sys')
+                    arguments[name] = 'sys.stderr'
+                else:
+                    return None
+            elif target == '/dev/null':
+                self.import_manager.add_import('subprocess')
+                arguments[name] = 'subprocess.DEVNULL'
+            else:
+                mode = {'<': 'r', '>': 'w', '>|': 'w', '>>': 'a', '<>': 'r+'}[redirect.operator]
+                handle = 'f' if not items else f'f{len(items) + 1}'
+                items.append(f'open({self.string_expression(redirect.target)}, {mode!r}) as {handle}')
+                arguments[name] = handle
+        return items, arguments
+
+    def command_environment(self, assignments):
+        # VAR=value command: the assignments only go to the command's environment
+        self.import_manager.add_import('os')
+        values = ', '.join(f'{name!r}: {self.string_expression(value)}' for name, value in assignments)
+        return f'{{**os.environ, {values}}}'
+
+    def constant_status(self, command):
+        # the exit status of true, false or : when running them can't have
+        # any other effect, otherwise None
+        if command.name not in CONSTANT_COMMANDS or command.assignments or command.redirects:
+            return None
+        if not all(word.is_literal() for word in command.words):
+            return None
+        return CONSTANT_COMMANDS[command.name]
+
+    def is_native(self, command):
+        # whether the native option runs command with its helper
+        if not self.options.get('native') or command.name not in NATIVE_COMMANDS or \
+                command.assignments or command.redirects or command.background:
+            return False
+        letters = NATIVE_COMMANDS[command.name]
+        for word in command.words[1:]:
+            text = word.literal_text() if word.is_literal() else ''
+            if text == '--':
+                break
+            # options the helper would hand straight to the real command
+            if text.startswith('-') and text != '-' and (text.startswith('--') or not set(text[1:]) <= set(letters)):
+                return False
+        return True
+
+    def native_call(self, command):
+        # with the native option, the call of the helper that runs command
+        # in the script, or None if it has to run as a process
+        if not self.is_native(command):
+            return None
+        helper = f'sheepy_{command.name}'
+        self.import_manager.add_helper(helper)
+        return f'{helper}({self.argument_list(command.words[1:])})'
+
+    def script_call(self, command):
+        # with the link option, the call of sheepy_call that runs the
+        # function translated from the script sh runs, or None
+        if command.script is None:
+            return None
+        self.import_manager.add_helper('sheepy_call')
+        return f'sheepy_call({command.script.function}, {self.argument_list(command.words[1:])})'
+
+    def pipeline_call(self, pipeline):
+        # the call of sheepy_pipeline that runs a pipeline of simple
+        # commands, or None if it has to run in /bin/sh; echo and the native
+        # commands that read their input line by line are python stages
+        stages = []
+        for command in pipeline.commands:
+            if not isinstance(command, SimpleCommand) or not command.words or \
+                    command.assignments or command.redirects or command.background:
+                return None
+            if command.name == 'echo':
+                stages.append(f'lambda lines: {EchoTranslator(command, self.variable_manager, self.import_manager, self.options).output()}')
+            elif command.name in PIPELINE_STAGES and self.is_native(command):
+                helper = PIPELINE_STAGES[command.name]
+                self.import_manager.add_helper(helper)
+                stages.append(f'lambda lines: {helper}({self.argument_list(command.words[1:])}, lines)')
+            elif command.name in BUILTIN_TRANSLATORS and command.name not in ('true', 'false'):
+                return None
+            else:
+                stages.append(self.argument_list(command.words))
+        self.import_manager.add_helper('sheepy_pipeline')
+        return self.profile(pipeline, f"sheepy_pipeline([{', '.join(stages)}])")
+
+    def run_command(self, command, arguments=None, function='run'):
+        self.import_manager.add_import('subprocess')
+        arguments = dict(arguments or {})
+        if command.assignments:
+            arguments['env'] = self.command_environment(command.assignments)
+        call = self.argument_list(command.words)
+        for name, value in arguments.items():
+            call += f', {name}={value}'
+        return self.spawn(function, call, command)
+
+    def shell_fallback(self, node, arguments='', function='run', names=None):
+        # hand a construct that isn't translated to /bin/sh, passing the
+        # script's variables it uses, or names, through the environment
+        self.import_manager.add_import('subprocess')
+        text = node.shell_text()
+        if names is None:
+            names = re.findall(r'\$\{?#?([A-Za-z_]\w*)', text)
+        known = [name for name in dict.fromkeys(names) if self.variable_manager.is_assigned(name)]
+        stats = current_translation_stats()
+        if stats is not None:
+            stats.count(self, 'shell_fallbacks')
+        if re.search(r'\$\{?[#@*\d]', text):
+            self.import_manager.add_import('sys')
+            call = f"['sh', '-c', {text!r}, sys.argv[0], *sys.argv[1:]]"
+        else:
+            call = f'{text!r}, shell=True'
+        if known:
+            self.import_manager.add_import('os')
+            values = ', '.join(f'{name!r}: str({self.python_name(name)})' if self.variable_manager.is_integer(name)
+                               else f'{name!r}: {self.python_name(name)}' for name in known)
+            call += f', env={{**os.environ, {values}}}'
+        if arguments:
+            call += ', ' + arguments
+        return self.spawn(function, call, node, shell=True)
+
+    def spawn(self, function, call, node, shell=False):
+        # the subprocess call that starts a child for node; with the
+        # buffered option what the script printed is flushed first, to come
+        # out before anything the child writes
+        if self.options.get('buffered'):
+            self.import_manager.add_helper('sheepy_spawn')
+            return self.profile(node, f'sheepy_spawn(subprocess.{function}, {call})', shell)
+        return self.profile(node, f'subprocess.{function}({call})', shell)
+
+    def profile(self, node, call, shell=False):
+        # with the profile option the call of a function that starts
+        # processes goes through sheepy_profile, which times it under the
+        # line and name of the command, or its text if sh runs it
+        if not self.options.get('profile'):
+            return call
+        if isinstance(node, Pipeline) and not shell:
+            name = ' | '.join(command.name or '?' for command in node.commands)
+        elif isinstance(node, SimpleCommand) and node.name and not shell:
+            name = node.name
+        else:
+            text = ' '.join(node.shell_text().split())
+            name = 'sh -c ' + (text if len(text) <= 40 else text[:37] + '...')
+        self.import_manager.add_helper('sheepy_profile')
+        function, arguments = call.split('(', 1)
+        return f'sheepy_profile({node.lineno or self.node.lineno}, {name!r}, {function}, {arguments}'
+
+    def translate_condition(self, nodes):
+        # python expression that is true when the commands exit with status 0
+        nodes = [node for node in nodes if not isinstance(node, (Comment, BlankLine))]
+        if len(nodes) != 1:
+            return f'not {self.shell_fallback(Script(nodes))}.returncode'
+        return strip_parentheses(self.condition_expression(nodes[0]))
+
+    def condition_expression(self, node):
+        if isinstance(node, AndOrList):
+            condition = self.condition_expression(node.pipelines[0])
+            previous = None
+            for operator, pipeline in zip(node.operators, node.pipelines[1:]):
+                if previous and operator != previous:
+                    condition = f'({condition})'
+                joiner = 'and' if operator == '&&' else 'or'
+                condition = f'{condition} {joiner} {self.condition_expression(pipeline)}'
+                previous = operator
+            return condition
+        if isinstance(node, Pipeline) and node.negated and len(node.commands) == 1:
+            return negate(self.condition_expression(node.commands[0]))
+        if isinstance(node, Pipeline):
+            call = self.pipeline_call(node)
+            if call is not None:
+                return call if node.negated else f'not {call}'
+        if isinstance(node, SimpleCommand) and node.words:
+            status = self.constant_status(node)
+            if status is not None:
+                return 'False' if status else 'True'
+            if node.name in ('test', '[') and not node.redirects:
+                words = node.words[1:]
+                if node.name == '[':
+                    if not words or words[-1].keyword() != ']':
+                        raise ShellSyntaxError("missing ']'", node.lineno)
+                    words = words[:-1]
+                return TestOperationTranslator(words, self).translate()
+            if node.name == 'cd' and not node.assignments and not node.redirects:
+                return f'not {self.cd_status(node)}'
+            call = self.native_call(node)
+            if call is not None:
+                return f'not {call}'
+            # the status of a linked script is only known if it exits
+            if node.script is not None and node.script.exits:
+                return f'not {self.script_call(node)}'
+            redirects = self.redirect_arguments(node.redirects)
+            if redirects is not None and not redirects[0]:
+                return f'not {self.run_command(node, redirects[1])}.returncode'
+        return f'not {self.shell_fallback(node)}.returncode'
+
+    def cd_status(self, command):
+        # the call of sheepy_cd for a cd command whose status is used
+        self.import_manager.add_helper('sheepy_cd')
+        words = command.words[1:]
+        if not words:
+            self.import_manager.add_import('os')
+            return "sheepy_cd(os.path.expanduser('~'))"
+        return f'sheepy_cd({self.string_expression(words[0])})'
+
+    def status_statement(self, node):
+        # an assignment, echo or read in an and-or list has to run in the
+        # script, as it changes the script's variables or output, -> (its
+        # lines, the condition that is true after them if it succeeded), or
+        # None for a command that condition_expression translates
+        if not isinstance(node, SimpleCommand) or node.background:
+            return None
+        managers = (self.variable_manager, self.import_manager, self.options)
+        if not node.words and not node.redirects:
+            # the status of an assignment is that of its last command
+            # substitution, which expr and the native commands don't keep
+            translator = AssignmentTranslator(node, *managers)
+            substitutions = [part for _, value in node.assignments for part in value.parts
+                             if isinstance(part, CommandSubstitution)]
+            if substitutions:
+                command = lone_command(substitutions[-1])
+                if command is not None and (command.name == 'expr' or self.is_native(command)):
+                    return None
+                translator.status_substitution = substitutions[-1]
+            return run_translator(translator), translator.substitution_status or 'True'
+        if node.assignments:
+            return None
+        if node.name == 'echo':
+            lines = run_translator(EchoTranslator(node, *managers))
+            return None if lines is None else (lines, 'True')
+        if node.name == 'read' and not node.redirects:
+            read = ReadTranslator(node, *managers)
+            arguments = read.read_arguments()
+            if arguments is None:
+                return None
+            names, arguments = arguments
+            self.import_manager.add_helper('sheepy_read_status')
+            if not names:
+                return [f'sheepy_ok = sheepy_read_status(1, {arguments})[0]'], 'sheepy_ok'
+            targets = read.targets(names) if len(names) == 1 else f'({read.targets(names)})'
+            return [f'sheepy_ok, {targets} = sheepy_read_status({len(names)}, {arguments})'], 'sheepy_ok'
+        return None
+
+
+class AssignmentTranslator(ShellTranslator):
+
+    def translate(self):
+        lines = []
+        for name, value in self.node.assignments:
+            var = self.python_name(name)
+            segments = self.word_segments(value)
+            integer = self.integer_code(segments)
+            # Save the variable and its value
+            self.variable_manager.add_variable(name, value)
+            if integer is not None and not self.variable_manager.is_pinned(name):
+                self.variable_manager.set_integer(name)
+            if self.variable_manager.is_integer(name):
+                expression = integer if integer is not None else f'int({self.format_string(segments)})'
+            elif len(segments) == 1 and segments[0][0] != 'literal':
+                expression = self.segment_string(segments[0])
+            else:
+                expression = self.format_string(segments)
+            if all(kind == 'literal' for kind, _ in segments):
+                # what follows can use the text instead of the variable
+                self.variable_manager.set_constant(name, ''.join(code for _, code in segments))
+            lines.append(f'{var} = {expression}')
+        return lines
+
+
+class EchoTranslator(ShellTranslator):
+
+    def translate(self):
+        words = self.node.words[1:]
+        end = ''
+        # dash's echo only knows about -n
+        if words and words[0].keyword() == '-n':
+            words = words[1:]
+            end = ", end=''"
+
+        segments = self.output_segments(words)
+
+        output = file_output(self.node) if self.options.get('files') else None
+        if output is not None:
+            # the loop this is in keeps the file open
+            self.import_manager.add_helper('sheepy_file')
+            mode = 'a' if output.operator == '>>' else 'w'
+            redirects = [], {'stdout': f'sheepy_file(sheepy_outputs, {self.string_expression(output.target)}, {mode!r})'}
+        else:
+            redirects = self.redirect_arguments(
+                [redirect for redirect in self.node.redirects if redirect.fd == 1])
+        if redirects is None:
+            return None
+        items, arguments = redirects
+        if 'stdout' in arguments:
+            if arguments['stdout'] == 'subprocess.DEVNULL':
+                return ['pass']
+            end += f", file={arguments['stdout']}"
+
+        text = self.format_string(segments) if segments else ''
+        statement = f'print({text}{end})'.replace('(, ', '(')
+        if items:
+            return [f"with {', '.join(items)}:", '    ' + statement]
+        if arguments.get('stdout') == 'sys.stderr' and self.options.get('buffered'):
+            # the two streams come out in the order they were written
+            return ['sys.stdout.flush()', statement[:-1] + ', flush=True)']
+        return [statement]
+
+    def output_segments(self, words):
+        segments = []
+        for word in words:
+            if segments:
+                segments.append(('literal', ' '))
+            segments += self.echo_segments(word)
+        return segments
+
+    def output(self):
+        # the python stage of a pipeline writing what echo prints
+        words = self.node.words[1:]
+        newline = not (words and words[0].keyword() == '-n')
+        segments = self.output_segments(words if newline else words[1:])
+        if newline:
+            segments.append(('literal', '\n'))
+        self.import_manager.add_helper('sheepy_output')
+        return f"sheepy_output({self.format_string(segments) if segments else repr('')})"
+
+    def echo_segments(self, word):
+        # unquoted expansions are split into fields and joined with a space
+        if word.has_glob():
+            return [('expr', f"' '.join({self.expand_glob(word)})")]
+        if self.is_split_word(word) and not getattr(word.parts[0], 'operator', None):
+            part = word.parts[0]
+            if isinstance(part, Parameter) and not self.variable_manager.is_glob(part.name):
+                constant = self.variable_manager.constant(part.name)
+                if constant is not None:
+                    return [('literal', ' '.join(constant.split()))]
+                if self.variable_manager.is_integer(part.name):
+                    return self.word_segments(word)
+            if self.may_split(part):
+                segment = self.word_segments(word)[0]
+                if segment[0] == 'literal':
+                    return [('literal', ' '.join(segment[1].split()))]
+                return [('expr', f"' '.join({self.segment_string(segment)}.split())")]
+            if isinstance(part, Parameter) and self.variable_manager.is_glob(part.name):
+                return [('expr', f"' '.join({self.expand_fields(word)})")]
+        if self.has_split_expansion(word) and any(
+                self.may_split(part)
+                for part in word.parts if not part.quoted and isinstance(part, (Parameter, CommandSubstitution))):
+            fields = self.split_fields(word)
+            if isinstance(fields, list):
+                return [('literal', ' '.join(fields))]
+            if fields is not None:
+                return [('expr', f"' '.join({fields})")]
+        return self.word_segments(word)
+
+
+
+class ReadTranslator(ShellTranslator):
+    def read_arguments(self):
+        # -> (the variables, the arguments of sheepy_read after their count),
+        # or None if a word isn't literal; IFS= before read leaves the line
+        # whole, other options than -r and other assignments are ignored
+        if not all(word.is_literal() for word in self.node.words[1:]):
+            return None
+        words = [word.literal_text() for word in self.node.words[1:]]
+        names = [word for word in words if not word.startswith('-')]
+        if not all(NAME_PATTERN.fullmatch(name) for name in names):
+            return None
+        arguments = f"{'-r' in words}"
+        if any(name == 'IFS' and value.is_literal() and not value.literal_text()
+               for name, value in self.node.assignments):
+            arguments += ", ''"
+        return names, arguments
+
+    def targets(self, names):
+        for name in names:
+            self.variable_manager.add_variable(name, None)
+        return ', '.join(self.python_name(name) for name in names)
+
+    def translate(self):
+        arguments = self.read_arguments()
+        if arguments is None:
+            return None
+        names, arguments = arguments
+        self.import_manager.add_helper('sheepy_read')
+        if not names:
+            return [f'sheepy_read(1, {arguments})']
+        return [f'{self.targets(names)} = sheepy_read({len(names)}, {arguments})']
+
+
+class CDTranslator(ShellTranslator):
+
+    def translate(self):
+        self.import_manager.add_import('os')
+        words = self.node.words[1:]
+        if not words:
+            return ["os.chdir(os.path.expanduser('~'))"]
+        return [f'os.chdir({self.string_expression(words[0])})']
+
+
+class ExitTranslator(ShellTranslator):
+
+    def translate(self):
+        self.import_manager.add_import('sys')
+        words = self.node.words[1:]
+        status = self.integer_expression(words[0]) if words else '0'
+        return [f'sys.exit({status})']
+
+
+class NoOpTranslator(ShellTranslator):
+    # true, false and : only exit with a constant status
+
+    def translate(self):
+        command = self.node
+        if command.assignments:
+            return None
+        # the arguments are only expanded, for $((...)) assignments
+        statements = []
+        for word in command.words[1:]:
+            if len(word.parts) == 1 and isinstance(word.parts[0], Arithmetic):
+                statements.append(ArithmeticTranslator(word.parts[0], self).statement())
+            elif not word.is_literal():
+                statements.append(self.string_expression(word))
+        redirects = self.redirect_arguments(command.redirects)
+        if redirects is None:
+            return None
+        items, _ = redirects
+        if items:
+            # : >file still creates or truncates the file
+            return [f"with {', '.join(items)}:"] + ['    ' + statement for statement in statements or ['pass']]
+        return statements or ['pass']
+
+
+class CommandTranslator(ShellTranslator):
+    # anything that is not translated by the builtin translators is an external command
+
+    def translate(self):
+        command = self.node
+        call = self.native_call(command)
+        if call is not None:
+            return [call]
+        redirects = self.redirect_arguments(command.redirects)
+        if redirects is None:
+            return [self.shell_fallback(command)]
+        items, arguments = redirects
+        function = 'Popen' if command.background else 'run'
+        statement = self.run_command(command, arguments, function)
+        if items:
+            return [f"with {', '.join(items)}:", '    ' + statement]
+        return [statement]
+
+
+class ConditionalTranslator(ShellTranslator):
+
+    def translate(self):
+        if_lines = []
+        for i, (condition, body) in enumerate(self.node.branches):
+            condition = self._parse_condition(condition)
+            if_lines.append(f"{'if' if i == 0 else 'elif'} {condition}:")
+            if_lines += self.translate_body(body)
+        if self.node.else_body is not None:
+            if_lines.append('else:')
+            if_lines += self.translate_body(self.node.else_body)
+        return if_lines
+
+    def _parse_condition(self, condition):
+        return self.translate_condition(condition)
+
+
+class ForLoopTranslator(ShellTranslator):
+
+    def match_iterator_iterable(self):
+        iterator = self.python_name(self.node.variable)
+        words = self.node.words
+        if words is None:  # for x; do ... iterates over the arguments
+            self.import_manager.add_import('sys')
+            return iterator, 'sys.argv[1:]'
+        if all(word.is_literal() and not word.has_glob() for word in words):
+            return iterator, repr([word.literal_text() for word in words])
+        if len(words) == 1 and self.expand_fields(words[0]) is not None:
+            return iterator, self.expand_fields(words[0])
+        return iterator, self.argument_list(words, split=True)
+
+    def translate(self):
+        files = self.keep_files_open()
+        iterator, iterable = self.match_iterator_iterable()
+        words = self.node.words or []
+        if words and all(word.is_literal() and not word.has_glob() for word in words):
+            # any of the words will do to describe the loop variable's values
+            value = max(words, key=lambda word: bool(re.search(r'\s', word.literal_text())))
+        else:
+            value = None
+        self.variable_manager.add_variable(self.node.variable, value)
+        python_lines = [f'for {iterator} in {iterable}:']
+        python_lines += self.translate_body(self.node.body)
+        return self.with_files(python_lines) if files else python_lines
+
+
+class WhileLoopTranslator(ShellTranslator):
+
+    def match_condition(self):
+        condition = self.translate_condition(self.node.condition)
+        if self.node.until:
+            return negate(condition)
+        return condition
+
+    def read_loop(self):
+        # while read ...; do iterates over the lines of stdin, -> the for
+        # statement and the read that ends the loop, which assigns the
+        # variables too, or None for any other condition
+        conditions = [node for node in self.node.condition if not isinstance(node, (Comment, BlankLine))]
+        if self.node.until or len(conditions) != 1:
+            return None
+        command = conditions[0]
+        if not isinstance(command, SimpleCommand) or not command.words or command.name != 'read' or \
+                command.redirects or command.background:
+            return None
+        read = ReadTranslator(command, self.variable_manager, self.import_manager, self.options)
+        arguments = read.read_arguments()
+        if arguments is None or not arguments[0]:
+            return None
+        names, arguments = arguments
+        self.import_manager.add_helper('sheepy_read_loop')
+        self.import_manager.add_helper('sheepy_read')
+        targets = read.targets(names)
+        return (f'for {targets} in sheepy_read_loop({len(names)}, {arguments}):',
+                f'{targets} = sheepy_read({len(names)}, {arguments})')
 
-        return operand1, operator, operand2
+    def translate(self):
+        files = self.keep_files_open()
+        loop = self.read_loop()
+        python_lines = [loop[0] if loop else f'while {self.match_condition()}:']
+        python_lines += self.translate_body(self.node.body)
+        if loop:
+            python_lines += ['else:', '    ' + loop[1]]
+        return self.with_files(python_lines) if files else python_lines
 
 
-class ShellTranslator:
-    match_pattern = ''
+class CaseTranslator(ShellTranslator):
 
-    def __init__(self, lines, variable_manager=None, import_manager=None):
-        self.shell_lines = lines
-        self.import_manager = import_manager
-        self.variable_manager = variable_manager
-        self.has_backticks_variable = False
+    def translate(self):
+        self.import_manager.add_import('fnmatch')
+        subject = self.string_expression(self.node.word)
+        case_lines = []
+        for patterns, body in self.node.items:
+            if any(pattern.keyword() == '*' for pattern in patterns):
+                case_lines.append('else:' if case_lines else 'if True:')
+                case_lines += self.translate_body(body)
+                break
+            tests = [f'fnmatch.fnmatchcase({subject}, {self.glob_pattern(pattern)})' for pattern in patterns]
+            case_lines.append(f"{'elif' if case_lines else 'if'} {' or '.join(tests)}:")
+            case_lines += self.translate_body(body)
+        return case_lines
 
-    # identify if the word is a keyword or builtin in python
-    def is_keyword_or_builtin(self, word):
-        return keyword.iskeyword(word) or word in dir(__builtins__)
 
-    def get_first_line(self):
-        return self.shell_lines[0].line.strip() if self.shell_lines else None
+class AndOrTranslator(ShellTranslator):
+    # a && b runs b when a succeeds, a || b when it fails. Commands that
+    # change the script's state run as statements, and where one comes
+    # after the start of the list, the status of the list so far is kept
+    # in sheepy_ok to decide whether it runs
 
     def translate(self):
-        translated_script = []
-        for line in self.lines:
-            # Create a translator for the line
-            # Pass a reference to self to the translator, so it can access self.variables
-            translator = self.create_translator_for_line(line, self)
-            translated_line = translator.translate()
-            if translated_line is not None:
-                translated_script.append(translated_line)
-        return '\n'.join(translated_script)
-
-    def substitute_backticks(self, field):
-        self.import_manager.add_import('subprocess')
-        backtick_match = re.search(r'`(.*?)`', field)
-        command = backtick_match.group(1).split()
-        field = f'subprocess.run({command}, text=True, stdout=subprocess.PIPE).stdout'
-        return field
-
-    def substitute_variables(self, field):
-        var_match = re.search(r'\$(\{?[a-zA-Z0-9_@]+\}?)', field)
-        var_match_str = var_match.group(0)
-        var_name = var_match.group(1)
-        if var_name.startswith('{') and var_name.endswith('}'):
-            var_name = var_name.strip('{}')
-        if var_name in self.variable_manager.get_variables():
-            # replace the variable with its value
-            var_value = self.variable_manager.get_variables()[var_name]
-            # if the value is a subprocess command, replace the variable with its value directly
-            if var_value.startswith('subprocess.run'):
-                self.has_backticks_variable = True
-                if self.__class__ .__name__ == 'EchoTranslator':
-                    field = field.replace(
-                        '$' + var_name, f"' '.join({var_name}.strip().split())")
-                else:
-                    field = field.replace('$' + var_name, var_name)
-            # check if the value contains a globbing pattern
-            elif re.search(r'\*[^*]*|\[[^\]]*\]|\?.[^\?]*', var_value):
-                if var_value.startswith('sys.argv'):
-                    field = f'{{{var_name}}}'
-                else:
-                    self.import_manager.add_import('glob')
-                    globbed_files = f"' '.join(sorted(glob.glob({var_name})))"
-                    field = f'{{{globbed_files}}}'
-
-            elif self.__class__.__name__ == 'WhileLoopTranslator' or self.__class__.__name__ == 'ForLoopTranslator' or self.__class__.__name__ == 'ConditionalTranslator':
-                field = field.replace(var_match_str, f'{var_name}')
-            elif self.__class__.__name__ == 'EchoTranslator' or self.__class__.__name__ == 'AssignmentTranslator':
-                field = field.replace(var_match_str, f'{{{var_name}}}')
-            else:
-                field = field.replace(var_match_str, f'{{{var_name}}}')
+        node = self.node
+        lines, condition = self.list_status(node.pipelines[:-1], node.operators[:-1])
+        condition = strip_parentheses(condition)
+        if node.operators[-1] == '||':
+            condition = negate(condition)
+        last = node.pipelines[-1]
+        if condition == 'False':
+            return lines or ['pass']
+        if condition == 'True':
+            return lines + translate_line(last, '', self.variable_manager, self.import_manager, self.options)
+        return lines + [f'if {condition}:'] + self.translate_body([last])
+
+    def list_status(self, pipelines, operators):
+        # -> the lines that run the pipelines of an and-or list, and the
+        # condition, evaluated once after them, that is true if it succeeded
+        statement = self.status_statement(pipelines[0])
+        if statement is None:
+            lines, condition = [], self.condition_expression(pipelines[0])
         else:
-            # if the variable is a python keyword or builtin, add __ to the variable name
-            if self.is_keyword_or_builtin(var_name):
-                field = f'{{__{var_name}}}'
-            elif var_name.isdigit():  # if the field is a number, it is a sys.argv
-                field = 'sys.argv[' + var_name + ']'
-                if self.__class__.__name__ == 'EchoTranslator':
-                    field = f'{{{field}}}'
+            lines, condition = statement
+        previous = None
+        for operator, pipeline in zip(operators, pipelines[1:]):
+            if condition == ('True' if operator == '||' else 'False'):
+                # the list so far has its status, and it never runs
+                continue
+            always = condition == ('True' if operator == '&&' else 'False')
+            statement = self.status_statement(pipeline)
+            if statement is None:
+                if always:
+                    condition = self.condition_expression(pipeline)
                 else:
-                    field = f'{field}'
-                self.import_manager.add_import('sys')
-
-            elif var_name == '@':  # if the field is @, it is a sys.argv
-                field = 'sys.argv[1:]'
-                self.import_manager.add_import('sys')
-            else:
-                # field = f'{{{var_name}}}'
-                pass
-
-        return field
+                    if previous and operator != previous:
+                        condition = f'({condition})'
+                    joiner = 'and' if operator == '&&' else 'or'
+                    condition = f'{condition} {joiner} {self.condition_expression(pipeline)}'
+                previous = operator
+                continue
+            statement_lines, status = statement
+            previous = None
+            if always:
+                lines += statement_lines
+                condition = status
+                continue
+            # it only runs if the list so far lets it, so what it assigns
+            # is unknown after it
+            if condition != 'sheepy_ok':
+                lines.append(f'sheepy_ok = {strip_parentheses(condition)}')
+            if status != 'sheepy_ok' and not (status == 'True' and operator == '&&'):
+                statement_lines.append(f'sheepy_ok = {status}')
+            lines += [f"if {'sheepy_ok' if operator == '&&' else 'not sheepy_ok'}:"]
+            lines += ['    ' + line for line in statement_lines]
+            for name in changed_variables(pipeline):
+                self.variable_manager.forget(name)
+            condition = 'sheepy_ok'
+        return lines, condition
 
 
-class AssignmentTranslator(ShellTranslator):
+class BraceGroupTranslator(ShellTranslator):
 
     def translate(self):
-        line = self.get_first_line()
-        if line and line.strip():
-            pattern = r"^([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*(?:'([^']*)'|\"([^\"]*)\"|([^'\"]*))\s*$"
-            match = re.match(pattern, line)
-            if match:
-                var = match.group(1)
-                single_quotes_val = match.group(2)
-                double_quotes_val = match.group(3)
-                no_quotes_val = match.group(4)
-                value = single_quotes_val or double_quotes_val or no_quotes_val
-
-                if self.is_keyword_or_builtin(var):
-                    var = f'__{var.strip()}'
-                var = var.strip()
-
-                if re.search(r'`(.*?)`', value):
-                    value = self.substitute_backticks(value)
-                    expression = f'{var} = {value}'
-                elif re.search(r'\$\{?[a-zA-Z0-9_@]+\}?', value):
-                    value = self.substitute_variables(value)
-                    if value.startswith('sys.argv'):
-                        expression = f'{var} = {value.strip()}'
-                    else:
-                        expression = f'{var} = f"{value.strip()}"'
-                else:
-                    expression = f'{var} = f"{value.strip()}"'
-                # Save the variable and its value
-                self.variable_manager.add_variable(var, value.strip())
-                return expression
-        return None
-
+        lines = []
+        for node in reachable(self.node.body):
+            lines += translate_line(node, '', self.variable_manager, self.import_manager, self.options)
+        return lines or ['pass']
 
-class EchoTranslator(ShellTranslator):
 
-    def __init__(self, lines, variable_manager=None, import_manager=None):
-        super().__init__(lines, variable_manager, import_manager)
+class SourceTranslator(ShellTranslator):
+    # . runs a linked script in the current shell, so its statements take
+    # the place of the command; one that isn't linked, such as a script
+    # sourcing itself, is left to /bin/sh, there being no . to run, with
+    # every variable of the script, as it can read any of them
 
     def translate(self):
-        line = self.get_first_line()
-        if line and line.startswith('echo'):
-            translated_fields = []
-            # remove the echo, i.e. echo "hello world" -> "hello world"
-            fields = line.split('echo ')[1]
-            fields = self._split_by_quotes(fields)  # split respecting quotes
-
-            for field in fields:
-                if re.search(r'\$\{?[a-zA-Z0-9_@]+\}?', field):
-                    field = self.substitute_variables(field)
-                elif re.search(r'`(.*?)`', field):
-                    field = self.substitute_backticks(field)
-                else:
-                    # escape the nested quotes
-                    field = field.replace('"', r'\"').replace("'", r"\'")
-                    field = f'{field}'
-                translated_fields.append(field)
-
-            combined_fields = ' '.join(translated_fields)
-            if self.shell_lines[0].glob_parts:
-                for glob_part in self.shell_lines[0].glob_parts:
-                    # replace the glob parts in shell line with the python glob line
-                    # e.g. echo *.py -> print(f'{" ".join(sorted(glob.glob("*.py")))}')
-                    combined_fields = combined_fields.replace(
-                        f'{glob_part}', f"{{' '.join(sorted(glob.glob('{glob_part}')))}}")
-                    return f'print(f"{combined_fields}")'
-
-            if self.has_backticks_variable:
-                return f'print({combined_fields})'
-
-            return f'print(f"{combined_fields}")'
-        return None
+        if self.node.sourced is None:
+            return [self.shell_fallback(self.node, names=self.variable_manager.assigned_names())]
+        lines = []
+        for node in reachable(self.node.sourced):
+            lines += translate_line(node, '', self.variable_manager, self.import_manager, self.options)
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if not any(line.strip() and not line.strip().startswith('#') for line in lines):
+            lines.append('pass')
+        return lines
 
-    def _split_by_quotes(self, s):
-        fields = []
-        field = ''
-        quote = None
-        prev_char = None
-        for char in s:
-            if char == quote:  # end of quote
-                quote = None
-            elif quote is not None:  # inside a quote
-                field += char
-            elif char in '"\'':  # start of quote
-                if not re.search(r'glob.glob\(.*\)', s):
-                    quote = char
-                else:
-                    field += char
-            elif char == ' ':  # end of field
-                # ignore multiple spaces when not inside a quote
-                if prev_char != ' ':
-                    fields.append(field)
-                    field = ''
-            else:  # inside a field
-                field += char
-            prev_char = char
-        if field:  # add the last field
-            fields.append(field)
-        return fields
 
+class ScriptTranslator(ShellTranslator):
+    # sh runs a linked script, which is a function of the python script
 
-class ReadTranslator(ShellTranslator):
     def translate(self):
-        line = self.get_first_line()
-        if line and line.startswith('read'):
-            var = line.split()[1]
-            self.variable_manager.add_variable(var, var)
-            return f'{var} = input()'
-        return None
+        return [self.script_call(self.node)]
 
 
-class CDTranslator(ShellTranslator):
+class PipelineTranslator(ShellTranslator):
 
     def translate(self):
-        line = self.get_first_line()
-        if line and line.startswith('cd '):
-            self.import_manager.add_import('os')
-            dir = line[3:]  # remove the cd from the start of line
-            return f'os.chdir({repr(dir)})'
-        return None
+        call = self.pipeline_call(self.node)
+        if call is None:
+            return [self.shell_fallback(self.node)]
+        return [call]
 
 
-class ExitTranslator(ShellTranslator):
+class FallbackTranslator(ShellTranslator):
+    # subshells, redirected compound commands and the pipelines that
+    # sheepy_pipeline can't run are run by /bin/sh
 
     def translate(self):
-        line = self.get_first_line()
-        if line and line.startswith('exit'):
-            self.import_manager.add_import('sys')
-            return f'sys.exit(0)'
-        return None
+        function = 'Popen' if self.node.background else 'run'
+        return [self.shell_fallback(self.node, function=function)]
 
 
-class ConditionalTranslator(ShellTranslator):
-    def __init__(self, lines, variable_manager, import_manager=None):
-        super().__init__(lines, variable_manager, import_manager)
-        self.current_index = 0
+# builtins that are translated to python instead of run as a command
+BUILTIN_TRANSLATORS = {
+    'true': NoOpTranslator,
+    'false': NoOpTranslator,
+    ':': NoOpTranslator,
+    'echo': EchoTranslator,
+    'read': ReadTranslator,
+    'exit': ExitTranslator,
+    'cd': CDTranslator,
+    '.': SourceTranslator,
+}
+
+COMPOUND_TRANSLATORS = {
+    IfClause: ConditionalTranslator,
+    ForLoop: ForLoopTranslator,
+    WhileLoop: WhileLoopTranslator,
+    CaseClause: CaseTranslator,
+    AndOrList: AndOrTranslator,
+    BraceGroup: BraceGroupTranslator,
+    Pipeline: PipelineTranslator,
+}
 
-    def translate(self):
-        if self.shell_lines[self.current_index].line.startswith('if'):
-            return self._translate_if()
-
-    def _parse_condition(self, line):
-        # command is test or [, condition is the rest
-        command, *condition = re.findall(r'[^"\s]\S*|".+?"', line)
-        if command == 'test':
-            # remove the semicolon at the end of the condition
-            if condition[-2].endswith(';'):
-                condition[-2] = condition[-2].strip(';')
-                # remove the 'then' at the end of the condition
-                condition = condition[:-1]
-
-            result = TestOperationTranslator(' '.join(condition)).translate()
-
-            if isinstance(result, tuple):
-                operand1, operator, operand2 = result
-                variable_pattern = re.compile(r'\$[a-zA-Z0-9_@]+')
-                if re.search(variable_pattern, operand1):
-                    operand1 = self.substitute_variables(operand1)
-
-                if operand2 and re.search(variable_pattern, operand2):
-                    operand2 = self.substitute_variables(operand2)
-
-                return f'{operand1} {operator} {operand2}'
-            elif isinstance(result, str):
-                self.import_manager.add_import('os')
-                return result
 
+def create_translator(node, variable_manager, import_manager, options=None):
+    if isinstance(node, SimpleCommand):
+        if not node.words and not node.redirects:
+            Translator = AssignmentTranslator
+        elif node.script is not None:
+            Translator = ScriptTranslator
+        elif node.background or node.name not in BUILTIN_TRANSLATORS:
+            Translator = CommandTranslator
         else:
-            return ''
+            Translator = BUILTIN_TRANSLATORS[node.name]
+    elif getattr(node, 'redirects', None) or node.background:
+        Translator = FallbackTranslator
+    else:
+        Translator = COMPOUND_TRANSLATORS.get(type(node), FallbackTranslator)
+    return Translator(node, variable_manager, import_manager, options)
 
-    def _translate_if(self):
-        if_lines = []
-        while self.current_index < len(self.shell_lines):
-            line = self.shell_lines[self.current_index].line.strip()
-            if line.startswith('if'):
-                condition = self._parse_condition(line.split(' ', 1)[1])
-                if_lines.append(f'if {condition}:')
-            elif line.startswith('elif'):
-                condition = self._parse_condition(line.split(' ', 1)[1])
-                if_lines.append(f'elif {condition}:')
-            elif line.startswith('else'):
-                if_lines.append('else:')
-            elif line.startswith('fi'):
-                self.current_index += 1
-                break
-            elif line.startswith('then'):
-                self.current_index += 1
-                continue
-            else:
-                translated_line, _ = translate_line(
-                    self.shell_lines, self.current_index, '    ', self.variable_manager, self.import_manager)
-                if translated_line[0] and translated_line[0].strip():
-                    if_lines.append(translated_line[0])
-            self.current_index += 1
-        return if_lines, self.current_index
 
+def translate_line(node, indentation, variable_manager, import_manager, options=None):
+    # translate one statement of the syntax tree into lines of python
+    if isinstance(node, BlankLine):
+        return ['']
+    if isinstance(node, Comment):
+        return [indentation + node.text]
 
-class ForLoopTranslator(ShellTranslator):
+    # a compound statement may run its parts any number of times, so what
+    # it assigns has no known value inside it or after it, and one type
+    changed = pinned = converted = ()
+    if not isinstance(node, SimpleCommand):
+        changed = changed_variables(node)
+        for name in changed:
+            variable_manager.forget(name)
+        if changed:
+            pinned, converted = pin_types(node, changed, variable_manager)
+    translator = create_translator(node, variable_manager, import_manager, options)
+    translated_lines = run_translator(translator)
+    if translated_lines is None:
+        # the builtin can't handle this form, run it as a command
+        stats = current_translation_stats()
+        if stats is not None:
+            stats.count(translator, 'fallbacks')
+        translated_lines = run_translator(CommandTranslator(node, variable_manager, import_manager, options))
+    for name in changed:
+        variable_manager.forget(name)
+    for name in pinned:
+        variable_manager.unpin(name)
+    if node.comment:
+        translated_lines[0] += '  ' + node.comment
+    if converted:
+        translated_lines = [f'{translator.python_name(name)} = str({translator.python_name(name)})'
+                            for name in converted] + translated_lines
+    if not indentation:
+        return translated_lines
+    return [indentation + line for line in translated_lines]
 
-    def __init__(self, shell_lines: list[LineParser], current_index, variable_manager, nesting_stack, import_manager):
-        super().__init__(shell_lines, variable_manager, import_manager)
-        self.current_index = current_index
-        self.nesting_stack = nesting_stack
 
-    def match_iterator_iterable(self, line):
-        pattern = re.compile(r'for\s+(.+)\s+in\s+(.+)')
-        match = pattern.match(line.line)
-        if match:
-            iterator = match.group(1)  # the variable name
-            iterable = match.group(2)  # the iterable
-            return iterator, iterable
-        return None, None
+def pin_types(node, names, variable_manager):
+    # Of the variables a compound statement changes and whose type isn't
+    # fixed yet, those that held an int or nothing before it hold ints
+    # throughout it if every assignment it makes to them is an integer,
+    # given the others that are; the rest hold strings. -> (these
+    # variables, those of them that held an int and now hold a string)
+    free = [name for name in names if not variable_manager.is_pinned(name)]
+    if not free:
+        # a statement inside one that fixed their types already
+        return [], []
+    before = {name for name in free if variable_manager.is_integer(name)}
+    integers = before | {name for name in free if not variable_manager.is_assigned(name)}
+    assignments = [(name, value) for name, value in variable_assignments(node) if name in integers]
+    outside = set(free)
 
-    def translate(self):
-        python_lines = []
+    def holds_integer(name):
+        return name in integers if name in outside else variable_manager.is_integer(name)
 
-        current_line = self.shell_lines[self.current_index]
+    changed = True
+    while changed:
+        changed = False
+        for name, value in assignments:
+            if name in integers and not integer_word(value, holds_integer):
+                integers.discard(name)
+                changed = True
+    for name in free:
+        variable_manager.pin(name, name in integers)
+    return free, [name for name in free if name in before and name not in integers]
 
-        iterator, iterable = self.match_iterator_iterable(
-            current_line)
 
-        if current_line.has_glob():
-            self.import_manager.add_import('glob')
-            iterable = f"sorted(glob.glob(\"{iterable}\"))"
-            self.nesting_stack.append(f"for {iterator} in {iterable}:")
-        else:
-            self.nesting_stack.append(f"for {iterator} in {iterable.split()}:")
-
-        self.variable_manager.add_variable(iterator, iterator)
-
-        # add the for loop to the python code
-        python_lines.append(
-            f"    " * (len(self.nesting_stack) - 1) + self.nesting_stack[-1])
-
-        # translate the loop body
-        i = self.current_index + 1
-        while i < len(self.shell_lines):
-            line = self.shell_lines[i].line.strip()
-            if line == 'done':
-                self.nesting_stack.pop()
-                if not self.nesting_stack:
-                    i += 1
-                    break
-                else:
-                    i += 1
-                    continue
-            # if the line is a nested for loop
-            if line.startswith('for'):
-                for_loop_translator = ForLoopTranslator(
-                    self.shell_lines, i, variable_manager, self.nesting_stack, import_manager)
-                # recursively translate the nested for loop
-                translated_for, line_used = for_loop_translator.translate()
-                for l in translated_for:
-                    python_lines.append(
-                        "    " * len(self.nesting_stack) + l)
-
-                i += line_used
-            else:
-                translated_line, line_used = translate_line(
-                    self.shell_lines, i, "    " * len(self.nesting_stack), variable_manager, import_manager)
-                if translated_line[0] and translated_line[0].strip():
-                    python_lines.append(translated_line[0])
-                i += line_used
-        return python_lines, i - self.current_index
+def run_translator(translator):
+    stats = current_translation_stats()
+    if stats is None:
+        return translator.translate()
+    return stats.translate(translator)
 
-class WhileLoopTranslator(ShellTranslator):
-    def __init__(self, shell_lines: list[LineParser], current_index, variable_manager, nesting_stack, import_manager):
-        super().__init__(shell_lines, variable_manager, import_manager)
-        self.current_index = current_index
-        self.nesting_stack = nesting_stack
-
-    def match_condition(self, line):
-        # match while test condition
-        # while test -z $var -> -z $var
-        # while test $var1 = $var2 -> $var1 = $var2
-        test_pattern = re.compile(r'while\s+test\s+(.+)')
-        test_match = test_pattern.match(line.line)
-        if test_match:
-            condition = test_match.group(1)
-            return condition
 
-        # match while [ condition ]
-        bracket_pattern = re.compile(r'while\s+\[\s+(.+)\s+\]')
-        bracket_match = bracket_pattern.match(line.line)
-        if bracket_match:
-            condition = bracket_match.group(1)
-            return condition
+# the regular expression methods TranslationStats counts calls of
+REGEX_EVALUATIONS = {'match', 'fullmatch', 'search', 'sub', 'subn', 'split', 'findall', 'finditer'}
 
-        return None
 
-    def translate(self):
-        python_lines = []
+class TranslationStats:
+    # With --stats, where the time of translating goes: run_translator
+    # times each translator, net of the statements translated inside it,
+    # under its class and under the kind of statement, and counts the
+    # fallbacks it takes and the regular expressions it evaluates. Regular
+    # expressions evaluated outside any translator, mostly by the parser,
+    # count under (other).
 
-        condition = self.match_condition(self.shell_lines[self.current_index])
+    FIELDS = ('statements', 'lines', 'seconds', 'fallbacks', 'shell_fallbacks', 'regex_evaluations')
 
-        operand1, operator, operand2 = TestOperationTranslator(
-            condition).translate()
+    def __init__(self):
+        self.translators = {}
+        self.constructs = {}
+        self.patterns = {}
+        self.files = 0
+        # [translator, seconds of the translators inside it] of each running translator
+        self.running = []
 
-        variable_pattern = re.compile(r'\$[a-zA-Z0-9_@]+')
-        if re.search(variable_pattern, operand1):
-            operand1 = self.substitute_variables(operand1)
+    def entries(self, translator):
+        # the counters of translator's class and of the kind of its statement
+        name = type(translator).__name__
+        construct = type(translator.node).__name__
+        return [table.setdefault(key, dict.fromkeys(self.FIELDS, 0))
+                for table, key in ((self.translators, name), (self.constructs, construct))]
 
-        if operand2 and re.search(variable_pattern, operand2):
-            operand2 = self.substitute_variables(operand2)
+    def translate(self, translator):
+        self.running.append([translator, 0.0])
+        start = time.perf_counter()
+        try:
+            return translator.translate()
+        finally:
+            seconds = time.perf_counter() - start
+            _, inner = self.running.pop()
+            if self.running:
+                self.running[-1][1] += seconds
+            node = translator.node
+            for entry in self.entries(translator):
+                entry['statements'] += 1
+                entry['lines'] += max(node.end_lineno, node.lineno) - node.lineno + 1
+                entry['seconds'] += seconds - inner
 
-        condition = f'{operand1} {operator} {operand2}'
+    def count(self, translator, field):
+        for entry in self.entries(translator):
+            entry[field] += 1
 
-        # push new level to the stack
-        self.nesting_stack.append(f"while {condition}:")
+    def count_regex(self, pattern):
+        self.patterns[pattern] = self.patterns.get(pattern, 0) + 1
+        if self.running:
+            self.count(self.running[-1][0], 'regex_evaluations')
+        else:
+            entry = self.translators.setdefault('(other)', dict.fromkeys(self.FIELDS, 0))
+            entry['regex_evaluations'] += 1
 
-        # add the while loop to the python code
-        python_lines.append(
-            f"    " * (len(self.nesting_stack) - 1) + self.nesting_stack[-1])
+    def summary(self):
+        # -> the counters as a dict for json, the totals first
+        tables = {'translators': self.translators, 'constructs': self.constructs}
+        summary = {
+            'files': self.files,
+            'statements': sum(entry['statements'] for entry in self.translators.values()),
+            'seconds': round(sum(entry['seconds'] for entry in self.translators.values()), 6),
+            'regex_evaluations': sum(self.patterns.values()),
+        }
+        for name, table in tables.items():
+            summary[name] = {key: dict(entry, seconds=round(entry['seconds'], 6))
+                             for key, entry in sorted(table.items(), key=lambda item: -item[1]['seconds'])}
+        summary['patterns'] = dict(sorted(self.patterns.items(), key=lambda item: -item[1]))
+        return summary
 
-        # translate the loop body
-        i = self.current_index + 1
-        while i < len(self.shell_lines):
-            line = self.shell_lines[i].line.strip()
-            if line == 'done':
-                self.nesting_stack.pop()
-                if not self.nesting_stack:
-                    i += 1
-                    break
-                else:
-                    i += 1
-                    continue
-            # if the line is a nested while loop
-            if line.startswith('while'):
-                while_loop_translator = WhileLoopTranslator(
-                    self.shell_lines, i, variable_manager, self.nesting_stack, import_manager)
-                # recursively translate the nested while loop
-                translated_while, end_index = while_loop_translator.translate()
-                for l in translated_while:
-                    python_lines.append("    " * len(self.nesting_stack) + l)
-
-                i = end_index
-            else:
-                translated_line, _ = translate_line(
-                    self.shell_lines, i, "    " * len(self.nesting_stack), variable_manager, import_manager)
-                if translated_line[0] and translated_line[0].strip():
-                    python_lines.append(translated_line[0])
-                i += 1
-
-        return python_lines, i
-
-
-def translate_line(shell_lines, current_index, indentation, variable_manager, import_manager):
-    line_obj = shell_lines[current_index]
-    line = line_obj.line
-    comment = line_obj.comment
-    if line.startswith('for'):
-        nesting_stack = []
-        for_loop_translator = ForLoopTranslator(
-            shell_lines, current_index, variable_manager, nesting_stack, import_manager)
-        translated_for, lines_used = for_loop_translator.translate()
-        return [line for line in translated_for], lines_used
-
-    elif line.startswith('while'):
-        nesting_stack = []
-        while_loop_translator = WhileLoopTranslator(
-            shell_lines, current_index, variable_manager, nesting_stack, import_manager)
-        translated_while, lines_used = while_loop_translator.translate()
-        return [line for line in translated_while], lines_used
-
-    elif line.startswith('if'):
-        nesting_stack = []
-        conditional_translator = ConditionalTranslator(
-            shell_lines[current_index:], variable_manager, import_manager)
-        translated_if, lines_used = conditional_translator.translate()
-        return [indentation + line for line in translated_if], lines_used
+    def add(self, summary):
+        # count in the summary of another TranslationStats, from a worker
+        self.files += summary['files']
+        for name, table in (('translators', self.translators), ('constructs', self.constructs)):
+            for key, counts in summary[name].items():
+                entry = table.setdefault(key, dict.fromkeys(self.FIELDS, 0))
+                for field in self.FIELDS:
+                    entry[field] += counts[field]
+        for pattern, count in summary['patterns'].items():
+            self.patterns[pattern] = self.patterns.get(pattern, 0) + count
 
-    else:
-        # ignore the lines that are not translated
-        if line in ['do', 'done', 'then', 'fi']:
-            return [indentation + comment], 1
-
-        # these translators only translate one line
-        translators = [AssignmentTranslator,
-                       EchoTranslator, ReadTranslator, ExitTranslator, CDTranslator]
-        for Translator in translators:
-            translator = Translator(
-                [line_obj], variable_manager, import_manager)
-            translated_line = translator.translate()
-            if translated_line is not None:
-                return [indentation + translated_line + comment], 1
-
-        commands = line.split()
-        if commands:  # if the line is not translated by the translators above, it is a external command
-            import_manager.add_import('subprocess')
-            for i in range(len(commands)):
-                # if the command contains a variable
-                if re.search(r'\$[a-zA-Z0-9_@]+', commands[i]):
-                    commands[i] = translator.substitute_variables(commands[i])
-                else:
-                    commands[i] = f"'{commands[i]}'"
 
-            if 'sys.argv[1:]' in commands:
-                translated_line = f'subprocess.run([{", ".join(commands[:-1])}] + {commands[-1]})'
-            else:
-                translated_line = f"subprocess.run([{', '.join(commands)}])"
+class RegexCounter:
+    # stands in for the re module or a compiled pattern of this module while
+    # any thread collects translation stats, counting every evaluation in
+    # the stats of the thread making it, if it collects them
+    def __init__(self, target):
+        self.target = target
+
+    def __getattr__(self, name):
+        attribute = getattr(self.target, name)
+        if name not in REGEX_EVALUATIONS:
+            return attribute
+        pattern = getattr(self.target, 'pattern', None)
+
+        def evaluate(*arguments, **keywords):
+            stats = current_translation_stats()
+            if stats is not None:
+                stats.count_regex(pattern if pattern is not None else getattr(arguments[0], 'pattern', arguments[0]))
+            return attribute(*arguments, **keywords)
+        return evaluate
+
+
+# the TranslationStats of each thread collecting them, as its .stats
+_translation_stats = threading.local()
+# the threads collecting stats, and (object, attribute, pattern) of every
+# pattern replaced by a RegexCounter while there are any
+_regex_counting = {'threads': 0, 'replaced': []}
+_regex_counting_lock = threading.Lock()
 
-            return [indentation + translated_line + comment], 1
 
-    # if the line is not translated by the translators above, return the original line
-    return [indentation + line + comment], 1
+def current_translation_stats():
+    return getattr(_translation_stats, 'stats', None)
+
+
+def count_regex_evaluations(start):
+    # replace the regular expressions of this module by counting ones when
+    # the first thread starts collecting stats, and put them back when the
+    # last one stops
+    global re
+    with _regex_counting_lock:
+        _regex_counting['threads'] += 1 if start else -1
+        if start and _regex_counting['threads'] == 1:
+            module = sys.modules[__name__]
+            pattern_type = type(NAME_PATTERN)
+            replaced = _regex_counting['replaced']
+            for name, value in list(globals().items()):
+                if isinstance(value, pattern_type):
+                    replaced.append((module, name, value))
+                elif isinstance(value, type) and value.__module__ == __name__:
+                    for attribute, member in list(vars(value).items()):
+                        if isinstance(member, pattern_type):
+                            replaced.append((value, attribute, member))
+            for owner, attribute, pattern in replaced:
+                setattr(owner, attribute, RegexCounter(pattern))
+            re = RegexCounter(re)
+        elif not start and not _regex_counting['threads']:
+            re = re.target
+            for owner, attribute, pattern in _regex_counting['replaced']:
+                setattr(owner, attribute, pattern)
+            _regex_counting['replaced'] = []
+
+
+@contextlib.contextmanager
+def collect_translation_stats(stats):
+    # count what the current thread's translating costs in stats for the
+    # duration of the with statement; with stats None, or stats already
+    # being collected in this thread, nothing changes
+    if stats is None or current_translation_stats() is not None:
+        yield
+        return
+    # read once for the whole process, which no translator should be timed for
+    runtime_helpers()
+    count_regex_evaluations(True)
+    _translation_stats.stats = stats
+    try:
+        yield
+    finally:
+        _translation_stats.stats = None
+        count_regex_evaluations(False)
 
 
 class VariableManager:
+    # When journal is a list, every question the translators ask and every
+    # update they make is appended to it, so that a translation can later be
+    # reused wherever the same questions get the same answers.
+
     def __init__(self):
         self.variables = {}
+        self.declared = set()
+        # name -> the text of a variable whose value is known where the
+        # statement being translated runs
+        self.constants = {}
+        # the variables holding a python int rather than a string, and those
+        # whose type is fixed until the compound statement assigning them ends
+        self.integers = set()
+        self.pinned = set()
+        self.journal = None
+
+    def _record(self, kind, method, var_name, value):
+        if self.journal is not None:
+            self.journal.append((kind, method, var_name, value))
+        return value
 
     def add_variable(self, var_name, var_value):
+        self._record('update', 'add_variable', var_name, var_value)
+        self.declared.add(var_name)
         self.variables[var_name] = var_value
+        self.constants.pop(var_name, None)
+        if var_name not in self.pinned:
+            self.integers.discard(var_name)
+
+    def set_constant(self, var_name, text):
+        # the statement just translated gave the variable this text
+        self._record('update', 'set_constant', var_name, text)
+        self.constants[var_name] = text
+
+    def forget(self, var_name):
+        # the variable may change in the statement being translated
+        self._record('update', 'forget', var_name, None)
+        self.constants.pop(var_name, None)
+
+    def constant(self, var_name):
+        # -> the text the variable is known to hold, or None
+        return self._record('query', 'constant', var_name, self.constants.get(var_name))
+
+    def set_integer(self, var_name):
+        # the variable now holds an int
+        self._record('update', 'set_integer', var_name, None)
+        self.integers.add(var_name)
+
+    def is_integer(self, var_name):
+        return self._record('query', 'is_integer', var_name, var_name in self.integers)
+
+    def pin(self, var_name, integer):
+        # the variable holds an int, or a string, until unpinned
+        self._record('update', 'pin', var_name, integer)
+        self.pinned.add(var_name)
+        if integer:
+            self.integers.add(var_name)
+        else:
+            self.integers.discard(var_name)
+
+    def unpin(self, var_name):
+        self._record('update', 'unpin', var_name, None)
+        self.pinned.discard(var_name)
+
+    def is_pinned(self, var_name):
+        return self._record('query', 'is_pinned', var_name, var_name in self.pinned)
+
+    def state(self):
+        # a copy of everything the translators can change
+        return (dict(self.variables), set(self.declared), dict(self.constants), set(self.integers), set(self.pinned))
+
+    def restore(self, state):
+        self.variables, self.declared, self.constants, self.integers, self.pinned = state
 
     def get_variables(self):
         return self.variables
 
+    def declare(self, var_name):
+        # the variable is assigned somewhere in the statement being translated
+        self._record('update', 'declare', var_name, None)
+        self.declared.add(var_name)
+
+    def is_declared(self, var_name):
+        return self._record('query', 'is_declared', var_name, var_name in self.declared)
+
+    def is_assigned(self, var_name):
+        # a value has been given to the variable by the translated code
+        return self._record('query', 'is_assigned', var_name, var_name in self.variables)
+
+    def assigned_names(self, _=None):
+        # -> the variables the translated code has given a value, in order
+        return self._record('query', 'assigned_names', None, tuple(self.variables))
+
+    def may_contain_spaces(self, var_name):
+        # whether the value can hold whitespace that an unquoted $var splits on:
+        # true for input and command output, false for the script's arguments
+        # and the environment, which are left as they are
+        return self._record('query', 'may_contain_spaces', var_name, self._may_contain_spaces(var_name, set()))
+
+    def _may_contain_spaces(self, var_name, seen):
+        if var_name not in self.variables:
+            return False
+        value = self.variables[var_name]
+        if value is None:
+            return True
+        seen.add(var_name)
+        for part in value.parts:
+            if isinstance(part, CommandSubstitution):
+                return True
+            if isinstance(part, Literal) and re.search(r'\s', part.text):
+                return True
+            if isinstance(part, Parameter) and part.name not in seen and self._may_contain_spaces(part.name, seen):
+                return True
+        return False
+
+    def is_glob(self, var_name):
+        value = self.variables.get(var_name)
+        return self._record('query', 'is_glob', var_name, value is not None and value.has_glob())
+
 
 class ImportManager:
     def __init__(self):
         self.imports = set()
+        self.helpers = set()
+        # the modules and helpers the generated code itself names
+        self.names = set()
+        self.journal = None
 
     def add_import(self, module_name):
+        if self.journal is not None:
+            self.journal.append(('add_import', module_name))
         self.imports.add(module_name)
+        self.names.add(module_name)
+
+    def add_helper(self, helper):
+        # a runtime helper, with the modules and helpers it needs
+        if self.journal is not None:
+            self.journal.append(('add_helper', helper))
+        self.names.add(helper)
+        pending = [helper]
+        while pending:
+            helper = pending.pop()
+            if helper not in self.helpers:
+                self.helpers.add(helper)
+                modules, helpers, _ = runtime_helpers()[helper]
+                self.imports.update(modules)
+                pending += helpers
 
     def get_imports(self):
         return self.imports
 
+    def get_helpers(self):
+        # in the order they are defined
+        return [helper for helper in runtime_helpers() if helper in self.helpers]
 
-if __name__ == '__main__':
-    shell_path = sys.argv[1]
+    def get_names(self):
+        return self.names
+
+
+# top level commands that make up a block of their own
+COMPOUND_NODES = (IfClause, ForLoop, WhileLoop, CaseClause, BraceGroup, Subshell)
+
+
+def parse_source(source):
+    # -> (the lines of the script, a generator of its top level statements)
+    shell_code = source.splitlines(keepends=True)
+    lineno = 0
+    # remove the shebang
+    if shell_code and shell_code[0].startswith('#!'):
+        lineno = 1
+    parser = ShellParser(ShellLexer(shell_code[lineno:], lineno))
+    return shell_code, parser.parse_script()
+
+
+def top_level_blocks(nodes, run_length=64):
+    # each compound command is a block, and so is each run of (at most
+    # run_length) simple commands with the comments and blank lines between;
+    # the script is only read up to an exit at the top level
+    block = []
+    for node in reachable(nodes):
+        if isinstance(node, COMPOUND_NODES):
+            if block:
+                yield block
+            yield [node]
+            block = []
+        else:
+            block.append(node)
+            if len(block) == run_length:
+                yield block
+                block = []
+    if block:
+        yield block
+
+
+class LinkedScript:
+    # a script run by sh that is translated to a function of the python
+    # script, and whether it always ends with an exit, which gives the
+    # function an exit status
+    def __init__(self, function, nodes):
+        self.function = function
+        self.nodes = nodes
+        self.exits = any(exits(node) for node in reachable(nodes))
+
+
+class Linker:
+    # With the link option, the scripts a script runs with `. path` or
+    # `sh path arguments...`, where path is literal and names a file from
+    # the directory of the script, as if it runs there, are translated
+    # with it: a sourced script in place of the . command, a script run by
+    # sh into a function with variables of its own, which every command
+    # running it calls. A script sourcing itself, directly or not, is
+    # left to the shell, like any script that can't be read or parsed.
+
+    def __init__(self, directory):
+        self.directory = directory
+        # the scripts being sourced, innermost last
+        self.sourcing = []
+        # real path -> the LinkedScript, or None if it can't be linked
+        self.scripts = {}
+        self.functions = set()
+        # the LinkedScripts not translated yet
+        self.pending = []
+
+    def link(self, nodes):
+        # yield the statements, linking the scripts they run
+        for node in nodes:
+            for command in [child for child in walk(node) if isinstance(child, SimpleCommand)]:
+                self.link_command(command)
+            yield node
+
+    def resolve(self, text):
+        # -> the real path of the file text names, or None
+        path = os.path.realpath(os.path.join(self.directory, text))
+        return path if os.path.isfile(path) else None
+
+    def parse(self, path):
+        # -> the linked statements of the script at path, or None
+        try:
+            with open(path) as f:
+                source = f.read()
+            _, nodes = parse_source(source)
+            return list(self.link(nodes))
+        except (OSError, UnicodeDecodeError, ShellSyntaxError):
+            return None
+
+    def link_command(self, command):
+        if len(command.words) < 2 or command.assignments or command.redirects or command.background:
+            return
+        name = command.name
+        word = command.words[1]
+        if not word.is_literal() or word.has_glob() or word.literal_text()[:1] in ('~', '-', ''):
+            return
+        text = word.literal_text()
+        if name == '.' and len(command.words) == 2:
+            # dash looks up a name without a slash in $PATH
+            path = self.resolve(text) if '/' in text else None
+            if path is None or path in self.sourcing:
+                return
+            self.sourcing.append(path)
+            try:
+                command.sourced = self.parse(path)
+            finally:
+                self.sourcing.pop()
+        elif name in ('sh', 'dash', '/bin/sh'):
+            path = self.resolve(text)
+            if path is None:
+                return
+            if path not in self.scripts:
+                # known before it is parsed, for scripts that run each other
+                function = self.function_name(path)
+                script = self.scripts[path] = LinkedScript(function, [])
+                sourcing, self.sourcing = self.sourcing, []
+                nodes = self.parse(path)
+                self.sourcing = sourcing
+                if nodes is None:
+                    self.scripts[path] = None
+                else:
+                    script.__init__(function, nodes)
+                    self.pending.append(script)
+            command.script = self.scripts[path]
+
+    def function_name(self, path):
+        stem = re.sub(r'\W', '_', os.path.splitext(os.path.basename(path))[0])
+        function = f'sheepy_script_{stem}'
+        number = 1
+        while function in self.functions:
+            number += 1
+            function = f'sheepy_script_{stem}_{number}'
+        self.functions.add(function)
+        return function
+
+    def definitions(self, import_manager, options=None):
+        # the functions of the scripts linked since the last call
+        lines = []
+        while self.pending:
+            script = self.pending.pop(0)
+            variable_manager = VariableManager()
+            body = []
+            for block in top_level_blocks(script.nodes):
+                body += translate_block(block, variable_manager, import_manager, options)
+            body = merge_prints(body)
+            while body and not body[0].strip():
+                body.pop(0)
+            while body and not body[-1].strip():
+                body.pop()
+            if not any(line.strip() and not line.strip().startswith('#') for line in body):
+                body.append('pass')
+            lines += ['', '', f'def {script.function}():'] + ['    ' + line if line else line for line in body]
+        return lines
+
+
+def translate_block(nodes, variable_manager, import_manager, options=None):
+    python_code = []
+    for node in nodes:
+        for name in assigned_variables(node):
+            variable_manager.declare(name)
+        python_code += translate_line(node, '', variable_manager, import_manager, options)
+    return python_code
+
+
+# print('text') or print('text', end=''), as echo translates literal words
+PRINT_PATTERN = re.compile(r"""( *)print\(('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")?((?:, )?end='')?\)""")
+
+
+def merge_prints(lines):
+    # consecutive prints of literal text at the same indentation print it at
+    # once; applied to the whole script, so that where its blocks start
+    # changes nothing
+    merged = []
+    previous = None
+    for line in lines:
+        match = PRINT_PATTERN.fullmatch(line)
+        if match is None:
+            previous = None
+            merged.append(line)
+            continue
+        indentation, text, end = match.groups()
+        text = (ast.literal_eval(text) if text else '') + ('' if end else '\n')
+        if previous is None or previous[0] != indentation:
+            previous = (indentation, text)
+            merged.append(line)
+            continue
+        text = previous[1] + text
+        previous = (indentation, text)
+        if text.endswith('\n'):
+            merged[-1] = f'{indentation}print({repr(text[:-1])})'
+        else:
+            merged[-1] = f"{indentation}print({text!r}, end='')"
+    return merged
 
+
+def helper_definitions(helpers):
+    lines = []
+    for helper in helpers:
+        lines += ['', ''] + runtime_helpers()[helper][2].splitlines()
+    return lines + ['', '']
+
+
+def runtime_import(names):
+    # with the runtime option the modules and helpers a script uses come
+    # from sheepy_runtime, which only imports a module when it is used
+    return f"from sheepy_runtime import {', '.join(sorted(names))}"
+
+
+def shebang(options=None):
+    # python -u writes every print at once; with the buffered option stdout
+    # is written in blocks, and flushed wherever another writer could come
+    # between what the script prints
+    if options and options.get('buffered'):
+        return '#!/usr/bin/env python3'
+    return '#!/usr/bin/env python3 -u'
+
+
+def python_script(python_code, import_manager, options=None):
+    python_code = list(python_code)
+    while python_code and not python_code[-1].strip():
+        python_code.pop()
+    header = [shebang(options)]
+    if options and options.get('runtime'):
+        if import_manager.get_names():
+            header.append(runtime_import(import_manager.get_names()))
+        return '\n'.join(header + python_code) + '\n'
+    # the imports in alphabetical order
+    header += [f'import {import_name}' for import_name in sorted(import_manager.get_imports())]
+    # then the runtime helpers the script calls
+    helpers = import_manager.get_helpers()
+    if helpers:
+        header += helper_definitions(helpers)
+        while python_code and not python_code[0].strip():
+            python_code.pop(0)
+    return '\n'.join(header + python_code) + '\n'
+
+
+def transpile(source, options=None, shell_path=None):
+    # translate the text of a shell script to the text of a python script;
+    # with the link option, the scripts it runs are found from the
+    # directory of shell_path, or the current directory
     variable_manager = VariableManager()
     import_manager = ImportManager()
     python_code = []
+    _, nodes = parse_source(source)
+    linker = None
+    if options and options.get('link'):
+        linker = Linker(os.path.dirname(os.path.abspath(shell_path)) if shell_path else os.getcwd())
+        nodes = linker.link(nodes)
+    for block in top_level_blocks(nodes):
+        python_code += translate_block(block, variable_manager, import_manager, options)
+    python_code = merge_prints(python_code)
+    if linker is not None:
+        # the functions of the linked scripts come before the script
+        definitions = linker.definitions(import_manager, options)
+        if definitions:
+            python_code = definitions + ['', ''] + python_code
+    return python_script(python_code, import_manager, options)
+
 
-    # shell_path = 'demo03.sh'
-    # shell_path = 'for_read0.sh'
+# the modules imported by the header of a streamed translation
+STREAM_IMPORTS = ('fnmatch', 'glob', 'os', 'stat', 'subprocess', 'sys')
 
-    with open(shell_path) as f:
-        shell_code = f.readlines()
+
+def transpile_stream(lines, out, options=None):
+    # Translate the lines of a shell script, read lazily, writing each top
+    # level block to out as soon as it is complete, so memory use depends
+    # on the size of the blocks rather than of the script. The imports
+    # can't wait until the end, so the header imports every module the
+    # translators use, and any other module or runtime helper is defined
+    # before the first block that needs it.
+    lines = iter(lines)
+    first_line = next(lines, '')
+    lineno = 0
     # remove the shebang
-    shell_code = shell_code[1:]
-    # divide the code into code lines and comments
-    shell_lines = [LineParser(line, import_manager) for line in shell_code]
-    i = 0
-    print('#!/usr/bin/env python3 -u')
-    # to reduce multiple empty lines to one
-    prev_line_empty = False
-    while i < (len(shell_lines)):
-        translated_line, line_used = translate_line(
-            shell_lines, i, '', variable_manager, import_manager)
-        translated_line = '\n'.join(translated_line)
-        if translated_line:
-            python_code.append(translated_line)
-            prev_line_empty = False
-        elif not prev_line_empty:
-            python_code.append('')
-            prev_line_empty = True
-        i += line_used
-
-    # print the imports in alphabetical order
-    for import_name in sorted(import_manager.get_imports()):
-        print(f'import {import_name}')
-
-    print('\n'.join(python_code))
+    if first_line.startswith('#!'):
+        lineno = 1
+    else:
+        lines = itertools.chain([first_line], lines)
+    parser = ShellParser(ShellLexer(lines, lineno))
+    nodes = parser.parse_script()
+    linker = None
+    if options and options.get('link'):
+        linker = Linker(os.getcwd())
+        nodes = linker.link(nodes)
+    variable_manager = VariableManager()
+    import_manager = ImportManager()
+    runtime = options and options.get('runtime')
+    imported = set(STREAM_IMPORTS)
+    defined = []
+    out.write(shebang(options) + '\n')
+    if runtime:
+        out.write(runtime_import(STREAM_IMPORTS) + '\n')
+    else:
+        out.write(''.join(f'import {module_name}\n' for module_name in STREAM_IMPORTS))
+    blank_lines = []
+    # a print of literal text ending a block, held back in case the next
+    # block starts with one it merges with
+    held = []
+    for block in top_level_blocks(nodes):
+        python_code = merge_prints(held + translate_block(block, variable_manager, import_manager, options))
+        held = []
+        if python_code and python_code[-1].startswith('print') and PRINT_PATTERN.fullmatch(python_code[-1]):
+            held = [python_code.pop()]
+        if linker is not None:
+            # the functions of the scripts it links, before the block
+            definitions = linker.definitions(import_manager, options)
+            if definitions:
+                python_code = definitions + ['', ''] + python_code
+        if runtime:
+            missing = import_manager.get_names() - imported
+            imported.update(missing)
+            if missing:
+                python_code = [runtime_import(missing)] + python_code
+        else:
+            missing = sorted(import_manager.get_imports() - imported)
+            imported.update(missing)
+            helpers = [helper for helper in import_manager.get_helpers() if helper not in defined]
+            defined += helpers
+            if helpers:
+                while python_code and not python_code[0].strip():
+                    python_code.pop(0)
+                python_code = helper_definitions(helpers) + python_code
+            python_code = [f'import {module_name}' for module_name in missing] + python_code
+        for line in python_code:
+            # blank lines at the end of the script are left out
+            if not line.strip():
+                blank_lines.append(line)
+                continue
+            out.write(''.join(blank + '\n' for blank in blank_lines) + line + '\n')
+            blank_lines = []
+        out.flush()
+    if held:
+        out.write(''.join(blank + '\n' for blank in blank_lines) + held[0] + '\n')
+
+
+class BlockTranslation:
+    # One top level block of a script: where it is, whether it starts or
+    # ends with a (collapsed) blank line, and what translating it read and
+    # changed, so a later run can reuse the translation.
+    def __init__(self, nodes, python_code, journal, imports):
+        self.lineno = nodes[0].lineno
+        self.col = nodes[0].col
+        self.end_lineno = nodes[-1].end_lineno
+        self.end_col = nodes[-1].end_col
+        self.blank_first = isinstance(nodes[0], BlankLine)
+        self.blank_last = isinstance(nodes[-1], BlankLine)
+        self.exits = exits(nodes[-1])
+        self.python_code = python_code
+        self.journal = journal
+        self.imports = imports
+
+    def moved(self, lines):
+        block = copy.copy(self)
+        block.lineno += lines
+        block.end_lineno += lines
+        return block
+
+    def replay(self, variable_manager, import_manager):
+        # apply the block's updates if every question it asked still gets
+        # the same answer, otherwise leave the managers untouched
+        state = variable_manager.state()
+        for kind, method, var_name, value in self.journal:
+            if kind == 'query':
+                if getattr(variable_manager, method)(var_name) == value:
+                    continue
+                variable_manager.restore(state)
+                return False
+            if method in ('add_variable', 'set_constant', 'pin'):
+                getattr(variable_manager, method)(var_name, value)
+            else:
+                getattr(variable_manager, method)(var_name)
+        for method, name in self.imports:
+            getattr(import_manager, method)(name)
+        return True
+
+
+def parse_from(shell_code, lineno, col, newlines, stop):
+    # the top level statements from line lineno, column col, a place where
+    # a statement can start, until stop(token, newlines) is true
+    parser = ShellParser(ShellLexer(shell_code[lineno - 1:], lineno - 1, col))
+    return parser.statements((), newlines, stop)
+
+
+def translate_recorded(nodes, variable_manager, import_manager, options=None):
+    # translate_block(), recording what the translation read and changed
+    variable_manager.journal = []
+    import_manager.journal = []
+    try:
+        python_code = translate_block(nodes, variable_manager, import_manager, options)
+        return BlockTranslation(nodes, python_code, variable_manager.journal, import_manager.journal)
+    finally:
+        variable_manager.journal = None
+        import_manager.journal = None
+
+
+def transpile_incremental(source, previous=None, options=None):
+    # Like transpile(), but reusing previous, the (lines, blocks) of an
+    # earlier run. The blocks in the lines unchanged at the start and the
+    # end of the script are neither parsed nor translated again unless a
+    # variable they depend on changed; only the lines between are parsed.
+    # -> (python code, (lines, blocks) for the next run, blocks reused)
+    shell_code = source.splitlines(keepends=True)
+    previous_code, previous_blocks = previous or ([], [])
+    same = min(len(shell_code), len(previous_code))
+    head = 0
+    while head < same and shell_code[head] == previous_code[head]:
+        head += 1
+    tail = 0
+    while tail < same - head and shell_code[-1 - tail] == previous_code[-1 - tail]:
+        tail += 1
+    first = [block for block in previous_blocks if block.end_lineno <= head]
+    moved = len(shell_code) - len(previous_code)
+    last = [block.moved(moved) for block in previous_blocks if block.lineno > len(previous_code) - tail]
+
+    variable_manager = VariableManager()
+    import_manager = ImportManager()
+    blocks = []
+    reused = 0
+
+    def reuse(block):
+        nonlocal reused
+        if block.replay(variable_manager, import_manager):
+            reused += 1
+            return block
+        # a variable it depends on changed, so translate its text again
+        end = (block.end_lineno, block.end_col)
+        nodes = parse_from(shell_code, block.lineno, block.col, 1 if block.blank_first else 0,
+                           lambda token, newlines: (token.lineno, token.col) >= end)
+        return translate_recorded(list(nodes), variable_manager, import_manager, options)
+
+    # nothing after an exit at the top level runs, or is even parsed
+    for block in first:
+        blocks.append(reuse(block))
+        if block.exits:
+            break
+
+    # parse from the end of the unchanged start until the place where one of
+    # the blocks of the unchanged end starts in the same state
+    if first:
+        lineno, col = first[-1].end_lineno, first[-1].end_col
+        newlines = 2 if first[-1].blank_last else 0
+    else:
+        lineno = 2 if shell_code and shell_code[0].startswith('#!') else 1
+        col = 0
+        newlines = 1
+    resume = [0, False]
+
+    def resumes(token, newlines):
+        position = (token.lineno, token.col)
+        while resume[0] < len(last) and (last[resume[0]].lineno, last[resume[0]].col) < position:
+            resume[0] += 1
+        if resume[0] < len(last):
+            block = last[resume[0]]
+            resume[1] = (block.lineno, block.col) == position and (newlines == 1 or not block.blank_first)
+        return resume[1]
+
+    if not (blocks and blocks[-1].exits):
+        nodes = parse_from(shell_code, lineno, col, newlines, resumes)
+        for block in top_level_blocks(nodes):
+            blocks.append(translate_recorded(block, variable_manager, import_manager, options))
+    if resume[1] and not (blocks and blocks[-1].exits):
+        for block in last[resume[0]:]:
+            blocks.append(reuse(block))
+            if block.exits:
+                break
+
+    python_code = merge_prints([line for block in blocks for line in block.python_code])
+    return python_script(python_code, import_manager, options), (shell_code, blocks), reused
+
+
+class TranslationCache:
+    # Translations stored on disk under the sha256 of the transpiler
+    # version, the options and the shell source, so an unchanged script is
+    # returned without being parsed. Entries are written atomically, so
+    # any number of processes can share one cache directory, and the least
+    # recently used entries are removed once the cache grows past max_bytes.
+    # With incremental set, the top level blocks of each script are kept
+    # too, so a changed script only has its changed blocks translated again.
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, incremental=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.incremental = incremental
+        self.hits = 0
+        self.misses = 0
+        self.blocks_reused = 0
+
+    def key(self, source, options=None):
+        return translation_key(source, options)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + '.py')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                python_code = f.read()
+            # the modification time records when the entry was last used
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return python_code
+
+    def put(self, key, python_code):
+        self._write(self.path(key), python_code.encode())
+
+    def _write(self, path, data):
+        # readers see either the old file or the new one, never part of it
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+
+    def entries(self):
+        # -> [(last used, size, path)] for every entry in the cache
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:  # removed by another process
+                    continue
+                entries.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        # remove the least recently used entries until the cache fits
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def transpile(self, source, options=None, shell_path=None):
+        if options and options.get('link'):
+            # the translation depends on the scripts it links as well
+            return transpile(source, options, shell_path)
+        key = self.key(source, options)
+        python_code = self.get(key)
+        if python_code is None:
+            if self.incremental and shell_path is not None:
+                python_code = self.transpile_blocks(source, shell_path, options)
+            else:
+                python_code = transpile(source, options)
+            self.put(key, python_code)
+        return python_code
+
+    def compiled(self, source, options=None, shell_path=None):
+        # -> the code object of the translation, kept marshalled in the
+        # cache so that running an unchanged script neither translates nor
+        # compiles it again; marshal's format belongs to one version of
+        # python, which is part of the key, like the file name compiled in
+        filename = python_filename(shell_path)
+        if options and options.get('link'):
+            return compile(transpile(source, options, shell_path), filename, 'exec')
+        digest = hashlib.sha256(self.key(source, options).encode())
+        digest.update(f'\0{sys.implementation.cache_tag}\0{filename}'.encode())
+        key = digest.hexdigest()
+        path = os.path.join(self.directory, key[:2], key[2:] + '.marshal')
+        try:
+            with open(path, 'rb') as f:
+                code = marshal.load(f)
+            os.utime(path)
+            self.hits += 1
+            return code
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        self.misses += 1
+        if self.incremental and shell_path is not None:
+            python_code = self.transpile_blocks(source, shell_path, options)
+        else:
+            python_code = transpile(source, options, shell_path)
+        code = compile(python_code, filename, 'exec')
+        self._write(path, marshal.dumps(code))
+        return code
+
+    def transpile_blocks(self, source, shell_path, options=None):
+        # translate the script reusing the blocks remembered from the last
+        # time the file at shell_path was translated with these options
+        name = hashlib.sha256(os.path.realpath(shell_path).encode()).hexdigest()[:32]
+        name += self.key('', options)[:32]
+        path = os.path.join(self.directory, 'blocks', name + '.pickle')
+        previous = None
+        try:
+            with open(path, 'rb') as f:
+                version, blocks = pickle.load(f)
+            if version == transpiler_version():
+                previous = blocks
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            pass
+        python_code, blocks, reused = transpile_incremental(source, previous, options)
+        self.blocks_reused += reused
+        self._write(path, pickle.dumps((transpiler_version(), blocks), pickle.HIGHEST_PROTOCOL))
+        return python_code
+
+
+def default_cache_dir():
+    # where --run keeps compiled translations without --cache-dir
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'sheepy')
+
+
+def python_filename(shell_path):
+    # the name of the python script translated from shell_path
+    return os.path.splitext(shell_path)[0] + '.py' if shell_path else '<stdin>'
+
+
+def unbuffered(stream):
+    # the stream as python -u opens it, writing straight to its file
+    stream.flush()
+    return io.TextIOWrapper(io.FileIO(stream.fileno(), 'w', closefd=False), encoding=stream.encoding,
+                            errors=stream.errors, write_through=True)
+
+
+def run_code(code, shell_path, arguments, options=None):
+    # run a compiled translation in this process as python3 runs the script
+    # written out: with the shell script and its arguments as sys.argv and,
+    # without the buffered option, its output unbuffered, as with -u
+    if not (options and options.get('buffered')):
+        if sys.stdout is not None:
+            sys.stdout = sys.__stdout__ = unbuffered(sys.stdout)
+        if sys.stderr is not None:
+            sys.stderr = sys.__stderr__ = unbuffered(sys.stderr)
+    sys.argv = [shell_path] + arguments
+    exec(code, {'__name__': '__main__', '__builtins__': builtins})
+
+
+def translation_key(source, options=None):
+    # the sha256 of everything a translation depends on, bar linked scripts
+    digest = hashlib.sha256()
+    digest.update(transpiler_version().encode())
+    digest.update(b'\0' + json.dumps(options or {}, sort_keys=True).encode() + b'\0')
+    digest.update(source.encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def transpiler_version():
+    # the version and a digest of this file and of the runtime helpers, so
+    # that any change to either invalidates what they translated before
+    global _transpiler_version
+    if _transpiler_version is None:
+        digest = hashlib.sha256()
+        for path in (__file__, RUNTIME_PATH):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _transpiler_version = f'{__version__}+{digest.hexdigest()[:16]}'
+    return _transpiler_version
+
+
+_transpiler_version = None
+
+
+def find_scripts(paths):
+    # -> [(shell path, output path relative to --out-dir)], directories
+    # are searched for .sh files
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.endswith('.sh'):
+                        shell_path = os.path.join(directory, name)
+                        scripts.append((shell_path, os.path.relpath(shell_path, path)))
+        else:
+            scripts.append((path, os.path.basename(path)))
+    return [(shell_path, os.path.splitext(relative)[0] + '.py') for shell_path, relative in scripts]
+
+
+def transpile_file(shell_path, python_path, cache=None, options=None, stats=False):
+    # translate one file for batch mode, -> its entry in the manifest, with
+    # the translation stats of the file if stats
+    start = time.perf_counter()
+    entry = {'source': shell_path, 'output': python_path}
+    collector = TranslationStats() if stats else None
+    with collect_translation_stats(collector):
+        try:
+            with open(shell_path) as f:
+                source = f.read()
+            if cache is not None:
+                hits = cache.hits
+                python_code = cache.transpile(source, options, shell_path)
+                entry['cache'] = 'hit' if cache.hits > hits else 'miss'
+            else:
+                python_code = transpile(source, options, shell_path)
+            os.makedirs(os.path.dirname(python_path) or '.', exist_ok=True)
+            with open(python_path, 'w') as f:
+                f.write(python_code)
+            os.chmod(python_path, 0o755)
+            entry['status'] = 'ok'
+        except (OSError, UnicodeDecodeError, ShellSyntaxError) as e:
+            entry['status'] = 'error'
+            entry['error'] = str(e)
+        except Exception as e:
+            # a bug in one translator must not stop the rest of the batch
+            entry['status'] = 'error'
+            entry['error'] = f'{type(e).__name__}: {e}'
+    entry['seconds'] = round(time.perf_counter() - start, 6)
+    if stats:
+        # handed to the parent process and counted there
+        collector.files += 1
+        entry['stats'] = collector.summary()
+    return entry
+
+
+def transpile_batch(paths, out_dir, jobs, cache=None, options=None, stats=None):
+    # translate every script into out_dir with a pool of worker processes,
+    # -> the manifest entries in input order; the workers' translation
+    # stats are added to stats
+    scripts = find_scripts(paths)
+    # a script whose output path another script given before it already has,
+    # like a/x.sh and b/x.sh given as files, fails instead of overwriting it
+    owners = {}
+    collisions = []
+    for shell_path, relative in scripts:
+        owner = owners.setdefault(os.path.normpath(relative), shell_path)
+        if os.path.realpath(owner) != os.path.realpath(shell_path):
+            collisions.append({'source': shell_path, 'output': os.path.join(out_dir, relative), 'status': 'error',
+                               'error': f'same output as {owner}', 'seconds': 0.0})
+        else:
+            collisions.append(None)
+    scripts = [script for script, collision in zip(scripts, collisions) if collision is None]
+    sources = [shell_path for shell_path, _ in scripts]
+    outputs = [os.path.join(out_dir, relative) for _, relative in scripts]
+    caches = itertools.repeat(cache, len(scripts))
+    option_sets = itertools.repeat(options, len(scripts))
+    stat_flags = itertools.repeat(stats is not None, len(scripts))
+    if jobs == 1 or len(scripts) < 2:
+        entries = list(map(transpile_file, sources, outputs, caches, option_sets, stat_flags))
+    else:
+        # only imported here, as it takes longer than the rest of the
+        # imports of --run together; each worker gets several files at a
+        # time so that the pool overhead stays small next to the translation
+        import concurrent.futures
+        chunksize = max(1, len(scripts) // (jobs * 8))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            entries = list(executor.map(transpile_file, sources, outputs, caches, option_sets, stat_flags,
+                                        chunksize=chunksize))
+        if cache is not None:
+            # the workers counted in their own copies of the cache
+            cache.hits += sum(entry.get('cache') == 'hit' for entry in entries)
+            cache.misses += sum(entry.get('cache') == 'miss' for entry in entries)
+    if stats is not None:
+        for entry in entries:
+            stats.add(entry.pop('stats'))
+    translated = iter(entries)
+    return [collision or next(translated) for collision in collisions]
+
+
+def install_runtime(entries):
+    # with the runtime option each directory of translations gets a copy of
+    # sheepy_runtime.py for its scripts to import
+    with open(RUNTIME_PATH, 'rb') as f:
+        runtime = f.read()
+    directories = {os.path.dirname(entry['output']) for entry in entries if entry['status'] == 'ok'}
+    for directory in sorted(directories):
+        path = os.path.join(directory, 'sheepy_runtime.py')
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == runtime:
+                    continue
+        except OSError:
+            pass
+        with open(path, 'wb') as f:
+            f.write(runtime)
+
+
+def write_manifest(out_dir, entries, seconds, cache=None):
+    failed = sum(entry['status'] != 'ok' for entry in entries)
+    manifest = {
+        'files': len(entries),
+        'failed': failed,
+        'seconds': round(seconds, 6),
+    }
+    if cache is not None:
+        manifest['cache'] = {'hits': cache.hits, 'misses': cache.misses}
+    manifest['entries'] = entries
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return failed
+
+
+def serve_translation(source, options, shell_path):
+    # translate a script for a client of the server -> the response
+    try:
+        return {'status': 'ok', 'python': transpile(source, options, shell_path)}
+    except ShellSyntaxError as e:
+        return {'status': 'error', 'error': str(e)}
+    except Exception as e:
+        # a bug in one translator must not stop the server
+        return {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+
+
+# the most recent requests the server's latency percentiles are of
+LATENCY_SAMPLES = 10000
+
+
+def percentile(values, fraction):
+    # the smallest of the sorted values that fraction of them are at most
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class TranslationServer:
+    # --serve: translate scripts for the clients of a unix socket, such as
+    # sheepy_client.py, so that a build translating many scripts starts
+    # python and imports sheepy once. A request is a line of JSON,
+    # {"source": text, "options": {...}, "path": the script's path, for
+    # the link option}, answered by a line {"status": "ok", "python": text}
+    # or {"status": "error", "error": message}; the options given to the
+    # server apply to every request. {"stats": true} is answered with the
+    # requests so far and the percentiles of the latency of the last
+    # LATENCY_SAMPLES, so a server running for weeks keeps a fixed number
+    # of them. Each connection has a thread, and can send any number of
+    # requests; with more than one job the translations run in a pool of
+    # worker processes. The most recently used translations are kept in
+    # memory, up to max_bytes.
+
+    def __init__(self, jobs=1, max_bytes=256 * 1024 * 1024, options=None):
+        self.jobs = jobs
+        self.max_bytes = max_bytes
+        self.options = options or {}
+        # key -> python code, least recently used first
+        self.translations = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.requests = 0
+        # the seconds of the most recent requests, oldest first
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def translate(self, source, options, shell_path):
+        # -> the response to a request for a translation
+        # linked translations depend on more than the source
+        key = None if options.get('link') else translation_key(source, options)
+        with self.lock:
+            python_code = self.translations.get(key)
+            if python_code is not None:
+                self.translations.move_to_end(key)
+                self.hits += 1
+                return {'status': 'ok', 'python': python_code}
+            self.misses += 1
+        if self.executor is None:
+            response = serve_translation(source, options, shell_path)
+        else:
+            response = self.executor.submit(serve_translation, source, options, shell_path).result()
+        if response['status'] == 'ok' and key is not None:
+            self.remember(key, response['python'])
+        return response
+
+    def remember(self, key, python_code):
+        with self.lock:
+            if key in self.translations:
+                return
+            self.translations[key] = python_code
+            self.size += len(python_code)
+            while self.size > self.max_bytes:
+                _, evicted = self.translations.popitem(last=False)
+                self.size -= len(evicted)
+
+    def respond(self, line):
+        # -> the response to a line of a client, and whether it asked for
+        # a translation
+        try:
+            request = json.loads(line)
+            if request.get('stats'):
+                return self.summary(), False
+            source = request['source']
+            options = {**self.options, **(request.get('options') or {})}
+            shell_path = request.get('path')
+            if not isinstance(source, str) or not isinstance(shell_path, (str, type(None))):
+                raise TypeError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {'status': 'error', 'error': 'bad request'}, True
+        return self.translate(source, options, shell_path), True
+
+    def handle(self, connection):
+        # answer the requests of a connection until the client closes it
+        try:
+            with connection, connection.makefile('rb') as reader, connection.makefile('wb') as writer:
+                for line in reader:
+                    start = time.perf_counter()
+                    response, translation = self.respond(line)
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    writer.flush()
+                    if translation:
+                        with self.lock:
+                            self.latencies.append(time.perf_counter() - start)
+                            self.requests += 1
+                            self.errors += response['status'] != 'ok'
+        except OSError:
+            # the client went away
+            pass
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            summary = {'status': 'ok', 'requests': self.requests, 'hits': self.hits, 'misses': self.misses,
+                       'errors': self.errors, 'cached': len(self.translations)}
+        if latencies:
+            summary['latency_ms'] = {name: round(percentile(latencies, fraction) * 1000, 3)
+                                     for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1))}
+        return summary
+
+    def serve(self, path):
+        # accept clients on a unix socket at path until SIGTERM or SIGINT
+        # only imported here, like the pool, as --run starts faster without
+        import signal
+        import socket
+        if os.path.exists(path):
+            # a socket left by a server that is gone is replaced
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)
+            else:
+                raise OSError(errno.EADDRINUSE, 'another server is listening', path)
+            finally:
+                probe.close()
+        # what the workers would each read again, read before they fork
+        transpiler_version()
+        runtime_helpers()
+        if self.jobs > 1:
+            import concurrent.futures
+            # the server stops the workers, also on ^C
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+            # start the workers before any thread is, so none forks in the
+            # middle of a request
+            self.executor.submit(transpiler_version).result()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            listener.bind(path)
+            listener.listen(128)
+            while True:
+                connection, _ = listener.accept()
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            listener.close()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+
+
+def report_latency(program, summary):
+    latency = summary.get('latency_ms', {})
+    percentiles = ', '.join(f'{name} {value:g}' for name, value in latency.items())
+    print(f"{program}: served {summary['requests']} requests, {summary['hits']} hits, "
+          f"{summary['misses']} misses, {summary['errors']} errors" +
+          (f'; latency ms: {percentiles}' if percentiles else ''), file=sys.stderr)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(argv[0]), description='Translate dash shell scripts to python.')
+    parser.add_argument('paths', nargs='*', metavar='file_or_dir',
+                        help="shell script to translate ('-' streams standard input to standard "
+                             "output), or a directory of .sh files with --out-dir")
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='write each translation to DIR along with a manifest.json')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help='number of worker processes for --out-dir (default: %(default)s)')
+    parser.add_argument('--cache-dir', metavar='DIR', default=os.environ.get('SHEEPY_CACHE_DIR'),
+                        help='reuse translations of unchanged scripts stored in DIR '
+                             '(default: $SHEEPY_CACHE_DIR, no cache if unset)')
+    parser.add_argument('--cache-size', type=float, default=256, metavar='MB',
+                        help='remove the least recently used translations beyond this size '
+                             '(default: %(default)s)')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='print the cache hits and misses to stderr')
+    parser.add_argument('--native', action='store_true',
+                        help='run ls, pwd, rm, touch, mkdir, chmod, mv, cp and ln inside the python '
+                             'script instead of starting a process for each')
+    parser.add_argument('--buffered', action='store_true',
+                        help='write the output of the scripts in blocks instead of unbuffered, '
+                             'flushing it before they start a command or write to stderr')
+    parser.add_argument('--runtime', action='store_true',
+                        help='import the runtime helpers from sheepy_runtime.py, which is copied '
+                             'next to the translations with --out-dir, instead of writing them '
+                             'into each script')
+    parser.add_argument('--profile', action='store_true',
+                        help='make the scripts time every command they start, and report the calls, '
+                             'time and output of each to stderr (or to $SHEEPY_PROFILE) when they exit')
+    parser.add_argument('--stats', metavar='FILE',
+                        help="write the time each translator took, the statements and lines it "
+                             "translated, the fallbacks it took and the regular expressions it "
+                             "evaluated to FILE as JSON ('-' for stderr); scripts found in the "
+                             "cache aren't translated and don't count")
+    parser.add_argument('--link', action='store_true',
+                        help="translate the scripts a script runs with '. path' or 'sh path', when "
+                             "path is a literal name of a file from the script's directory, along "
+                             "with it: a sourced script in place, a script run by sh as a function; "
+                             "linked translations aren't cached")
+    parser.add_argument('--run', nargs=argparse.REMAINDER, metavar='ARG',
+                        help='translate the script given after it and run it in this process with '
+                             'the arguments that follow, keeping the compiled translation in the '
+                             'cache (default: $SHEEPY_CACHE_DIR, or sheepy in $XDG_CACHE_HOME); '
+                             'the options of sheepy come before it')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help='translate the scripts clients such as sheepy_client.py send to the unix '
+                             'socket SOCKET, with --jobs worker processes and the translations in '
+                             'memory up to --cache-size, until SIGTERM or SIGINT; the latency '
+                             'percentiles of the requests are reported to stderr at the end')
+    parser.add_argument('--incremental', action='store_true',
+                        help='keep the translation of each top level block in the cache, and only '
+                             'translate the blocks of a script that changed since the last run')
+    arguments = parser.parse_args(argv[1:])
+    if arguments.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if arguments.serve is not None:
+        if arguments.paths or arguments.out_dir is not None or arguments.run is not None:
+            parser.error('--serve translates what its clients send')
+        return arguments
+    if arguments.run is not None:
+        if not arguments.run or arguments.run[0] == '-':
+            parser.error('--run needs a script file')
+        if arguments.paths or arguments.out_dir is not None:
+            parser.error('--run runs one script, given after it')
+        return arguments
+    if not arguments.paths:
+        parser.error('the following arguments are required: file_or_dir')
+    if arguments.out_dir is None and (len(arguments.paths) != 1 or os.path.isdir(arguments.paths[0])):
+        parser.error('translating more than one file needs --out-dir')
+    if arguments.incremental and not arguments.cache_dir:
+        parser.error('--incremental needs --cache-dir')
+    return arguments
+
+
+def write_stats(path, stats):
+    text = json.dumps(stats.summary(), indent=2) + '\n'
+    if path == '-':
+        sys.stderr.write(text)
+    else:
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+def report_cache(program, cache):
+    entries = cache.entries()
+    size = sum(size for _, size, _ in entries)
+    blocks = f', {cache.blocks_reused} blocks reused' if cache.incremental else ''
+    print(f'{program}: cache: {cache.hits} hits, {cache.misses} misses{blocks}, '
+          f'{len(entries)} entries, {size / 1024 / 1024:.1f} MB', file=sys.stderr)
+
+
+def main(argv):
+    arguments = parse_arguments(argv)
+    program = os.path.basename(argv[0])
+    # the options change the translation, so they are part of the cache key
+    options = {}
+    if arguments.native:
+        options['native'] = True
+    if arguments.buffered:
+        options['buffered'] = True
+    if arguments.runtime:
+        options['runtime'] = True
+    if arguments.profile:
+        options['profile'] = True
+    if arguments.link:
+        options['link'] = True
+    if arguments.serve is not None:
+        server = TranslationServer(arguments.jobs, int(arguments.cache_size * 1024 * 1024), options)
+        try:
+            server.serve(arguments.serve)
+        except OSError as e:
+            print(f'{program}: {arguments.serve}: {e}', file=sys.stderr)
+            return 1
+        report_latency(program, server.summary())
+        return 0
+    cache = None
+    if arguments.cache_dir or arguments.run is not None:
+        cache = TranslationCache(arguments.cache_dir or default_cache_dir(), int(arguments.cache_size * 1024 * 1024),
+                                 arguments.incremental)
+
+    stats = None
+    if arguments.stats:
+        stats = TranslationStats()
+
+    if arguments.out_dir is not None:
+        start = time.perf_counter()
+        entries = transpile_batch(arguments.paths, arguments.out_dir, arguments.jobs, cache, options, stats)
+        if arguments.runtime:
+            install_runtime(entries)
+        for entry in entries:
+            if entry['status'] != 'ok':
+                print(f"{program}: {entry['source']}: {entry['error']}", file=sys.stderr)
+        failed = write_manifest(arguments.out_dir, entries, time.perf_counter() - start, cache)
+        status = 1 if failed else 0
+    elif arguments.run is not None:
+        shell_path = arguments.run[0]
+        if stats is not None:
+            stats.files += 1
+        try:
+            with open(shell_path) as f:
+                source = f.read()
+            with collect_translation_stats(stats):
+                code = cache.compiled(source, options, shell_path)
+        except (OSError, ShellSyntaxError) as e:
+            print(f'{program}: {shell_path}: {e}', file=sys.stderr)
+            return 1
+        status = 0
+    else:
+        shell_path = arguments.paths[0]
+        if stats is not None:
+            stats.files += 1
+        try:
+            with collect_translation_stats(stats):
+                if shell_path == '-':
+                    # standard input can be any size, so it is never cached
+                    transpile_stream(sys.stdin, sys.stdout, options)
+                else:
+                    with open(shell_path) as f:
+                        source = f.read()
+                    if cache is not None:
+                        python_code = cache.transpile(source, options, shell_path)
+                    else:
+                        python_code = transpile(source, options, shell_path)
+                    sys.stdout.write(python_code)
+        except (OSError, ShellSyntaxError) as e:
+            print(f'{program}: {shell_path}: {e}', file=sys.stderr)
+            return 1
+        status = 0
+
+    if cache is not None:
+        # a run that found its code in the cache added nothing to it
+        if arguments.run is None or cache.misses:
+            cache.evict()
+        if arguments.cache_stats:
+            report_cache(program, cache)
+    if stats is not None:
+        write_stats(arguments.stats, stats)
+    if arguments.run is not None:
+        # the script's exit ends this process with its status
+        run_code(code, shell_path, arguments.run[1:], options)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# The client of sheepy.py --serve SOCKET: sends a shell script to the server
+# and writes the python it gets back to standard output, like sheepy.py
+# would. It only imports what it takes to talk to the server, so a build
+# running it for every script doesn't start sheepy each time. --stats
+# prints the server's counts and latency percentiles as JSON instead.
+#
+#   sheepy_client.py SOCKET [--native] [--buffered] [--runtime] [--profile] [--link] script.sh > script.py
+#   sheepy_client.py SOCKET --stats
+import json
+import os
+import socket
+import sys
+
+# the options of sheepy.py a request can carry
+OPTIONS = {'--native': 'native', '--buffered': 'buffered', '--runtime': 'runtime',
+           '--profile': 'profile', '--link': 'link'}
+
+
+def request(socket_path, message):
+    # -> the server's response to message
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode() + b'\n')
+        with connection.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError('the server closed the connection')
+    return json.loads(line)
+
+
+def main(argv):
+    program = os.path.basename(argv[0])
+    usage = f"usage: {program} SOCKET [--stats | {' '.join(f'[{option}]' for option in OPTIONS)} script.sh]"
+    if len(argv) < 3:
+        print(usage, file=sys.stderr)
+        return 2
+    socket_path = argv[1]
+    options = {}
+    paths = []
+    stats = False
+    for argument in argv[2:]:
+        if argument in OPTIONS:
+            options[OPTIONS[argument]] = True
+        elif argument == '--stats':
+            stats = True
+        elif argument.startswith('-') and argument != '-':
+            print(f'{program}: unknown option {argument}\n{usage}', file=sys.stderr)
+            return 2
+        else:
+            paths.append(argument)
+    if len(paths) != (0 if stats else 1):
+        print(usage, file=sys.stderr)
+        return 2
+
+    try:
+        if stats:
+            print(json.dumps(request(socket_path, {'stats': True}), indent=2))
+            return 0
+        shell_path = paths[0]
+        if shell_path == '-':
+            source = sys.stdin.read()
+            message = {'source': source, 'options': options}
+        else:
+            with open(shell_path) as f:
+                source = f.read()
+            message = {'source': source, 'options': options, 'path': os.path.abspath(shell_path)}
+        response = request(socket_path, message)
+    except (OSError, ValueError) as e:
+        print(f'{program}: {e}', file=sys.stderr)
+        return 1
+    if response.get('status') != 'ok':
+        print(f"{program}: {shell_path}: {response.get('error')}", file=sys.stderr)
+        return 1
+    sys.stdout.write(response['python'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,1482 @@
+# The functions the python scripts written by sheepy call. sheepy copies
+# the ones a script calls into the script, or with --runtime the script
+# imports them from this module, which then has to be on its path. Any
+# module other than os and sys is only imported when a function first uses
+# it, so a script that only echoes never imports subprocess.
+#
+# sheepy reads the functions out of this file: each top level function is
+# preceded by two blank lines and has none inside it, and the modules it
+# uses are the ones it names. The native commands match coreutils' output
+# and exit status for the options they handle, and run the real command
+# for any other option.
+import os
+import sys
+
+
+class LazyModule:
+    # stands in for a module until one of its attributes is used, then
+    # holds the attributes of the imported module
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attribute):
+        module = __import__(self.__name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+atexit = LazyModule('atexit')
+errno = LazyModule('errno')
+fnmatch = LazyModule('fnmatch')
+glob = LazyModule('glob')
+io = LazyModule('io')
+locale = LazyModule('locale')
+mmap = LazyModule('mmap')
+re = LazyModule('re')
+shutil = LazyModule('shutil')
+stat = LazyModule('stat')
+subprocess = LazyModule('subprocess')
+threading = LazyModule('threading')
+time = LazyModule('time')
+
+
+def sheepy_command(arguments):
+    # output captured by sheepy_capture has to go through sys.stdout
+    if sys.stdout is sys.__stdout__:
+        sys.stdout.flush()
+        return subprocess.run(arguments).returncode
+    process = subprocess.run(arguments, stdout=subprocess.PIPE)
+    sys.stdout.buffer.write(process.stdout)
+    return process.returncode
+
+
+def sheepy_quote(name):
+    # quote a file name the way coreutils does in its messages
+    if "'" not in name:
+        return f"'{name}'"
+    if not any(char in name for char in '"$`\\'):
+        return f'"{name}"'
+    return "'" + name.replace("'", "'\\''") + "'"
+
+
+def sheepy_utf8_locale():
+    variables = ('LC_ALL', 'LC_CTYPE', 'LANG')
+    locale = next((os.environ[variable] for variable in variables if os.environ.get(variable)), '')
+    return locale.lower().replace('-', '').endswith('utf8')
+
+
+def sheepy_collation_key():
+    # -> the key that sorts names like strcoll in the collation locale, or
+    # None where that is the order of the characters, as in C and POSIX;
+    # a locale that isn't installed leaves ls in C too
+    variables = ('LC_ALL', 'LC_COLLATE', 'LANG')
+    name = next((os.environ[variable] for variable in variables if os.environ.get(variable)), 'C')
+    if name in ('C', 'POSIX') or name.startswith('C.'):
+        return None
+    try:
+        locale.setlocale(locale.LC_COLLATE, '')
+    except locale.Error:
+        return None
+    return locale.strxfrm
+
+
+def sheepy_locale_quote(name):
+    # the quotes of messages that quote names for the locale instead
+    if sheepy_utf8_locale():
+        return f'\u2018{name}\u2019'
+    return f"'{name}'"
+
+
+def sheepy_error(command, message, status=1):
+    # a buffered stdout is written out first, to keep the order of the two
+    sys.stdout.flush()
+    print(f'{command}: {message}', file=sys.stderr)
+    return status
+
+
+def sheepy_usage(command, message):
+    sys.stdout.flush()
+    print(f'{command}: {message}', file=sys.stderr)
+    print(f"Try '{command} --help' for more information.", file=sys.stderr)
+    return 1
+
+
+def sheepy_options(arguments, letters):
+    # -> (the option letters given, the operands), or None if an option
+    # isn't one of letters; like coreutils, options can follow operands
+    options = set()
+    operands = []
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument == '--':
+            operands += arguments
+        elif argument.startswith('-') and argument != '-':
+            if argument.startswith('--') or not set(argument[1:]) <= set(letters):
+                return None
+            options.update(argument[1:])
+        else:
+            operands.append(argument)
+    return options, operands
+
+
+def sheepy_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def sheepy_targets(command, operands):
+    # -> [(source, destination)] for mv/cp/ln style operands, or a status
+    if not operands:
+        return sheepy_usage(command, 'missing file operand')
+    if len(operands) == 1:
+        return sheepy_usage(command, f'missing destination file operand after {sheepy_quote(operands[0])}')
+    *sources, target = operands
+    if os.path.isdir(target):
+        return [(source, os.path.join(target, os.path.basename(source.rstrip('/')))) for source in sources]
+    if len(sources) > 1 and not os.path.exists(target):
+        return sheepy_error(command, f'target {sheepy_quote(target)}: No such file or directory')
+    if len(sources) > 1:
+        return sheepy_error(command, f'target {sheepy_quote(target)} is not a directory')
+    return [(sources[0], target)]
+
+
+def sheepy_ls(arguments):
+    parsed = sheepy_options(arguments, '1aAd')
+    # a terminal gets columns, which only the real ls lays out
+    if parsed is None or sys.stdout.isatty():
+        return sheepy_command(['ls', *arguments])
+    options, operands = parsed
+    key = sheepy_collation_key()
+    status = 0
+    files = []
+    directories = []
+    for path in operands or ['.']:
+        if not os.path.lexists(path):
+            status = sheepy_error('ls', f'cannot access {sheepy_quote(path)}: No such file or directory', 2)
+        elif 'd' not in options and os.path.isdir(path):
+            directories.append(path)
+        else:
+            files.append(path)
+    for path in sorted(files, key=key):
+        print(path)
+    for index, path in enumerate(sorted(directories, key=key)):
+        try:
+            names = os.listdir(path)
+        except OSError as e:
+            status = sheepy_error('ls', f'cannot open directory {sheepy_quote(path)}: {e.strerror}', 2)
+            continue
+        if files or index:
+            print()
+        if len(operands) > 1:
+            print(f'{path}:')
+        if 'a' in options:
+            names += ['.', '..']
+        elif 'A' not in options:
+            names = [name for name in names if not name.startswith('.')]
+        for name in sorted(names, key=key):
+            print(name)
+    return status
+
+
+def sheepy_pwd(arguments):
+    parsed = sheepy_options(arguments, 'P')
+    if parsed is None or parsed[1]:
+        return sheepy_command(['pwd', *arguments])
+    print(os.getcwd())
+    return 0
+
+
+def sheepy_rm(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'frR')
+    # rm asks before removing write protected files when run from a terminal
+    if parsed is None or ('f' not in parsed[0] and sys.stdin.isatty()) or \
+            any(os.path.basename(path.rstrip('/')) in ('', '.', '..') for path in parsed[1]):
+        return sheepy_command(['rm', *arguments])
+    options, operands = parsed
+    if not operands:
+        return 0 if 'f' in options else sheepy_usage('rm', 'missing operand')
+    status = 0
+    for path in operands:
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                if not options & {'r', 'R'}:
+                    status = sheepy_error('rm', f'cannot remove {sheepy_quote(path)}: Is a directory')
+                    continue
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        except FileNotFoundError as e:
+            if 'f' not in options or e.filename != path:
+                status = sheepy_error('rm', f'cannot remove {sheepy_quote(e.filename)}: {e.strerror}')
+        except OSError as e:
+            status = sheepy_error('rm', f'cannot remove {sheepy_quote(e.filename or path)}: {e.strerror}')
+    return status
+
+
+def sheepy_touch(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'c')
+    if parsed is None or '-' in parsed[1]:
+        return sheepy_command(['touch', *arguments])
+    options, operands = parsed
+    if not operands:
+        return sheepy_usage('touch', 'missing file operand')
+    status = 0
+    for path in operands:
+        error = None
+        if 'c' not in options:
+            try:
+                os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_NOCTTY | os.O_NONBLOCK, 0o666))
+            except OSError as e:
+                error = e
+        try:
+            os.utime(path)
+        except FileNotFoundError as e:
+            if 'c' not in options:
+                status = sheepy_error('touch', f'cannot touch {sheepy_quote(path)}: {(error or e).strerror}')
+        except OSError as e:
+            status = sheepy_error('touch', f'cannot touch {sheepy_quote(path)}: {(error or e).strerror}')
+    return status
+
+
+def sheepy_mkdir(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'p')
+    if parsed is None:
+        return sheepy_command(['mkdir', *arguments])
+    options, operands = parsed
+    if not operands:
+        return sheepy_usage('mkdir', 'missing operand')
+    status = 0
+    for path in operands:
+        try:
+            if 'p' in options:
+                os.makedirs(path, exist_ok=True)
+            else:
+                os.mkdir(path)
+        except OSError as e:
+            status = sheepy_error('mkdir', f'cannot create directory {sheepy_locale_quote(path)}: {e.strerror}')
+    return status
+
+
+def sheepy_mode(mode, current, is_directory):
+    # -> the file mode after applying an octal or symbolic chmod mode to
+    # current, or None if the mode isn't understood or depends on the umask
+    if re.fullmatch(r'[0-7]{1,4}', mode):
+        new = int(mode, 8)
+        if is_directory and len(mode) < 5:
+            # like chmod, keep the set-id bits of directories
+            new |= current & 0o6000
+        return new
+    umask = None
+    for clause in mode.split(','):
+        match = re.fullmatch(r'([ugoa]*)((?:[-+=](?:[rwxXst]*|[ugo]))+)', clause)
+        if match is None:
+            return None
+        who = 0
+        for letter in match[1] or 'a':
+            who |= {'u': 0o4700, 'g': 0o2070, 'o': 0o1007, 'a': 0o7777}[letter]
+        for operator, permissions in re.findall(r'([-+=])([ugo]|[rwxXst]*)', match[2]):
+            if permissions in ('u', 'g', 'o'):
+                bits = (current >> {'u': 6, 'g': 3, 'o': 0}[permissions] & 7) * 0o111
+            else:
+                bits = 0
+                for letter in permissions:
+                    if letter == 'X' and not (is_directory or current & 0o111):
+                        continue
+                    bits |= {'r': 0o444, 'w': 0o222, 'x': 0o111, 'X': 0o111, 's': 0o6000, 't': 0o1000}[letter]
+            bits &= who
+            if not match[1]:
+                # without u, g, o or a the umask applies, along with
+                # warnings that only chmod gives
+                if umask is None:
+                    umask = sheepy_umask()
+                if bits & umask or operator == '=' and umask:
+                    return None
+            if operator == '+':
+                current |= bits
+            elif operator == '-':
+                current &= ~bits
+            else:
+                current = current & ~who | bits
+    return current
+
+
+def sheepy_chmod(arguments):
+    if not arguments:
+        return sheepy_usage('chmod', 'missing operand')
+    mode, *paths = arguments
+    if any(path.startswith('-') for path in paths) or mode.startswith('--') or \
+            mode.startswith('-') and not re.fullmatch(r'-[rwxXst]+', mode):
+        return sheepy_command(['chmod', *arguments])
+    if not paths:
+        return sheepy_usage('chmod', f'missing operand after {sheepy_locale_quote(mode)}')
+    # chmod itself reports bad modes, and the warnings that come with the umask
+    if sheepy_mode(mode, 0, False) is None:
+        return sheepy_command(['chmod', *arguments])
+    status = 0
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+        except OSError as e:
+            status = sheepy_error('chmod', f'cannot access {sheepy_quote(path)}: {e.strerror}')
+            continue
+        try:
+            os.chmod(path, sheepy_mode(mode, stat_result.st_mode & 0o7777, os.path.isdir(path)))
+        except OSError as e:
+            status = sheepy_error('chmod', f'changing permissions of {sheepy_quote(path)}: {e.strerror}')
+    return status
+
+
+def sheepy_mv(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'f')
+    # mv asks before replacing write protected files when run from a terminal
+    if parsed is None or ('f' not in parsed[0] and sys.stdin.isatty()):
+        return sheepy_command(['mv', *arguments])
+    targets = sheepy_targets('mv', parsed[1])
+    if isinstance(targets, int):
+        return targets
+    status = 0
+    for source, destination in targets:
+        if not os.path.lexists(source):
+            status = sheepy_error('mv', f'cannot stat {sheepy_quote(source)}: No such file or directory')
+        elif os.path.lexists(destination) and os.path.samefile(source, destination):
+            status = sheepy_error('mv', f'{sheepy_quote(source)} and {sheepy_quote(destination)} are the same file')
+        else:
+            try:
+                try:
+                    os.rename(source, destination)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    shutil.move(source, destination)
+            except OSError as e:
+                status = sheepy_error('mv', f'cannot move {sheepy_quote(source)} to {sheepy_quote(destination)}: {e.strerror}')
+    return status
+
+
+def sheepy_copy(source, destination, preserve):
+    # copy the file's contents, a new file gets its mode less the umask
+    if preserve:
+        return shutil.copy2(source, destination)
+    exists = os.path.exists(destination)
+    shutil.copyfile(source, destination)
+    if not exists:
+        os.chmod(destination, os.stat(source).st_mode & 0o777 & ~sheepy_umask())
+    return destination
+
+
+def sheepy_cp(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'rRp')
+    if parsed is None:
+        return sheepy_command(['cp', *arguments])
+    options = parsed[0]
+    targets = sheepy_targets('cp', parsed[1])
+    if isinstance(targets, int):
+        return targets
+    status = 0
+    for source, destination in targets:
+        if not os.path.exists(source):
+            status = sheepy_error('cp', f'cannot stat {sheepy_quote(source)}: No such file or directory')
+        elif os.path.exists(destination) and os.path.samefile(source, destination):
+            status = sheepy_error('cp', f'{sheepy_quote(source)} and {sheepy_quote(destination)} are the same file')
+        elif os.path.isdir(source):
+            if not options & {'r', 'R'}:
+                status = sheepy_error('cp', f'-r not specified; omitting directory {sheepy_quote(source)}')
+                continue
+            try:
+                shutil.copytree(source, destination, symlinks=True, dirs_exist_ok=True,
+                                copy_function=lambda source, destination: sheepy_copy(source, destination, 'p' in options))
+            except (OSError, shutil.Error) as e:
+                status = sheepy_error('cp', f'cannot copy {sheepy_quote(source)}: {e}')
+            if (os.path.realpath(destination) + os.sep).startswith(os.path.realpath(source) + os.sep):
+                # cp makes the one copy, then complains
+                status = sheepy_error('cp', f'cannot copy a directory, {sheepy_quote(source)}, '
+                                            f'into itself, {sheepy_quote(destination)}')
+        else:
+            try:
+                sheepy_copy(source, destination, 'p' in options)
+            except OSError as e:
+                if e.filename == source:
+                    status = sheepy_error('cp', f'cannot open {sheepy_quote(source)} for reading: {e.strerror}')
+                else:
+                    status = sheepy_error('cp', f'cannot create regular file {sheepy_quote(destination)}: {e.strerror}')
+    return status
+
+
+def sheepy_ln(arguments):
+    sheepy_glob_cache().clear()
+    parsed = sheepy_options(arguments, 'sf')
+    if parsed is None:
+        return sheepy_command(['ln', *arguments])
+    options, operands = parsed
+    if len(operands) == 1:
+        # ln target makes a link to it in the current directory
+        targets = [(operands[0], os.path.basename(operands[0].rstrip('/')))]
+    else:
+        targets = sheepy_targets('ln', operands)
+    if isinstance(targets, int):
+        return targets
+    status = 0
+    kind = 'symbolic' if 's' in options else 'hard'
+    for source, destination in targets:
+        if kind == 'hard' and not os.path.exists(source):
+            status = sheepy_error('ln', f'failed to access {sheepy_quote(source)}: No such file or directory')
+            continue
+        try:
+            if 'f' in options and os.path.lexists(destination) and not os.path.isdir(destination):
+                os.unlink(destination)
+            if kind == 'symbolic':
+                os.symlink(source, destination)
+            else:
+                os.link(source, destination)
+        except OSError as e:
+            status = sheepy_error('ln', f'failed to create {kind} link {sheepy_quote(destination)}: {e.strerror}')
+    return status
+
+
+class sheepy_files(dict):
+    # the files a loop prints to, path -> open file, which stay open until
+    # the loop ends
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for f in self.values():
+            f.close()
+
+
+def sheepy_file(files, path, mode):
+    # the open file for a > or >> redirect, which > truncates again
+    f = files.get(path)
+    if f is None:
+        # the same file under another name
+        try:
+            status = os.stat(path)
+        except OSError:
+            status = None
+        f = next((other for other in files.values()
+                  if status and os.path.samestat(status, os.fstat(other.fileno()))), None)
+        if f is None:
+            files[path] = open(path, mode)
+            return files[path]
+        files[path] = f
+    if mode == 'w':
+        f.seek(0)
+        f.truncate()
+    return f
+
+
+def sheepy_cd(directory):
+    # cd where its status is used: an error message and status 2 for a
+    # directory it can't change to, as dash has
+    try:
+        os.chdir(directory)
+    except OSError:
+        return sheepy_error(sys.argv[0], f"cd: can't cd to {directory}", 2)
+    return 0
+
+
+def sheepy_arithmetic_error(message):
+    # an error in $((...)) exits the script like it does dash
+    sheepy_error(sys.argv[0], message)
+    sys.exit(2)
+
+
+def sheepy_arithmetic_int(value):
+    # the value of a variable in $((...)), read like dash does with strtoimax:
+    # an optional sign and a hexadecimal number after 0x, an octal one after
+    # 0 or a decimal one, with blanks around them; nothing but blanks is 0
+    text = value.strip(' \t\n\v\f\r')
+    if not text:
+        return 0
+    digits = text[1:] if text[0] in '-+' else text
+    base = 16 if digits[:2] in ('0x', '0X') else 8 if digits[:1] == '0' else 10
+    if base == 16:
+        digits = digits[2:]
+    number = None
+    if digits.isascii() and digits.isalnum():
+        try:
+            number = int(digits, base)
+        except ValueError:
+            pass
+    if number is not None and text[0] == '-':
+        number = -number
+    if number is None or not -2 ** 63 <= number < 2 ** 63:
+        sheepy_arithmetic_error(f'Illegal number: {value}')
+    return number
+
+
+def sheepy_fields(pieces):
+    # the fields of a word from its pieces of text, each with whether it is
+    # an unquoted expansion, which is split on blanks, unlike the others
+    fields = []
+    field = None
+    for text, split in pieces:
+        if not split:
+            field = (field or '') + text
+            continue
+        words = text.split()
+        if text[:1].isspace() and field is not None:
+            fields.append(field)
+            field = None
+        if words:
+            words[0] = (field or '') + words[0]
+            fields += words[:-1]
+            field = words[-1]
+            if text[-1].isspace():
+                fields.append(field)
+                field = None
+    if field is not None:
+        fields.append(field)
+    return fields
+
+
+def sheepy_div(left, right, expression=None):
+    # integer division truncating toward zero, as in C; dividing by zero in
+    # $((expression)) ends the script, for expr it raises ZeroDivisionError
+    if right == 0 and expression is not None:
+        sheepy_arithmetic_error(f'arithmetic expression: division by zero: "{expression}"')
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def sheepy_mod(left, right, expression=None):
+    # the remainder has the sign of the dividend, as in C
+    if right == 0 and expression is not None:
+        sheepy_arithmetic_error(f'arithmetic expression: division by zero: "{expression}"')
+    remainder = abs(left) % abs(right)
+    return -remainder if left < 0 else remainder
+
+
+def sheepy_expr(evaluate):
+    # the output of expr for its arguments compiled to python
+    try:
+        return str(evaluate()).rstrip('\n')
+    except ValueError:
+        return sheepy_error('expr', 'non-integer argument', '')
+    except ZeroDivisionError:
+        return sheepy_error('expr', 'division by zero', '')
+
+
+def sheepy_expr_int(value):
+    # expr only takes decimal integers, with an optional minus sign
+    if isinstance(value, str):
+        digits = value[1:] if value.startswith('-') else value
+        if not (digits.isascii() and digits.isdigit()):
+            raise ValueError(value)
+    return int(value)
+
+
+def sheepy_expr_null(value):
+    return isinstance(value, int) and value == 0 or \
+        isinstance(value, str) and re.fullmatch(r'(-?0+)?', value) is not None
+
+
+def sheepy_expr_or(left, right):
+    if not sheepy_expr_null(left):
+        return left
+    return 0 if sheepy_expr_null(right) else right
+
+
+def sheepy_expr_and(left, right):
+    return 0 if sheepy_expr_null(left) or sheepy_expr_null(right) else left
+
+
+def sheepy_expr_compare(left, operator, right):
+    # integers compare as numbers, anything else as strings
+    if re.fullmatch(r'-?\d+', str(left)) and re.fullmatch(r'-?\d+', str(right)):
+        left, right = int(left), int(right)
+    else:
+        left, right = str(left), str(right)
+    results = {'<': left < right, '<=': left <= right, '=': left == right, '==': left == right,
+               '!=': left != right, '>=': left >= right, '>': left > right}
+    return int(results[operator])
+
+
+def sheepy_grep_char(utf8):
+    # a character of a line, which takes up to four bytes in utf-8
+    if utf8:
+        return r'(?:[\x00-\x09\x0b-\x7f]|[\xc2-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf4][\x80-\xbf]{3})'
+    return r'[^\n]'
+
+
+def sheepy_grep_bracket(pattern, index, utf8):
+    # -> (the python regex of the bracket expression at index, the index
+    # after it), or None if it uses something only the real grep handles
+    classes = {'alpha': 'a-zA-Z', 'digit': '0-9', 'alnum': '0-9A-Za-z', 'upper': 'A-Z',
+               'lower': 'a-z', 'space': r' \t\r\f\v', 'blank': r' \t', 'xdigit': '0-9A-Fa-f',
+               'punct': re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'), 'print': ' -~',
+               'graph': '!-~', 'cntrl': r'\x00-\x09\x0b-\x1f\x7f'}
+    negate = pattern.startswith('^', index)
+    index += negate
+    members = ''
+    start = index
+    while index == start or not pattern.startswith(']', index):
+        if index >= len(pattern):
+            return None
+        if pattern.startswith('[:', index):
+            end = pattern.find(':]', index + 2)
+            name = pattern[index + 2:end]
+            # a multibyte locale has letters outside of ascii
+            if end < 0 or name not in classes or utf8 and name not in ('digit', 'space', 'blank', 'xdigit', 'cntrl'):
+                return None
+            members += classes[name]
+            index = end + 2
+        elif pattern.startswith(('[.', '[='), index):
+            return None
+        else:
+            char = pattern[index]
+            members += '\\' + char if char in '\\[]^' else char
+            index += 1
+    if not negate:
+        return f'[{members}]', index + 1
+    if utf8:
+        return rf'(?:(?![{members}\n]){sheepy_grep_char(utf8)})', index + 1
+    return rf'[^{members}\n]', index + 1
+
+
+def sheepy_grep_regex(pattern, extended, utf8):
+    # a basic or extended grep regular expression as a python one matching
+    # within a line, or None if it uses something only the real grep handles
+    if not pattern.isascii():
+        return None
+    regex = []
+    # what came last: the start of an expression (where a basic expression
+    # takes ^ as an anchor), an anchor (after which it takes * literally), an
+    # atom or a quantifier
+    last = 'start'
+    depth = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        index += 1
+        if char == '\\':
+            if index == len(pattern):
+                return None
+            char = pattern[index]
+            index += 1
+            if char in '(){}|+?':
+                operator = not extended
+            elif char in '<>bBwW' and utf8:
+                # words of a multibyte locale have letters outside of ascii
+                return None
+            elif char in '<>bB':
+                regex.append({'<': r'\b(?=\w)', '>': r'\b(?<=\w)', 'b': r'\b', 'B': r'\B'}[char])
+                last = 'anchor'
+                continue
+            elif char in 'wWsS123456789':
+                regex.append({'W': r'[^\w\n]', 's': r'[^\S\n]'}.get(char, '\\' + char))
+                last = 'atom'
+                continue
+            elif char.isalnum():
+                return None
+            else:
+                regex.append(re.escape(char))
+                last = 'atom'
+                continue
+        else:
+            operator = extended and char in '(){}|+?'
+        if operator and char == '(':
+            regex.append('(')
+            depth += 1
+            last = 'start'
+        elif operator and char == ')':
+            if not depth:
+                return None
+            regex.append(')')
+            depth -= 1
+            last = 'atom'
+        elif operator and char == '|':
+            regex.append('|')
+            last = 'start'
+        elif operator and char == '{':
+            close = '}' if extended else '\\}'
+            end = pattern.find(close, index)
+            interval = re.fullmatch(r'(\d*)(,?)(\d*)', pattern[index:end])
+            if last != 'atom' or end < 0 or not interval or interval.group() in ('', ','):
+                return None
+            regex.append('{' + interval.group() + '}')
+            index = end + len(close)
+            last = 'quantifier'
+        elif operator and char in '+?':
+            if last != 'atom':
+                return None
+            regex.append(char)
+            last = 'quantifier'
+        elif operator:
+            return None
+        elif char == '*' and last in ('start', 'anchor') and not extended:
+            regex.append(re.escape(char))
+            last = 'atom'
+        elif char == '*':
+            # a** is a*, but python rejects the repeated repeat
+            if last == 'quantifier' and regex[-1] == '*':
+                continue
+            if last != 'atom':
+                return None
+            regex.append(char)
+            last = 'quantifier'
+        elif char == '^' and (extended or last == 'start'):
+            regex.append(char)
+            last = 'anchor'
+        elif char == '$' and (extended or index == len(pattern) or pattern.startswith(('\\)', '\\|'), index)):
+            regex.append(char)
+            last = 'anchor'
+        elif char == '[':
+            bracket = sheepy_grep_bracket(pattern, index, utf8)
+            if bracket is None:
+                return None
+            regex.append(bracket[0])
+            index = bracket[1]
+            last = 'atom'
+        elif char == '.':
+            regex.append(sheepy_grep_char(utf8))
+            last = 'atom'
+        else:
+            regex.append(re.escape(char))
+            last = 'atom'
+    return ''.join(regex) if not depth else None
+
+
+def sheepy_grep_pattern(pattern, options, utf8):
+    # a grep pattern, which is a line per pattern, compiled to match within
+    # the lines of a buffer, or None if the real grep has to run it; the
+    # options are the ones of x i F E given
+    patterns = pattern.split('\n')
+    if 'F' in options:
+        if 'i' in options and not pattern.isascii():
+            return None
+        regexes = [re.escape(os.fsencode(pattern).decode('latin-1')) for pattern in patterns]
+    else:
+        # back references count the groups of every pattern
+        if len(patterns) > 1 and re.search(r'\\[1-9]', pattern):
+            return None
+        regexes = [sheepy_grep_regex(pattern, 'E' in options, utf8) for pattern in patterns]
+        if None in regexes:
+            return None
+    regex = '|'.join(regexes) if len(regexes) == 1 else '|'.join(f'(?:{regex})' for regex in regexes)
+    if 'x' in options:
+        regex = f'^(?:{regex})$'
+    try:
+        return re.compile(regex.encode('latin-1'), re.MULTILINE | (re.IGNORECASE if 'i' in options else 0))
+    except re.error:
+        return None
+
+
+def sheepy_grep_compile(pattern, options, utf8, compiled={}):
+    # each pattern is compiled once for the run
+    key = pattern, options, utf8
+    if key not in compiled:
+        compiled[key] = sheepy_grep_pattern(pattern, options, utf8)
+    return compiled[key]
+
+
+def sheepy_grep_lines(regex, data, invert):
+    # the (start, end) offsets of the lines of data that grep selects,
+    # searching the whole buffer for the lines that match
+    position = 0
+    while position < len(data):
+        match = regex.search(data, position)
+        if match is None:
+            start = end = len(data)
+        else:
+            start = data.rfind(b'\n', 0, match.start()) + 1
+            end = data.find(b'\n', match.start())
+            end = len(data) if end < 0 else end
+        if invert:
+            while position < start:
+                line_end = data.find(b'\n', position, start)
+                line_end = start if line_end < 0 else line_end
+                yield position, line_end
+                position = line_end + 1
+        elif start < len(data):
+            yield start, end
+        position = end + 1
+
+
+def sheepy_grep_input(path):
+    # -> the chunks of whole lines of a file, which is mapped rather than read
+    if path == '-':
+        return sheepy_chunks(sys.stdin.buffer)
+    with open(path, 'rb') as f:
+        try:
+            return [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)]
+        except (OSError, ValueError):
+            return [f.read()]
+
+
+def sheepy_chunks(f):
+    # the lines of a stream, read a block of whole lines at a time
+    rest = b''
+    while True:
+        data = f.read1(65536)
+        if not data:
+            break
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        if end:
+            yield data[:end]
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def sheepy_grep_binary(data, utf8):
+    # grep doesn't print the lines of files with nul bytes, or of ones that
+    # aren't valid in a utf-8 locale
+    if data.find(b'\0') >= 0:
+        return True
+    if utf8 and re.search(rb'[\x80-\xff]', data):
+        try:
+            bytes(data).decode()
+        except UnicodeDecodeError:
+            return True
+    return False
+
+
+def sheepy_grep_arguments(arguments):
+    # -> (options, pattern, files, compiled pattern), or None if the real
+    # grep has to run
+    parsed = sheepy_options(arguments, 'qxvcinFE')
+    if parsed is None or not parsed[1] or {'E', 'F'} <= parsed[0]:
+        return None
+    options, (pattern, *paths) = parsed
+    regex = sheepy_grep_compile(pattern, ''.join(sorted(options & set('xiFE'))), sheepy_utf8_locale())
+    if regex is None:
+        return None
+    return options, pattern, paths, regex
+
+
+def sheepy_grep_search(regex, options, chunks, name, prefix, utf8):
+    # grep the chunks of whole lines of an input, yielding the output
+    # -> the number of lines selected
+    count = 0
+    number = 1
+    binary = False
+    for chunk in chunks:
+        binary = binary or not options & set('qc') and sheepy_grep_binary(chunk, utf8)
+        output = []
+        counted = 0
+        for start, end in sheepy_grep_lines(regex, chunk, 'v' in options):
+            count += 1
+            # -q stops at the first line selected
+            if 'q' in options:
+                return count
+            if binary:
+                sheepy_error('grep', f'{name}: binary file matches')
+                return count
+            if 'c' in options:
+                continue
+            line = prefix
+            if 'n' in options:
+                number += chunk[counted:start].count(b'\n')
+                counted = start
+                line += b'%d:' % number
+            output.append(line + chunk[start:end] + b'\n')
+        if 'n' in options:
+            number += chunk[counted:].count(b'\n')
+        if output:
+            yield b''.join(output)
+    if 'c' in options:
+        yield prefix + b'%d\n' % count
+    return count
+
+
+def sheepy_grep(arguments):
+    parsed = sheepy_grep_arguments(arguments)
+    if parsed is None:
+        return sheepy_command(['grep', *arguments])
+    options, pattern, paths, regex = parsed
+    utf8 = sheepy_utf8_locale()
+    matched = False
+    error = False
+    sys.stdout.flush()
+    for path in paths or ['-']:
+        name = '(standard input)' if path == '-' else path
+        try:
+            chunks = sheepy_grep_input(path)
+        except OSError as e:
+            sheepy_error('grep', f'{name}: {e.strerror}', 2)
+            error = True
+            continue
+        prefix = os.fsencode(name) + b':' if len(paths) > 1 else b''
+        count = sheepy_drain(sheepy_grep_search(regex, options, chunks, name, prefix, utf8), sys.stdout.buffer)
+        if count and 'q' in options:
+            return 0
+        matched = matched or count
+    return 2 if error else 0 if matched else 1
+
+
+def sheepy_fgrep(arguments):
+    return sheepy_grep(['-F', *arguments])
+
+
+def sheepy_egrep(arguments):
+    return sheepy_grep(['-E', *arguments])
+
+
+def sheepy_drain(lines, sink, source=None):
+    # write what a python stage of a pipeline yields to sink, then close
+    # the pipes at either end -> the value the stage returns, its exit status
+    try:
+        while True:
+            try:
+                line = next(lines)
+            except StopIteration as stop:
+                return stop.value or 0
+            sink.write(line)
+    except BrokenPipeError:
+        # like a command killed by SIGPIPE
+        lines.close()
+        return 141
+    finally:
+        if source is not None:
+            source.close()
+        if sink is sys.stdout.buffer:
+            sink.flush()
+        else:
+            sink.close()
+
+
+def sheepy_output(text):
+    # echo as a python stage
+    yield os.fsencode(text)
+    return 0
+
+
+def sheepy_process_stage(arguments, lines):
+    # a command run as a python stage, when a native one can't run natively
+    if hasattr(lines, 'fileno'):
+        process = subprocess.Popen(arguments, stdin=lines, stdout=subprocess.PIPE)
+        feeder = None
+    else:
+        process = subprocess.Popen(arguments, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        feeder = threading.Thread(target=sheepy_drain, args=(lines, process.stdin))
+        feeder.start()
+    try:
+        yield from sheepy_chunks(process.stdout)
+    finally:
+        process.stdout.close()
+        if feeder:
+            feeder.join()
+    return process.wait()
+
+
+def sheepy_grep_stage(arguments, lines):
+    # grep reading its standard input as a python stage
+    parsed = sheepy_grep_arguments(arguments)
+    if parsed is None or parsed[2]:
+        return (yield from sheepy_process_stage(['grep', *arguments], lines))
+    options, pattern, paths, regex = parsed
+    chunks = sheepy_chunks(lines) if hasattr(lines, 'read1') else lines
+    count = yield from sheepy_grep_search(regex, options, chunks, '(standard input)', b'', sheepy_utf8_locale())
+    return 0 if count else 1
+
+
+def sheepy_fgrep_stage(arguments, lines):
+    return (yield from sheepy_grep_stage(['-F', *arguments], lines))
+
+
+def sheepy_egrep_stage(arguments, lines):
+    return (yield from sheepy_grep_stage(['-E', *arguments], lines))
+
+
+def sheepy_pipeline(stages):
+    # run the stages of a pipeline together: commands (argument lists) are
+    # connected by os pipes, and each run of python stages runs in a thread
+    # of its own; a python stage is a function from its input (a file, or
+    # the blocks of whole lines the stage before yields) to a generator of
+    # the blocks it writes -> the exit status of the last stage
+    sys.stdout.flush()
+    processes = []
+    threads = []
+    status = None
+    source = None
+    index = 0
+    while index < len(stages):
+        if isinstance(stages[index], list):
+            last = index == len(stages) - 1
+            processes.append(subprocess.Popen(stages[index], stdin=source, stdout=None if last else subprocess.PIPE))
+            # the process has a copy of its end of the pipe
+            if source is not None:
+                source.close()
+            source = processes[-1].stdout
+            index += 1
+            continue
+        lines = sys.stdin.buffer if source is None else source
+        while index < len(stages) and not isinstance(stages[index], list):
+            lines = stages[index](lines)
+            index += 1
+        if index == len(stages):
+            status = sheepy_drain(lines, sys.stdout.buffer, source)
+        else:
+            read, write = os.pipe()
+            threads.append(threading.Thread(target=sheepy_drain, args=(lines, open(write, 'wb'), source)))
+            threads[-1].start()
+            source = open(read, 'rb')
+    for process in processes:
+        process.wait()
+    for thread in threads:
+        thread.join()
+    return processes[-1].returncode if status is None else status
+
+
+def sheepy_spawn(function, *arguments, **keywords):
+    # start a child with the buffered option, once what the script printed
+    # is written out
+    sys.stdout.flush()
+    return function(*arguments, **keywords)
+
+
+def sheepy_call(script, arguments):
+    # run the function of a script linked with sh as sh would run the
+    # script, with arguments as its $0, $1... and a working directory of its
+    # own, where exit only ends the script -> its exit status, 0 if it
+    # doesn't exit
+    argv, directory = sys.argv, os.getcwd()
+    sys.argv = arguments
+    try:
+        script()
+    except SystemExit as e:
+        return 0 if e.code is None else e.code & 255
+    finally:
+        sys.argv = argv
+        os.chdir(directory)
+    return 0
+
+
+def sheepy_profile(line, name, function, *arguments, **keywords):
+    # with the profile option every command the script starts goes through
+    # here, counted under its line and name, and reported at exit
+    calls = sheepy_profile_calls()
+    if not calls:
+        atexit.register(sheepy_profile_report, calls)
+    start = time.perf_counter()
+    try:
+        result = function(*arguments, **keywords)
+    finally:
+        seconds = time.perf_counter() - start
+        call = calls.setdefault((line, name), [0, 0.0, 0.0, 0])
+        call[0] += 1
+        call[1] += seconds
+        call[2] = max(call[2], seconds)
+    for output in (getattr(result, 'stdout', None), getattr(result, 'stderr', None)):
+        if isinstance(output, str):
+            call[3] += len(output.encode(errors='surrogateescape'))
+        elif isinstance(output, bytes):
+            call[3] += len(output)
+    return result
+
+
+def sheepy_profile_calls(calls={}):
+    # (line, name) -> [calls, total seconds, longest seconds, bytes captured]
+    return calls
+
+
+def sheepy_profile_report(calls):
+    # write what sheepy_profile counted to stderr, or to $SHEEPY_PROFILE,
+    # the commands that took longest first
+    total = sum(call[1] for call in calls.values())
+    width = max(len(name) for _, name in calls)
+    lines = [f'sheepy profile: {sum(call[0] for call in calls.values())} commands started in {total:.3f} s',
+             f"{'line':>5}  {'command':{width}} {'calls':>6} {'total s':>9} {'max s':>9} {'bytes':>9}"]
+    for (line, name), call in sorted(calls.items(), key=lambda item: -item[1][1]):
+        lines.append(f'{line:5}  {name:{width}} {call[0]:6} {call[1]:9.3f} {call[2]:9.3f} {call[3]:9}')
+    path = os.environ.get('SHEEPY_PROFILE')
+    sys.stdout.flush()
+    if path:
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    else:
+        print('\n'.join(lines), file=sys.stderr, flush=True)
+
+
+def sheepy_capture(command, arguments):
+    # the output of a native command for $(...), without trailing newlines
+    sys.stdout.flush()
+    stdout = sys.stdout
+    sys.stdout = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    try:
+        command(arguments)
+        return sys.stdout.buffer.getvalue().decode(errors='surrogateescape').rstrip('\n')
+    finally:
+        sys.stdout = stdout
+
+
+def sheepy_basename(arguments):
+    parsed = sheepy_options(arguments, '')
+    if parsed is None or len(parsed[1]) not in (1, 2):
+        return sheepy_command(['basename', *arguments])
+    name, *suffix = parsed[1]
+    base = os.path.basename(name.rstrip('/')) or name[:1]
+    if suffix and suffix[0] and base != suffix[0] and base.endswith(suffix[0]):
+        base = base[:-len(suffix[0])]
+    print(base)
+    return 0
+
+
+def sheepy_dirname(arguments):
+    parsed = sheepy_options(arguments, '')
+    if parsed is None or not parsed[1]:
+        return sheepy_command(['dirname', *arguments])
+    for name in parsed[1]:
+        stripped = name.rstrip('/')
+        head = stripped[:stripped.rfind('/') + 1]
+        if not stripped:
+            print('/' if name else '.')
+        else:
+            print(head.rstrip('/') or '/' if head else '.')
+    return 0
+
+
+def sheepy_printf_escape(text, argument):
+    # -> (text with its backslash escapes replaced, whether it has \c),
+    # the escapes of %b arguments if argument, or else of the format
+    escapes = {'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+    octal = r'0?[0-7]{1,3}' if argument else r'[0-7]{1,3}'
+    output = []
+    for match in re.finditer(rf'\\({octal}|c|.?)|[^\\]+', text, re.DOTALL):
+        escape = match.group(1)
+        if escape is None:
+            output.append(match.group())
+        elif escape == 'c' and argument:
+            return ''.join(output), True
+        elif escape[:1].isdigit():
+            code = int(escape, 8)
+            if code > 127:
+                raise ValueError(escape)
+            output.append(chr(code))
+        else:
+            output.append(escapes.get(escape, match.group()))
+    return ''.join(output), False
+
+
+def sheepy_printf_number(value, conversion):
+    # a numeric argument the way printf reads it, or ValueError
+    if value[:1] in ('"', "'"):
+        return ord(value[1]) if len(value) > 1 else 0
+    if conversion in 'eEfgG':
+        return float(value) if value.strip() else 0.0
+    if not value:
+        return 0
+    match = re.fullmatch(r'\s*([-+]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)', value)
+    if match is None:
+        raise ValueError(value)
+    number = match.group(2)
+    number = int(number, 16 if number[1:2] in ('x', 'X') else 8 if number.startswith('0') else 10)
+    return -number if match.group(1) == '-' else number
+
+
+def sheepy_printf_format(format, values):
+    # the output of printf for format and values, reusing the format while
+    # values are left; ValueError for what only the real printf handles
+    output = []
+    values = list(values)
+    while True:
+        consumed = False
+        for match in re.finditer(r'%([-+ #0]*)(\*|\d*)(?:\.(\*|\d*))?(.?)|(?:[^%\\]|\\.?)+', format, re.DOTALL):
+            flags, width, precision, conversion = match.groups()
+            if conversion is None:
+                output.append(sheepy_printf_escape(match.group(), False)[0])
+                continue
+            if conversion == '%' and not (flags or width or precision):
+                output.append('%')
+                continue
+            if not conversion or conversion not in 'diouxXcsbeEfgG' or '#' in flags and conversion == 'o':
+                raise ValueError(conversion)
+            if width == '*' or precision == '*':
+                consumed = True
+                stars = [sheepy_printf_number(values.pop(0) if values else '', 'd') for star in (width, precision) if star == '*']
+                width = str(stars.pop(0)) if width == '*' else width
+                precision = str(stars.pop(0)) if precision == '*' else precision
+            consumed = consumed or bool(values)
+            value = values.pop(0) if values else ''
+            spec = '%' + flags + width + ('.' + precision if precision is not None else '')
+            if conversion in 'sb':
+                if conversion == 'b':
+                    value, stop = sheepy_printf_escape(value, True)
+                    # \c ends the output
+                    if stop:
+                        return ''.join(output) + (spec + 's') % value
+                output.append((spec + 's') % value)
+            elif conversion == 'c':
+                output.append((spec + 's') % (value[:1] or '\0'))
+            else:
+                number = sheepy_printf_number(value, conversion)
+                if conversion in 'ouxX':
+                    number %= 2 ** 64
+                output.append((spec + {'i': 'd', 'u': 'd'}.get(conversion, conversion)) % number)
+        if not consumed or not values:
+            return ''.join(output)
+
+
+def sheepy_printf(arguments):
+    # the output of printf, formatted in the script unless it takes what
+    # python can't format the same way
+    if not arguments or arguments[0].startswith('-') and arguments[0] != '-':
+        return subprocess.run(['printf', *arguments], text=True, stdout=subprocess.PIPE).stdout
+    try:
+        return sheepy_printf_format(arguments[0], arguments[1:])
+    except ValueError:
+        return subprocess.run(['printf', *arguments], text=True, stdout=subprocess.PIPE).stdout
+
+
+def sheepy_glob_cache(cache={}):
+    # the directories listed for globbing, (device, inode) -> (their
+    # mtime, their entries, {(pattern, only directories): matching names});
+    # the native commands that change directories clear it
+    return cache
+
+
+def sheepy_glob_names(directory, pattern, dironly):
+    # the names in directory that pattern matches, as glob matches them
+    try:
+        status = os.stat(directory or '.')
+    except OSError:
+        return []
+    cache = sheepy_glob_cache()
+    key = (status.st_dev, status.st_ino)
+    entry = cache.get(key)
+    if entry is None or entry[0] != status.st_mtime_ns:
+        try:
+            with os.scandir(directory or '.') as entries:
+                entry = (status.st_mtime_ns, list(entries), {})
+        except OSError:
+            return []
+        # a directory changed within the resolution of its timestamps could
+        # change again without its mtime changing
+        if time.time_ns() - status.st_mtime_ns > 2_000_000_000:
+            cache[key] = entry
+    names = entry[2].get((pattern, dironly))
+    if names is None:
+        names = [e.name for e in entry[1] if not dironly or e.is_dir()]
+        if not pattern.startswith('.'):
+            names = [name for name in names if not name.startswith('.')]
+        names = entry[2][pattern, dironly] = fnmatch.filter(names, pattern)
+    return names
+
+
+def sheepy_iglob(pattern, dironly):
+    # the paths pattern matches, in the order the directories list them
+    directory, basename = os.path.split(pattern)
+    if not re.search('[*?[]', pattern):
+        if os.path.lexists(pattern) if basename else os.path.isdir(directory):
+            return [pattern]
+        return []
+    if directory != pattern and re.search('[*?[]', directory):
+        directories = sheepy_iglob(directory, True)
+    else:
+        directories = [directory]
+    paths = []
+    for directory in directories:
+        if re.search('[*?[]', basename):
+            names = sheepy_glob_names(directory, basename, dironly)
+        elif os.path.lexists(os.path.join(directory, basename)) if basename else os.path.isdir(directory):
+            names = [basename]
+        else:
+            names = []
+        paths += [os.path.join(directory, name) for name in names]
+    return paths
+
+
+def sheepy_glob(pattern):
+    # the sorted paths pattern matches, like python's glob module finds
+    # them, without listing a directory again as long as it doesn't change
+    return sorted(sheepy_iglob(pattern, False))
+
+
+def sheepy_stdin(state=['', b'', iter(())]):
+    # what has been read of stdin and not used yet by read: the text of
+    # whole lines, then the bytes after them, and before both the lines a
+    # while read loop has split off, which any read takes first
+    return state
+
+
+def sheepy_stdin_more(state):
+    # read another block of stdin into state -> False at the end of it
+    sys.stdout.flush()
+    data = sys.stdin.buffer.read1(65536)
+    if data:
+        data = state[1] + data
+        end = data.rfind(b'\n') + 1
+    elif state[1]:
+        # a line without a newline at the end of the input is whole too
+        data = state[1]
+        end = len(data)
+    else:
+        return False
+    state[0] += data[:end].decode(sys.stdin.encoding, sys.stdin.errors)
+    state[1] = data[end:]
+    return True
+
+
+def sheepy_read_line(raw):
+    # the next line of stdin for read without its newline, and whether it
+    # had one; unless raw a backslash at its end continues it on the next
+    state = sheepy_stdin()
+    state[0] = ''.join(text + '\n' for text in state[2]) + state[0]
+    line = ''
+    while True:
+        end = state[0].find('\n')
+        if end < 0:
+            if sheepy_stdin_more(state):
+                continue
+            line += state[0]
+            state[0] = ''
+            return line, False
+        part = state[0][:end]
+        state[0] = state[0][end + 1:]
+        if not raw and (len(part) - len(part.rstrip('\\'))) % 2:
+            line += part + '\n'
+            continue
+        return line + part, True
+
+
+def sheepy_read_split(line, count, raw, ifs):
+    # the values read gives count variables: the fields of the line between
+    # spaces and tabs, the last variable taking the rest of it, or all of
+    # the line with an empty IFS
+    if not raw and '\\' in line:
+        return sheepy_read_escaped(line, count, ifs)
+    if not ifs:
+        return [line] + [''] * (count - 1)
+    if line.isprintable():
+        # no tab or other white space than spaces, which str.split sees
+        # the same way then
+        values = line.split(None, count - 1)
+        if len(values) == count:
+            values[-1] = values[-1].rstrip(' ')
+            return values
+        return values + [''] * (count - len(values))
+    line = line.strip(' \t')
+    spaced = line.replace('\t', ' ')
+    values = []
+    start = 0
+    while len(values) < count - 1:
+        end = spaced.find(' ', start)
+        if end < 0:
+            break
+        values.append(line[start:end])
+        start = len(line) - len(spaced[end:].lstrip(' '))
+    values.append(line[start:])
+    return values + [''] * (count - len(values))
+
+
+def sheepy_read_escaped(line, count, ifs):
+    # sheepy_read_split for a line where a backslash quotes the character
+    # after it, or joins the next line; like dash, only the runs of the line
+    # between quoted characters are searched for separators, so a quoted
+    # character doesn't end the trailing separators of the last value
+    text = ''
+    runs = []
+    begin = index = 0
+    while True:
+        end = line.find('\\', index)
+        if end < 0:
+            text += line[index:]
+            break
+        text += line[index:end]
+        runs.append((begin, len(text)))
+        text += line[end + 1:end + 2].replace('\n', '')
+        begin = len(text)
+        index = end + 2
+    runs.append((begin, len(text)))
+    values = []
+    start = 0
+    cut = None
+    left = count
+    for begin, end in runs:
+        spaces = False
+        for index in range(begin, end):
+            separator = text[index] in ifs
+            if not left:
+                # in the last value, where its trailing separators start
+                if not separator:
+                    cut = None
+                elif cut is None:
+                    cut = index
+                continue
+            if spaces:
+                start = index + 1 if separator else index
+                if separator:
+                    continue
+            if not separator:
+                spaces = False
+            elif index == start:
+                start = index + 1
+            else:
+                spaces = True
+                left -= 1
+                if left:
+                    values.append(text[start:index])
+                    start = index + 1
+                else:
+                    cut = index
+    if cut is not None:
+        text = text[:cut]
+    if text[start:]:
+        values.append(text[start:])
+    return values + [''] * (count - len(values))
+
+
+def sheepy_read(count, raw, ifs=' \t\n'):
+    # read as a command: the values of its count variables (the value of
+    # the one) from the next line of stdin, or from what is left of it
+    line, _ = sheepy_read_line(raw)
+    values = sheepy_read_split(line, count, raw, ifs)
+    return values[0] if count == 1 else values
+
+
+def sheepy_read_status(count, raw, ifs=' \t\n'):
+    # read in an and-or list: whether it read a whole line, for its status,
+    # and the values of its variables like sheepy_read
+    line, newline = sheepy_read_line(raw)
+    values = sheepy_read_split(line, count, raw, ifs)
+    return newline, values[0] if count == 1 else values
+
+
+def sheepy_read_loop(count, raw, ifs=' \t\n'):
+    # the values of the variables of each read of while read ...; do, a
+    # block of lines at a time; the read that ends the loop is sheepy_read
+    state = sheepy_stdin()
+    while True:
+        lines = state[2]
+        for line in lines:
+            if raw or '\\' not in line:
+                if count == 1:
+                    yield line.strip(' \t') if ifs else line
+                    continue
+                if ifs and line.isprintable():
+                    # sheepy_read_split without the call
+                    values = line.split(None, count - 1)
+                    if len(values) == count:
+                        values[-1] = values[-1].rstrip(' ')
+                        yield values
+                        continue
+                yield sheepy_read_split(line, count, raw, ifs)
+                continue
+            if (len(line) - len(line.rstrip('\\'))) % 2:
+                # the line goes on after the newline
+                state[0] = line + '\n' + ''.join(text + '\n' for text in lines) + state[0]
+                line, ended = sheepy_read_line(raw)
+                if not ended:
+                    # the read that ends the loop gets it
+                    state[0] = line + state[0]
+                    return
+            values = sheepy_read_split(line, count, raw, ifs)
+            yield values[0] if count == 1 else values
+        if lines is not state[2]:
+            # a read in the loop split off the next lines
+            continue
+        end = state[0].rfind('\n') + 1
+        if not end:
+            if sheepy_stdin_more(state):
+                continue
+            return
+        state[2] = iter(state[0][:end - 1].split('\n'))
+        state[0] = state[0][end:]
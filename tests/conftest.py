@@ -0,0 +1,7 @@
+# The tests import sheepy from the top of the repository:
+#
+#   python3 -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+# An incremental translation, from the blocks kept for a script before it
+# was edited, has to be byte for byte the one a full run gives.
+import glob
+import os
+import random
+
+import pytest
+
+import sheepy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (script, script after an edit), edited at block boundaries, where
+# an incremental run starts and stops
+CASES = {
+    'print appended': ("x=5\necho 'hello world'\n", "x=5\necho 'hello world'\necho $x\n"),
+    'print prepended': ("if true\nthen\n  x=1\nfi\necho b\n", "echo a\nif true\nthen\n  x=1\nfi\necho b\n"),
+    'print after a loop': ("for i in 1 2\ndo\n  echo $i\ndone\n", "for i in 1 2\ndo\n  echo $i\ndone\necho done\necho .\n"),
+    'constant changed': ("x=1\necho $x\necho a\n", "x=2\necho $x\necho a\n"),
+    'integer made a string': ("n=1\nn=$((n + 1))\necho $n\n", 'n=1\nn="a b"\necho $n\n'),
+    'loop body edited': ("for f in *.c\ndo\n  echo $f\ndone\n", "for f in *.c\ndo\n  echo \"$f\"\n  ls $f\ndone\n"),
+    'helper no longer needed': ("read line\necho $line\necho end\n", "line=x\necho $line\necho end\n"),
+}
+
+# lines the random edits insert or replace lines with
+EDITS = ['x="a b"', 'echo changed', 'echo', 'number=5', '', '# c', 'n=1; echo $n', 'k=`echo  a  b`']
+
+
+def incremental(before, after):
+    _, previous, _ = sheepy.transpile_incremental(before)
+    python_code, _, _ = sheepy.transpile_incremental(after, previous)
+    return python_code
+
+
+@pytest.mark.parametrize('before, after', CASES.values(), ids=list(CASES))
+def test_edit_at_block_boundary(before, after):
+    before, after = '#!/bin/dash\n' + before, '#!/bin/dash\n' + after
+    assert incremental(before, after) == sheepy.transpile(after)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_random_edits(seed):
+    # edits to a script pieced together from the examples, each translated
+    # from the blocks of the one before it
+    generator = random.Random(seed)
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'examples', '*', '*.sh'))):
+        with open(path) as f:
+            chunks.append(f.read().partition('\n')[2].replace('exit', 'true'))
+    lines = ('#!/bin/dash\n' + ''.join(generator.choice(chunks) for _ in range(30))).split('\n')
+    for _ in range(25):
+        edited = list(lines)
+        i = generator.randrange(1, len(edited))
+        operation = generator.choice(['insert', 'delete', 'replace'])
+        if operation == 'insert':
+            edited.insert(i, generator.choice(EDITS))
+        elif operation == 'delete':
+            del edited[i]
+        else:
+            edited[i] = generator.choice(EDITS)
+        before, after = '\n'.join(lines), '\n'.join(edited)
+        try:
+            expected = sheepy.transpile(after)
+        except sheepy.ShellSyntaxError:
+            continue
+        assert incremental(before, after) == expected, f'{operation} at line {i + 1}'
+        lines = edited
@@ -0,0 +1,72 @@
+# Snippets of shell translated and run, which have to print what dash prints
+# for them and exit with the same status.
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import sheepy
+
+pytestmark = pytest.mark.skipif(shutil.which('dash') is None, reason='needs dash')
+
+# name -> (script, arguments, standard input)
+CASES = {
+    'test -s': ('echo x > full\n: > empty\n'
+                'if test -s full && test -s empty; then echo both; else echo one; fi\n'
+                '[ -s empty ] || [ -s missing ] || echo neither\n'
+                'if [ ! -s empty ]; then echo negated; fi\n', [], ''),
+    'test -o and -a': ('[ a = b -o c = c ] && echo or\n'
+                       'test 1 -eq 2 -o 1 -eq 1 -a 2 -eq 3 && echo wrong || echo right\n'
+                       'if [ x = y -a 1 -eq 1 ] || [ 2 -gt 1 ]; then echo second; fi\n'
+                       'if test a = a -o b = c && test 1 -eq 2; then echo wrong; else echo grouped; fi\n', [], ''),
+    'and-or assignments': ('x=1 && y=2 || z=3\necho $x $y\n'
+                           'false && x=5\necho $x\n'
+                           'x=$(false) || echo failed\n'
+                           'y=`echo a` && echo "$y"\n', [], ''),
+    'and-or cd': ('mkdir -p sub\ncd sub && echo in\n'
+                  'cd /no/such/directory || echo failed\n'
+                  'basename "$(pwd)"\n', [], ''),
+    'and-or echo': ('true && echo a || echo b\nfalse && echo c || echo d\necho e && echo f\n', [], ''),
+    'and-or read': ('read a b && echo "$b $a"\nread c && echo "[$c]"\nread d || echo "end [$d]"\n',
+                    [], 'one two three\n\nlast'),
+    'missing arguments': ('echo "[$1]" "[$2]" "[$3]"\necho "[${2-d}]" "[${2:-d}]" "[${3-d}]"\n'
+                          'echo ${#3}\n', ['a', ''], ''),
+    'no arguments': ('echo "[$1]" "[${1-unset}]"\nif [ -z "$1" ]; then echo none; fi\n', [], ''),
+    'unset and empty': ('x=\necho "[${x-d}]" "[${x:-d}]"\nx=v\necho "[${x-d}]"\n', [], ''),
+    'folded literals': ('echo "a"\'b\'$((2 + 3)) "$(expr 2 \\* 3)" $(expr 7 / 2)\n'
+                        'x=$(expr -7 % 3)\necho "$x"\n', [], ''),
+    'integer expr echo': ('i=3\necho $(expr $i + 1)x $(expr $i \\* 2)\n'
+                          'for w in $(expr $i - 5) y$(expr $i + 0)\ndo\n    echo "<$w>"\ndone\n', [], ''),
+}
+
+
+def run(command, arguments, stdin, directory):
+    process = subprocess.run(command + arguments, input=stdin, capture_output=True, text=True, cwd=directory)
+    return process.stdout, process.returncode
+
+
+@pytest.mark.parametrize('script, arguments, stdin', CASES.values(), ids=list(CASES))
+def test_same_as_dash(script, arguments, stdin, tmp_path):
+    script = '#!/bin/dash\n' + script
+    shell_path = tmp_path / 'script.sh'
+    shell_path.write_text(script)
+    python_path = tmp_path / 'script.py'
+    python_path.write_text(sheepy.transpile(script, None, str(shell_path)))
+    for name in ('dash', 'python'):
+        os.mkdir(tmp_path / name)
+    expected = run(['dash', str(shell_path)], arguments, stdin, tmp_path / 'dash')
+    assert run([sys.executable, str(python_path)], arguments, stdin, tmp_path / 'python') == expected
+
+
+# name -> (script, a line its translation has)
+CODE = {
+    'constants folded': ('echo "a"\'b\'$((2 + 3)) $(expr 2 + 3)\n', "print('ab5 5')"),
+    'integer expr not split': ('i=$(( $# + 1 ))\necho $(expr $i \\* 2)\n', 'print(str(i * 2))'),
+}
+
+
+@pytest.mark.parametrize('script, line', CODE.values(), ids=list(CODE))
+def test_translation(script, line):
+    assert line in sheepy.transpile('#!/bin/dash\n' + script).splitlines()